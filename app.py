@@ -1,10 +1,48 @@
+from argparse import ArgumentParser
 import os
+import sys
 
+from hackpack import server
 from hackpack.app import app
 
 
+def parse_args(args):
+    """ Configures the command line interface.
+
+    Args:
+        Arguments from command (usually sys.argv)
+
+    Returns:
+        Namespace with the selected server
+    """
+    parser = ArgumentParser(description="Run the Twilio Hackpack.")
+    parser.add_argument("--server", choices=("sync", "async"),
+                        default=os.environ.get("HACKPACK_SERVER", "sync"),
+                        help="Serve with the sync pre-forking server or the "
+                             "async ASGI adapter (requires uvicorn).")
+    return parser.parse_args(args)
+
+
+def run_async(host, port):
+    if sys.version_info < (3, 5):
+        sys.exit("The async server requires Python 3.5+")
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("The async server requires uvicorn: pip install uvicorn")
+    from hackpack.asgi import application
+    uvicorn.run(application, host=host, port=port)
+
+
 if __name__ == '__main__':
+    options = parse_args(sys.argv[1:])
     port = int(os.environ.get("PORT", 5000))
     if port == 5000:
         app.debug = True
-    app.run(host='0.0.0.0', port=port)
+    app.extensions['twiml_cache'].warm()
+    if options.server == "async":
+        run_async(host='0.0.0.0', port=port)
+    elif app.debug:
+        app.run(host='0.0.0.0', port=port)
+    else:
+        server.run(app, server.ServerSettings.from_environ())
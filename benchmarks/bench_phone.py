@@ -0,0 +1,44 @@
+'''
+Microbenchmark: hackpack.phone against the inline regex /client/incoming
+used to run on every request.
+
+Usage:
+    python -m benchmarks.bench_phone
+'''
+
+import re
+import timeit
+
+from hackpack import phone
+
+NUMBERS = ['+1 (555) 867-5309', '15558675309', '555.867.5309',
+           '+44 20 7946 0958', 'AKJD:LFKNAFJ', '16667778888'] * 100
+
+
+def inline_regex(numbers):
+    return [n for n in numbers if re.search('^[\\d\\(\\)\\- \\+]+$', n)]
+
+
+def normalize_each(numbers):
+    return [phone.normalize(n) for n in numbers]
+
+
+def normalize_cold(numbers):
+    phone._normalized.clear()
+    return [phone._normalize(n, '1') for n in numbers]
+
+
+def main(number=200):
+    candidates = [('inline re.search', inline_regex),
+                  ('phone.normalize (uncached)', normalize_cold),
+                  ('phone.normalize (cached)', normalize_each),
+                  ('phone.normalize_many', phone.normalize_many)]
+    print("{0} numbers x {1} runs".format(len(NUMBERS), number))
+    for name, func in candidates:
+        seconds = timeit.timeit(lambda: func(NUMBERS), number=number)
+        per_number = seconds / (number * len(NUMBERS)) * 1e9
+        print("{0:<30} {1:>8.1f} ns/number".format(name, per_number))
+
+
+if __name__ == '__main__':
+    main()
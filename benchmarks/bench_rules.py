@@ -0,0 +1,57 @@
+'''
+Microbenchmark: routing rule matching as the rule set grows.
+
+Compiles rule sets of increasing size, each with a number-prefix and a
+keyword rule per entry, and times matching a message against the compiled
+index and against checking each rule in turn.
+
+Usage:
+    python -m benchmarks.bench_rules
+'''
+
+import timeit
+
+from hackpack.rules import RuleIndex
+
+SIZES = (10, 1000, 20000)
+MESSAGE = ('+15550000007', '+12125550000',
+           'What are your opening hours this weekend?')
+
+
+def make_rules(size):
+    rules = []
+    for i in range(size):
+        rules.append({'to': '+1555{0:07d}'.format(i),
+                      'keywords': 'keyword{0}'.format(i),
+                      'sms': 'Rule {0}'.format(i)})
+    rules.append({'keywords': 'hours', 'sms': 'Noon to midnight.'})
+    return rules
+
+
+def scan(rules, to, from_, body):
+    """Check each rule in turn, as a list of conditions would."""
+    words = body.lower().split()
+    for rule in rules:
+        if rule.get('to') and not to.startswith(rule['to']):
+            continue
+        if rule.get('keywords') and rule['keywords'] not in words:
+            continue
+        return rule
+
+
+def main(number=2000):
+    print("Match one message x {0} runs".format(number))
+    for size in SIZES:
+        rules = make_rules(size)
+        index = RuleIndex(rules)
+        compiled = timeit.timeit(lambda: index.match('sms', *MESSAGE),
+                                 number=number)
+        scanned = timeit.timeit(lambda: scan(rules, *MESSAGE),
+                                number=max(1, number // 10))
+        print("{0:>6} rules  index {1:>8.2f} us/match  scan {2:>10.2f} "
+              "us/match".format(size, compiled / number * 1e6,
+                                scanned / max(1, number // 10) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+'''
+Microbenchmark: per-request cost of X-Twilio-Signature validation.
+
+Compares hackpack.security's copied HMAC key against building a new HMAC
+for every request, then measures /voice through the Flask test client with
+validation off and on.
+
+Usage:
+    python -m benchmarks.bench_signature
+'''
+
+import base64
+import hmac
+import timeit
+from hashlib import sha1
+
+from flask import Flask
+from flask import request
+
+from hackpack.security import RequestValidator
+from hackpack.security import SignatureValidation
+
+AUTH_TOKEN = '12345678901234567890123456789012'
+URL = 'https://hackpack.herokuapp.com/voice'
+PARAMS = {
+    'CallSid': 'CA1234567890abcdef1234567890abcdef',
+    'AccountSid': 'AC1234567890abcdef1234567890abcdef',
+    'To': '+15558675309',
+    'From': '+15556667777',
+    'CallStatus': 'ringing',
+    'Direction': 'inbound',
+    'FromCity': 'BROOKLYN',
+    'FromState': 'NY',
+    'FromCountry': 'US',
+    'FromZip': '55555'}
+LISTS = [(name, [value]) for name, value in PARAMS.items()]
+
+
+def joined_signature(url, params):
+    data = url + ''.join(name + params[name] for name in sorted(params))
+    mac = hmac.new(AUTH_TOKEN.encode('utf-8'), data.encode('utf-8'), sha1)
+    return base64.b64encode(mac.digest())
+
+
+def create_app(validate):
+    app = Flask(__name__)
+    app.config['TWILIO_AUTH_TOKEN'] = AUTH_TOKEN
+    app.config['TWILIO_VALIDATE_SIGNATURES'] = validate
+    app.config['TWILIO_REPLAY_TTL'] = 0
+    signatures = SignatureValidation(app)
+
+    @app.route('/voice', methods=['POST'])
+    @signatures.protect
+    def voice():
+        # Views read the form anyway; don't count parsing it as overhead.
+        request.values.get('From')
+        return '<Response />'
+
+    return app
+
+
+def bench_requests(number):
+    signature = RequestValidator(AUTH_TOKEN).compute_signature(
+        'http://localhost/voice', LISTS)
+    results = []
+    for validate in (False, True):
+        client = create_app(validate).test_client()
+
+        def post():
+            client.post('/voice', data=PARAMS,
+                        headers={'X-Twilio-Signature': signature})
+
+        results.append(timeit.timeit(post, number=number) / number * 1e6)
+    return results
+
+
+def main(number=20000):
+    validator = RequestValidator(AUTH_TOKEN, replay_ttl=0)
+    candidates = [
+        ('new HMAC, joined string',
+         lambda: joined_signature(URL, PARAMS)),
+        ('copied HMAC key',
+         lambda: validator.compute_signature(URL, LISTS))]
+    print("Signature of {0} parameters x {1} runs".format(len(PARAMS),
+                                                          number))
+    for name, func in candidates:
+        seconds = timeit.timeit(func, number=number)
+        print("{0:<30} {1:>8.2f} us/request".format(
+            name, seconds / number * 1e6))
+
+    requests = number // 10
+    off, on = bench_requests(requests)
+    print("/voice via test client x {0} requests".format(requests))
+    print("{0:<30} {1:>8.2f} us/request".format('validation off', off))
+    print("{0:<30} {1:>8.2f} us/request".format('validation on', on))
+    print("{0:<30} {1:>8.2f} us/request".format('overhead', on - off))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+'''
+Startup profile: how long importing the hackpack's entry points takes, and
+which modules take longest, each measured in a fresh interpreter.
+
+Usage:
+    python -m benchmarks.bench_startup
+'''
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ('hackpack.app', 'configure', 'campaign')
+
+MEASURE = '''
+import sys, timeit
+start = timeit.default_timer()
+import {0}
+print(timeit.default_timer() - start)
+print(' '.join(sorted(sys.modules)))
+'''
+
+
+def import_time(module, runs=3):
+    """Return the fastest of runs fresh imports of module, in seconds, and
+    the modules loaded by the last one."""
+    best = None
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', MEASURE.format(module)], cwd=ROOT)
+        seconds, modules = output.decode('utf-8').splitlines()[-2:]
+        seconds = float(seconds)
+        best = seconds if best is None else min(best, seconds)
+    return best, set(modules.split())
+
+
+def slowest_imports(module, count=10):
+    """Return (cumulative microseconds, name) for the slowest imports
+    below module, from python -X importtime (Python 3.7+)."""
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        cwd=ROOT, stderr=subprocess.PIPE)
+    _, errors = process.communicate()
+    timings = []
+    for line in errors.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.append((int(cumulative), name.strip()))
+    timings.sort(reverse=True)
+    return timings[1:count + 1]
+
+
+def main():
+    for module in MODULES:
+        seconds, modules = import_time(module)
+        print("{0:<16} {1:>8.1f} ms  twilio imported: {2}".format(
+            module, seconds * 1000, 'twilio' in modules))
+        if sys.version_info >= (3, 7):
+            for microseconds, name in slowest_imports(module):
+                print("    {0:<40} {1:>8.1f} ms".format(
+                    name, microseconds / 1000.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''
+Microbenchmark: cost of signing Twilio Client capability tokens.
+
+Compares twilio.util.TwilioCapability, which builds a new HMAC and JSON
+header for every token, against hackpack.tokens.CapabilitySigner, then
+measures a batch of tokens from /client/token through the Flask test client.
+
+Usage:
+    python -m benchmarks.bench_tokens
+'''
+
+import json
+import timeit
+
+from twilio.util import TwilioCapability
+
+from hackpack.app import create_app
+from hackpack.tokens import CapabilitySigner
+
+ACCOUNT_SID = 'AC1234567890abcdef1234567890abcdef'
+AUTH_TOKEN = '12345678901234567890123456789012'
+APP_SID = 'AP1234567890abcdef1234567890abcdef'
+
+
+def twilio_token():
+    capability = TwilioCapability(ACCOUNT_SID, AUTH_TOKEN)
+    capability.allow_client_incoming('agent_1234')
+    capability.allow_client_outgoing(APP_SID)
+    return capability.generate()
+
+
+def bench_endpoint(number, batch):
+    client = create_app({'TWILIO_ACCOUNT_SID': ACCOUNT_SID,
+                         'TWILIO_AUTH_TOKEN': AUTH_TOKEN,
+                         'TWILIO_APP_SID': APP_SID,
+                         'CLIENT_TOKEN_API_KEY': 'secret',
+                         'CLIENT_TOKEN_BATCH_SIZE': batch}).test_client()
+    data = json.dumps({'identities': ['agent_{0}'.format(i)
+                                      for i in range(batch)]})
+
+    def post():
+        client.post('/client/token', data=data,
+                    content_type='application/json',
+                    headers={'Authorization': 'Bearer secret'})
+
+    return timeit.timeit(post, number=number) / number
+
+
+def main(number=20000):
+    signer = CapabilitySigner(ACCOUNT_SID, AUTH_TOKEN)
+    candidates = [
+        ('TwilioCapability', twilio_token),
+        ('CapabilitySigner',
+         lambda: signer.generate('agent_1234', APP_SID))]
+    print("Capability token x {0} runs".format(number))
+    for name, func in candidates:
+        seconds = timeit.timeit(func, number=number)
+        print("{0:<30} {1:>8.2f} us/token".format(
+            name, seconds / number * 1e6))
+
+    batch = 1000
+    requests = max(number // 2000, 1)
+    seconds = bench_endpoint(requests, batch)
+    print("/client/token, {0} identities x {1} requests".format(
+        batch, requests))
+    print("{0:<30} {1:>8.2f} ms/request".format('batch', seconds * 1e3))
+    print("{0:<30} {1:>8.2f} us/token".format('per token',
+                                              seconds / batch * 1e6))
+
+
+if __name__ == '__main__':
+    main()
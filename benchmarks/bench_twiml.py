@@ -0,0 +1,82 @@
+'''
+Microbenchmark: building the hackpack's TwiML responses with hackpack.twiml
+against twilio.twiml's object tree.
+
+Reports the time to build and encode each response, and the peak memory
+allocated while doing so.
+
+Usage:
+    python -m benchmarks.bench_twiml
+'''
+
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from twilio import twiml as library
+
+from hackpack import twiml
+
+GREETING = "Congratulations! You deployed the Twilio Hackpack for Heroku " \
+           "and Flask."
+
+
+def say(module):
+    response = module.Response()
+    response.say(GREETING)
+    return str(response).encode('utf-8')
+
+
+def dial(module):
+    response = module.Response()
+    with response.dial(callerId='+15558675309') as r:
+        r.number('+16667778888')
+    return str(response).encode('utf-8')
+
+
+def menu(module):
+    response = module.Response()
+    with response.gather(action='/voice/ivr/main', method='POST',
+                         numDigits=1, timeout=5) as gather:
+        gather.say("Press 1 for our hours, or 2 to hear a song.")
+        gather.play('http://example.com/blitzkrieg-bop.mp3')
+    response.redirect('/voice/ivr/main', method='POST')
+    return str(response).encode('utf-8')
+
+
+RESPONSES = (('say', say), ('dial', dial), ('menu', menu))
+
+
+def allocated(func, module, runs=100):
+    """Average peak bytes allocated building one response."""
+    if tracemalloc is None:
+        return None
+    total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(runs):
+            tracemalloc.clear_traces()
+            func(module)
+            total += tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return total / float(runs)
+
+
+def main(number=20000):
+    print("TwiML responses x {0} runs".format(number))
+    for name, func in RESPONSES:
+        for label, module in (('twilio.twiml', library),
+                              ('hackpack.twiml', twiml)):
+            seconds = timeit.timeit(lambda: func(module), number=number)
+            peak = allocated(func, module)
+            print("{0:<6} {1:<16} {2:>8.2f} us/response {3:>8} "
+                  "bytes".format(name, label, seconds / number * 1e6,
+                                 '-' if peak is None else int(peak)))
+
+
+if __name__ == '__main__':
+    main()
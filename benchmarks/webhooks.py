@@ -0,0 +1,307 @@
+'''
+Webhook load-testing benchmarks for the hackpack.
+
+Replays realistic Twilio Voice, SMS and Client webhook payloads against the
+app, either in-process through Flask's test client or over a local socket,
+and reports throughput, latency percentiles and memory allocated per request
+for each route.
+
+Usage:
+    python -m benchmarks.webhooks
+    python -m benchmarks.webhooks --transport socket --requests 2000
+    python -m benchmarks.webhooks --save baseline.json
+    python -m benchmarks.webhooks --compare baseline.json
+'''
+
+from argparse import ArgumentParser
+import json
+import math
+import sys
+import threading
+import timeit
+
+try:
+    from http.client import HTTPConnection
+    from urllib.parse import urlencode
+except ImportError:
+    from httplib import HTTPConnection
+    from urllib import urlencode
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+clock = timeit.default_timer
+
+ACCOUNT_SID = 'ACxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
+CALLER_ID = '+15558675309'
+
+
+def voice_payload(i):
+    return {'CallSid': 'CA{0:032d}'.format(i),
+            'AccountSid': ACCOUNT_SID,
+            'From': '+1646555{0:04d}'.format(i % 10000),
+            'To': CALLER_ID,
+            'CallStatus': 'ringing',
+            'ApiVersion': '2010-04-01',
+            'Direction': 'inbound',
+            'FromCity': 'BROOKLYN',
+            'FromState': 'NY',
+            'FromZip': '11211',
+            'FromCountry': 'US',
+            'ToCity': 'NEW YORK',
+            'ToState': 'NY',
+            'ToZip': '10001',
+            'ToCountry': 'US'}
+
+
+def sms_payload(i):
+    return {'SmsSid': 'SM{0:032d}'.format(i),
+            'MessageSid': 'SM{0:032d}'.format(i),
+            'AccountSid': ACCOUNT_SID,
+            'From': '+1646555{0:04d}'.format(i % 10000),
+            'To': CALLER_ID,
+            'Body': 'Hey Ho, Let\'s Go {0}'.format(i),
+            'NumMedia': '0',
+            'ApiVersion': '2010-04-01',
+            'FromCity': 'BROOKLYN',
+            'FromState': 'NY',
+            'FromZip': '11211',
+            'FromCountry': 'US'}
+
+
+def client_payload(i):
+    return {'CallSid': 'CA{0:032d}'.format(i),
+            'AccountSid': ACCOUNT_SID,
+            'ApplicationSid': 'AP{0:032d}'.format(0),
+            'From': 'client:joey_ramone',
+            'Caller': 'client:joey_ramone',
+            'CallStatus': 'ringing',
+            'ApiVersion': '2010-04-01',
+            'Direction': 'inbound',
+            'PhoneNumber': '+1 (646) 555-{0:04d}'.format(i % 10000)}
+
+
+# Route name: (method, path, payload factory)
+ROUTES = {
+    'voice': ('POST', '/voice', voice_payload),
+    'sms': ('POST', '/sms', sms_payload),
+    'client_incoming': ('POST', '/client/incoming', client_payload),
+    'client': ('GET', '/client', None),
+    'index': ('GET', '/', None)}
+
+CONFIG = {'TWILIO_ACCOUNT_SID': ACCOUNT_SID,
+          'TWILIO_AUTH_TOKEN': 'yyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyy',
+          'TWILIO_APP_SID': 'AP{0:032d}'.format(0),
+          'TWILIO_CALLER_ID': CALLER_ID}
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    rank = int(math.ceil(percent / 100.0 * len(samples))) - 1
+    return samples[max(0, min(rank, len(samples) - 1))]
+
+
+def summarize(latencies, elapsed, allocated=None):
+    latencies = sorted(latencies)
+    result = {'requests': len(latencies),
+              'throughput': len(latencies) / elapsed if elapsed else 0.0,
+              'p50_ms': percentile(latencies, 50) * 1000,
+              'p95_ms': percentile(latencies, 95) * 1000,
+              'p99_ms': percentile(latencies, 99) * 1000}
+    if allocated is not None:
+        result['alloc_kib'] = allocated / 1024.0
+    return result
+
+
+class InProcessTransport(object):
+    name = 'inprocess'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, payload):
+        response = self.client.open(path, method=method, data=payload)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class SocketTransport(object):
+    """Sends each request over a fresh localhost HTTP connection, the way
+    Twilio calls a webhook."""
+    name = 'socket'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        from werkzeug.serving import WSGIRequestHandler
+
+        class QuietRequestHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.port = self.server.port
+
+    def request(self, method, path, payload):
+        connection = HTTPConnection('127.0.0.1', self.port)
+        body = urlencode(payload) if payload else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+TRANSPORTS = {'inprocess': InProcessTransport, 'socket': SocketTransport}
+
+
+def bench_route(transport, route, requests, warmup=10):
+    method, path, factory = ROUTES[route]
+    payloads = [factory(i) if factory else None
+                for i in range(requests + warmup)]
+
+    for payload in payloads[:warmup]:
+        transport.request(method, path, payload)
+
+    latencies = []
+    append = latencies.append
+    request = transport.request
+    start = clock()
+    for payload in payloads[warmup:]:
+        began = clock()
+        status = request(method, path, payload)
+        append(clock() - began)
+        if status >= 400:
+            raise RuntimeError("{0} {1} returned {2}".format(method, path,
+                                                             status))
+    elapsed = clock() - start
+
+    return summarize(latencies, elapsed, measure_allocations(
+        transport, method, path, payloads[warmup:warmup + 50]))
+
+
+def measure_allocations(transport, method, path, payloads):
+    """Average bytes allocated at peak per request, traced separately so the
+    tracing overhead doesn't skew latency."""
+    if tracemalloc is None or not isinstance(transport, InProcessTransport):
+        return None
+    total = 0
+    tracemalloc.start()
+    try:
+        for payload in payloads:
+            # Clearing the traces also resets the peak to zero.
+            tracemalloc.clear_traces()
+            transport.request(method, path, payload)
+            total += tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return total / float(len(payloads) or 1)
+
+
+def run(app, transport='inprocess', routes=None, requests=1000):
+    routes = routes or sorted(ROUTES)
+    transport = TRANSPORTS[transport](app)
+    try:
+        results = {}
+        for route in routes:
+            results[route] = bench_route(transport, route, requests)
+    finally:
+        transport.close()
+    return {'transport': transport.name, 'routes': results}
+
+
+def compare(baseline, current, threshold=0.2):
+    """Return a list of regressions larger than threshold (a fraction)."""
+    if baseline['transport'] != current['transport']:
+        raise ValueError("Baseline was recorded over {0}, not {1}.".format(
+            baseline['transport'], current['transport']))
+    regressions = []
+    for route, result in current['routes'].items():
+        before = baseline['routes'].get(route)
+        if not before:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'alloc_kib'):
+            if before.get(key) and result.get(key, 0) > \
+                    before[key] * (1 + threshold):
+                regressions.append("{0} {1}: {2:.3f} -> {3:.3f}".format(
+                    route, key, before[key], result[key]))
+        if result['throughput'] < before['throughput'] * (1 - threshold):
+            regressions.append("{0} throughput: {1:.0f} -> {2:.0f}".format(
+                route, before['throughput'], result['throughput']))
+    return regressions
+
+
+def report(results, out=sys.stdout):
+    out.write("Transport: {0}\n".format(results['transport']))
+    out.write("{0:<16} {1:>10} {2:>9} {3:>9} {4:>9} {5:>10}\n".format(
+        'route', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'alloc KiB'))
+    for route, result in sorted(results['routes'].items()):
+        alloc = result.get('alloc_kib')
+        out.write("{0:<16} {1:>10.0f} {2:>9.3f} {3:>9.3f} {4:>9.3f} "
+                  "{5:>10}\n".format(route, result['throughput'],
+                                     result['p50_ms'], result['p95_ms'],
+                                     result['p99_ms'],
+                                     '-' if alloc is None
+                                     else '{0:.1f}'.format(alloc)))
+
+
+def parse_args(args):
+    parser = ArgumentParser(description="Benchmark the hackpack's webhooks.")
+    parser.add_argument("-t", "--transport", choices=sorted(TRANSPORTS),
+                        default="inprocess",
+                        help="Call the app in-process or over a socket.")
+    parser.add_argument("-r", "--routes", default=None,
+                        help="Comma separated routes to benchmark: "
+                             "{0}".format(", ".join(sorted(ROUTES))))
+    parser.add_argument("-n", "--requests", type=int, default=1000,
+                        help="Requests per route.")
+    parser.add_argument("--save", default=None,
+                        help="Write results to this JSON baseline file.")
+    parser.add_argument("--compare", default=None,
+                        help="Compare results against a JSON baseline file "
+                             "and exit non-zero on regressions.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed regression as a fraction (0.2 = 20%%).")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    options = parse_args(sys.argv[1:] if args is None else args)
+    from hackpack.app import create_app
+    app = create_app(CONFIG)
+
+    routes = options.routes.split(',') if options.routes else None
+    results = run(app, options.transport, routes, options.requests)
+    report(results)
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, options.threshold)
+        for regression in regressions:
+            sys.stdout.write("REGRESSION {0}\n".format(regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+'''
+Hackpack Campaign
+A script to text or call every phone number in a CSV file from your
+hackpack's Twilio number.
+
+Usage:
+
+Text everyone in the "phone" column of recipients.csv:
+    python campaign.py recipients.csv --body "Hey ho, let's go!"
+
+Call everyone with the TwiML at a URL:
+    python campaign.py recipients.csv --url https://example.com/voice
+
+Resume an interrupted run, retrying any numbers that failed:
+    python campaign.py recipients.csv --body "..." \
+        --checkpoint recipients.checkpoint
+'''
+
+from argparse import ArgumentParser
+import logging
+import os
+import sys
+
+from hackpack import local_settings
+from hackpack.campaign import Campaign
+from hackpack.campaign import Checkpoint
+from hackpack.campaign import TwilioSender
+from hackpack.campaign import read_recipients
+from hackpack.rest import API_BASE
+
+
+def parse_args(args):
+    """ Configures the command line interface.
+
+    Args:
+        Arguments from command (usually sys.argv)
+
+    Returns:
+        Namespace of campaign options
+    """
+    parser = ArgumentParser(description="Twilio Hackpack Campaign - text or "
+                                        "call every number in a CSV file.")
+    parser.add_argument("recipients",
+                        help="CSV file of phone numbers to reach.")
+    parser.add_argument("-b", "--body", default=None,
+                        help="Text message to send.")
+    parser.add_argument("-u", "--url", default=None,
+                        help="TwiML URL for calls to place.")
+    parser.add_argument("--column", default="phone",
+                        help="CSV column holding phone numbers; files with "
+                             "no header row use the first column.")
+    parser.add_argument("-S", "--account_sid",
+                        default=local_settings.TWILIO_ACCOUNT_SID,
+                        help="Use a specific Twilio ACCOUNT_SID.")
+    parser.add_argument("-K", "--auth_token",
+                        default=local_settings.TWILIO_AUTH_TOKEN,
+                        help="Use a specific Twilio AUTH_TOKEN.")
+    parser.add_argument("-F", "--from", dest="from_",
+                        default=local_settings.TWILIO_CALLER_ID,
+                        help="Twilio number to send from.")
+    parser.add_argument("-c", "--concurrency", default=8, type=int,
+                        help="Most Twilio API requests to make at once.")
+    parser.add_argument("-m", "--rate", default=1.0, type=float,
+                        help="Most messages or calls to start per second; "
+                             "your account's limit is usually 1 per "
+                             "number.")
+    parser.add_argument("--checkpoint", default=None,
+                        help="File recording progress, to resume an "
+                             "interrupted run.")
+    parser.add_argument("--api", default=os.environ.get("TWILIO_API_BASE",
+                                                        API_BASE),
+                        help="Twilio REST API to use.")
+    parser.add_argument("-D", "--debug", default=False,
+                        action="store_true", help="Turn on debug output.")
+    options = parser.parse_args(args)
+
+    if bool(options.body) == bool(options.url):
+        parser.error("Give either --body or --url.")
+    for name in ("account_sid", "auth_token", "from_"):
+        if not getattr(options, name):
+            parser.error("{0} is not set in local_settings.".format(
+                name.strip("_").upper()))
+    return options
+
+
+def main(args):
+    options = parse_args(args)
+    logging.basicConfig(level=logging.DEBUG if options.debug
+                        else logging.INFO, format="%(message)s")
+    logger = logging.getLogger(__name__)
+
+    sender = TwilioSender(options.account_sid, options.auth_token,
+                          base=options.api, maxsize=options.concurrency)
+    checkpoint = Checkpoint(options.checkpoint,
+                            source=os.path.abspath(options.recipients))
+    campaign = Campaign(sender, options.from_, body=options.body,
+                        url=options.url, workers=options.concurrency,
+                        rate=options.rate, checkpoint=checkpoint,
+                        logger=logger)
+    stats = campaign.run(read_recipients(options.recipients,
+                                         column=options.column))
+    logger.info("Sent {sent}, failed {failed}, skipped {skipped} already "
+                "sent.".format(**stats))
+    if stats['failed'] and options.checkpoint:
+        logger.info("Run again with the same --checkpoint to retry the "
+                    "failed numbers.")
+    return stats
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -17,39 +17,87 @@ Deploy to specific App Sid:
 Deploy to specific Twilio number:
     python configure.py --number +15556667777
 
+Deploy to several App Sids and Twilio numbers at once, pointing each number
+at the App Sid in the same position, or every number at a single App Sid:
+    python configure.py --app APxxxxxxxxxxxxxx,APyyyyyyyyyyyyyy \
+        --number +15556667777,+15556668888
+
+Point every number listed in a file (or glob of files) at an App Sid,
+updating only numbers that aren't already configured:
+    python configure.py --app APxxxxxxxxxxxxxx --numbers-file 'numbers/*.txt'
+
+Ignore cached Twilio resources and rediscover them:
+    python configure.py --refresh
+
 Deploy to custom domain:
     python configure.py --domain example.com
+
+Show how long each Twilio API endpoint took:
+    python configure.py --debug
 '''
 
 from argparse import ArgumentParser
+from functools import partial
+import glob
+import os
 import sys
 import subprocess
 import logging
 
-from twilio.rest import TwilioRestClient
-from twilio.exceptions import TwilioException
-
 from hackpack import local_settings
+from hackpack import phone
+from hackpack.lazy import lazy_import
+from hackpack.provision import Provisioner
+from hackpack.resource_cache import DEFAULT_PATH
+from hackpack.resource_cache import ResourceCache
+from hackpack.rest import API_BASE
+from hackpack.rest import RestSession
+from hackpack.rest import rest_client
+
+# The twilio package takes longer to import than the rest of this script
+# needs to run --help, so it is imported when first used.
+exceptions = lazy_import('twilio.exceptions')
 
 
 class Configure(object):
-    def __init__(self, account_sid=local_settings.TWILIO_ACCOUNT_SID,
-                 auth_token=local_settings.TWILIO_AUTH_TOKEN,
-                 app_sid=local_settings.TWILIO_APP_SID,
-                 phone_number=local_settings.TWILIO_CALLER_ID,
+    def __init__(self, account_sid=None,
+                 auth_token=None,
+                 app_sid=None,
+                 phone_number=None,
                  voice_url='/voice',
                  sms_url='/sms',
                  host=None,
+                 numbers_file=None,
+                 concurrency=8,
+                 cache=None,
+                 api_base=API_BASE,
                  logger=None, **kwargs):
+        # Defaults are read from local_settings now rather than when this
+        # module was imported.
+        if account_sid is None:
+            account_sid = local_settings.TWILIO_ACCOUNT_SID
+        if auth_token is None:
+            auth_token = local_settings.TWILIO_AUTH_TOKEN
+        if app_sid is None:
+            app_sid = local_settings.TWILIO_APP_SID
+        if phone_number is None:
+            phone_number = local_settings.TWILIO_CALLER_ID
         self.account_sid = account_sid
         self.auth_token = auth_token
         self.app_sid = app_sid
         self.phone_number = phone_number
         self.host = host
+        self.numbers_file = numbers_file
         self.voice_url = voice_url
         self.sms_url = sms_url
         self.friendly_phone_number = None
+        self.concurrency = concurrency
+        self.cache = cache
+        self.api_base = api_base
+        self.session = None
         self.logger = logger or logging.getLogger(__name__)
+        self.provisioner = Provisioner(max_workers=concurrency,
+                                       logger=self.logger)
 
     def start(self):
         self.logger.info("Configuring your Twilio hackpack...")
@@ -61,8 +109,7 @@ class Configure(object):
             raise ConfigurationError("AUTH_TOKEN is not set in "
                                      "local_settings.")
 
-        self.logger.debug("Creating Twilio client...")
-        self.client = TwilioRestClient(self.account_sid, self.auth_token)
+        self.createClient()
 
         self.logger.debug("Checking if host is set.")
         if not self.host:
@@ -80,8 +127,36 @@ class Configure(object):
             self.logger.debug("Setting sms_url with host: "
                               " {0}".format(self.sms_url))
 
-        if self.configureHackpack(self.voice_url, self.sms_url,
-                                  self.app_sid, self.phone_number):
+        app_sids = splitList(self.app_sid)
+        phone_numbers = splitList(self.phone_number)
+        if self.numbers_file:
+            if not app_sids:
+                raise ConfigurationError("Configuring numbers from a file "
+                                         "requires an app sid.")
+            configured = self.configureBulk(self.voice_url, self.sms_url,
+                                            app_sids[0], self.numbers_file)
+            self.app_sid = app_sids[0]
+            if configured:
+                self.phone_number = configured[0].phone_number
+        elif len(app_sids) > 1 or len(phone_numbers) > 1:
+            if not app_sids or not phone_numbers:
+                raise ConfigurationError("Configuring several numbers or "
+                                         "apps requires both app sids and "
+                                         "phone numbers.")
+            configured = self.configureFleet(self.voice_url, self.sms_url,
+                                             app_sids, phone_numbers)
+            self.app_sid = app_sids[0]
+            self.phone_number = phone_numbers[0]
+        else:
+            configured = self.configureHackpack(self.voice_url, self.sms_url,
+                                                self.app_sid,
+                                                self.phone_number)
+
+        if self.cache:
+            self.cache.save()
+        self.logRequestStats()
+
+        if configured:
 
             # Configure Heroku environment variables.
             configuration = {'TWILIO_ACCOUNT_SID': self.account_sid,
@@ -99,34 +174,54 @@ class Configure(object):
             logging.error("There was an error configuring your hackpack. "
                           "Weak sauce.")
 
+    def createClient(self):
+        """Create a Twilio client sharing one pool of keep-alive
+        connections between the provisioner's threads."""
+        self.logger.debug("Creating Twilio client...")
+        self.session = RestSession(self.account_sid, self.auth_token,
+                                   base=self.api_base,
+                                   maxsize=self.concurrency)
+        self.client = rest_client(self.session)
+
+    def logRequestStats(self):
+        if not self.session:
+            return
+        for endpoint, stats in sorted(self.session.stats().items()):
+            self.logger.debug("{0}: {requests} requests, {coalesced} "
+                              "coalesced, {errors} errors, {mean_ms:.0f} ms "
+                              "mean, {max_ms:.0f} ms max".format(endpoint,
+                                                                 **stats))
+
     def configureHackpack(self, voice_url, sms_url, app_sid,
                           phone_number, *args):
 
-        # Check if app sid is configured and available.
-        if not app_sid:
-            app = self.createNewTwiMLApp(voice_url, sms_url)
-        else:
-            app = self.setAppRequestUrls(app_sid, voice_url, sms_url)
+        # A hackpack configured on a previous run only needs verifying.
+        number = self.verifyCachedConfiguration(voice_url, sms_url, app_sid,
+                                                phone_number)
+        if number:
+            return number
 
-        # Check if phone_number is set.
-        if not phone_number:
-            number = self.purchasePhoneNumber()
+        if app_sid and phone_number:
+            # Nothing to ask the user, so look both up at the same time.
+            app, number = self.provisioner.run([
+                partial(self.setAppRequestUrls, app_sid, voice_url, sms_url),
+                partial(self.retrievePhoneNumber, phone_number)])
         else:
-            number = self.retrievePhoneNumber(phone_number)
+            # Check if app sid is configured and available.
+            if not app_sid:
+                app = self.createNewTwiMLApp(voice_url, sms_url)
+            else:
+                app = self.setAppRequestUrls(app_sid, voice_url, sms_url)
+
+            # Check if phone_number is set.
+            if not phone_number:
+                number = self.purchasePhoneNumber()
+            else:
+                number = self.retrievePhoneNumber(phone_number)
 
         # Configure phone number to use App Sid.
-        self.logger.info("Setting {0} to use application sid: "
-                         "{0}".format(number.friendly_name, app.sid))
-        try:
-            self.client.phone_numbers.update(number.sid,
-                                             voice_application_sid=app.sid,
-                                             sms_application_sid=app.sid)
-            self.logger.debug("Number set.")
-        except TwilioException as e:
-            raise ConfigurationError("An error occurred setting the "
-                                     "application sid for "
-                                     "{0}: "
-                                     "{1}".format(number.friendly_name, e))
+        self.setPhoneNumberApplication(number, app)
+        self.cacheConfiguration(voice_url, sms_url, app, number)
 
         # We're done!
         if number:
@@ -135,6 +230,178 @@ class Configure(object):
             raise ConfigurationError("An unknown error occurred configuring "
                                      "request urls for this hackpack.")
 
+    def verifyCachedConfiguration(self, voice_url, sms_url, app_sid,
+                                  phone_number):
+        """Return the phone number if this exact configuration was applied
+        on a previous run and Twilio confirms the number still uses the app,
+        otherwise None."""
+        if not self.cache or not app_sid or not phone_number:
+            return None
+        app_key = "{0}:{1}".format(self.account_sid, app_sid)
+        number_key = self.numberKey(phone_number)
+        cached_app = self.cache.get("applications", app_key)
+        cached_number = self.cache.get("phone_numbers", number_key)
+        if not cached_app or not cached_number:
+            return None
+        if cached_app != {"voice_url": voice_url, "sms_url": sms_url} or \
+                cached_number["app_sid"] != app_sid:
+            return None
+
+        self.logger.debug("Verifying cached configuration for "
+                          "{0}...".format(phone_number))
+        try:
+            number = self.provisioner.call(self.client.phone_numbers.get,
+                                           cached_number["sid"])
+        except exceptions.TwilioException as e:
+            self.logger.debug("Cached phone number failed to verify: "
+                              "{0}".format(e))
+            number = None
+        if number is None or number.voice_application_sid != app_sid or \
+                number.sms_application_sid != app_sid:
+            self.cache.delete("phone_numbers", number_key)
+            return None
+
+        self.logger.info("{0} is already configured to use application "
+                         "sid: {1}".format(number.friendly_name, app_sid))
+        self.friendly_phone_number = number.friendly_name
+        return number
+
+    def cacheConfiguration(self, voice_url, sms_url, app, number):
+        if not self.cache:
+            return
+        self.cache.set("applications",
+                       "{0}:{1}".format(self.account_sid, app.sid),
+                       {"voice_url": voice_url, "sms_url": sms_url})
+        self.cache.set("phone_numbers", self.numberKey(number.phone_number),
+                       {"sid": number.sid,
+                        "friendly_name": number.friendly_name,
+                        "app_sid": app.sid})
+
+    def numberKey(self, phone_number):
+        """The cache key for a phone number, however it was written."""
+        return "{0}:{1}".format(self.account_sid,
+                                phone.normalize(phone_number) or phone_number)
+
+    def configureFleet(self, voice_url, sms_url, app_sids, phone_numbers):
+        """Point every app sid at the hackpack and each phone number at the
+        app sid in the same position, or all of them at the only app sid,
+        making the REST calls concurrently."""
+        if len(app_sids) not in (1, len(phone_numbers)):
+            raise ConfigurationError("Give one app sid, or one for each of "
+                                     "the {0} phone numbers.".format(
+                                         len(phone_numbers)))
+        self.logger.info("Configuring {0} applications and {1} phone "
+                         "numbers...".format(len(app_sids),
+                                             len(phone_numbers)))
+        calls = [partial(self.setAppRequestUrls, app_sid, voice_url, sms_url)
+                 for app_sid in app_sids]
+        calls.extend(partial(self.retrievePhoneNumber, phone_number)
+                     for phone_number in phone_numbers)
+        results = self.provisioner.run(calls)
+        apps = results[:len(app_sids)]
+        numbers = results[len(app_sids):]
+        if len(apps) == 1:
+            apps = apps * len(numbers)
+
+        self.provisioner.run([partial(self.setPhoneNumberApplication,
+                                      number, app)
+                              for number, app in zip(numbers, apps)])
+        return numbers
+
+    def configureBulk(self, voice_url, sms_url, app_sid, patterns):
+        """Point every number listed in the files matching patterns at
+        app_sid.
+
+        The account's numbers are fetched once and compared against the
+        desired configuration, so only numbers that differ are updated and
+        re-running against a configured fleet makes no write calls.
+
+        Returns:
+            Every listed number found on the account.
+        """
+        desired = list(phone.unique(readPhoneNumbers(patterns)))
+        self.logger.info("Configuring {0} phone numbers from "
+                         "{1}...".format(len(desired), ", ".join(patterns)))
+
+        app, index = self.provisioner.run([
+            partial(self.getApplication, app_sid),
+            self.indexPhoneNumbers])
+        if app.voice_url != voice_url or app.sms_url != sms_url:
+            app = self.setAppRequestUrls(app_sid, voice_url, sms_url)
+
+        found = []
+        changed = []
+        missing = []
+        for number in desired:
+            current = index.get(number)
+            if current is None:
+                missing.append(number)
+                continue
+            found.append(current)
+            if current.voice_application_sid != app.sid or \
+                    current.sms_application_sid != app.sid:
+                changed.append(current)
+
+        if missing:
+            self.logger.warning("These numbers are not on your Twilio "
+                                "account: {0}".format(", ".join(missing)))
+
+        self.provisioner.run([partial(self.setPhoneNumberApplication,
+                                      number, app)
+                              for number in changed])
+        self.logger.info("Updated {0} phone numbers, {1} were already "
+                         "configured.".format(len(changed),
+                                              len(found) - len(changed)))
+        return found
+
+    def getApplication(self, app_sid):
+        try:
+            return self.provisioner.call(self.client.applications.get,
+                                         app_sid)
+        except exceptions.TwilioException as e:
+            raise ConfigurationError("Could not retrieve application sid "
+                                     "{0}: {1}".format(app_sid, e))
+
+    def indexPhoneNumbers(self, page_size=1000):
+        """Fetch every incoming number on the account, a page at a time.
+
+        Returns:
+            A dict of phone number resources keyed by E.164 number.
+        """
+        self.logger.debug("Retrieving all phone numbers on the account...")
+        index = {}
+        page = 0
+        while True:
+            try:
+                numbers = self.provisioner.call(self.client.phone_numbers.list,
+                                                page=page,
+                                                page_size=page_size)
+            except exceptions.TwilioException as e:
+                raise ConfigurationError("An error occurred retrieving your "
+                                         "phone numbers: {0}".format(e))
+            for number in numbers:
+                key = phone.normalize(number.phone_number) or \
+                    number.phone_number
+                index[key] = number
+            if len(numbers) < page_size:
+                return index
+            page += 1
+
+    def setPhoneNumberApplication(self, number, app):
+        self.logger.info("Setting {0} to use application sid: "
+                         "{1}".format(number.friendly_name, app.sid))
+        try:
+            self.provisioner.call(self.client.phone_numbers.update,
+                                  number.sid,
+                                  voice_application_sid=app.sid,
+                                  sms_application_sid=app.sid)
+            self.logger.debug("Number set.")
+        except exceptions.TwilioException as e:
+            raise ConfigurationError("An error occurred setting the "
+                                     "application sid for "
+                                     "{0}: "
+                                     "{1}".format(number.friendly_name, e))
+
     def createNewTwiMLApp(self, voice_url, sms_url):
         self.logger.debug("Asking user to create new app sid...")
         i = 0
@@ -156,7 +423,7 @@ class Configure(object):
                                                                         "nd F"
                                                                         "lask")
                     break
-                except TwilioException as e:
+                except exceptions.TwilioException as e:
                     raise ConfigurationError("Your Twilio app couldn't "
                                              "be created: {0}".format(e))
             elif choice == "n" or i >= 3:
@@ -177,12 +444,12 @@ class Configure(object):
                          "{0}".format(app_sid))
 
         try:
-            app = self.client.applications.update(app_sid, voice_url=voice_url,
-                                                  sms_url=sms_url,
-                                                  friendly_name="Hackpack for "
-                                                                "Heroku and "
-                                                                "Flask")
-        except TwilioException as e:
+            app = self.provisioner.call(self.client.applications.update,
+                                        app_sid, voice_url=voice_url,
+                                        sms_url=sms_url,
+                                        friendly_name="Hackpack for Heroku "
+                                                      "and Flask")
+        except exceptions.TwilioException as e:
             if "HTTP ERROR 404" in str(e):
                 raise ConfigurationError("This application sid was not "
                                          "found: {0}".format(app_sid))
@@ -201,8 +468,9 @@ class Configure(object):
         try:
             self.logger.debug("Getting sid for phone number: "
                               "{0}".format(phone_number))
-            number = self.client.phone_numbers.list(phone_number=phone_number)
-        except TwilioException as e:
+            number = self.provisioner.call(self.client.phone_numbers.list,
+                                           phone_number=phone_number)
+        except exceptions.TwilioException as e:
             raise ConfigurationError("An error setting the request URLs "
                                      "occured: {0}".format(e))
         if number:
@@ -249,7 +517,7 @@ class Configure(object):
                     self.logger.debug("Phone number purchased: "
                                       "{0}".format(number.friendly_name))
                     break
-                except TwilioException as e:
+                except exceptions.TwilioException as e:
                     raise ConfigurationError("Your Twilio app couldn't "
                                              "be created: {0}".format(e))
             elif choice == "n" or i >= 3:
@@ -274,6 +542,21 @@ class Configure(object):
     def getHerokuHostname(self, git_config_path='./.git/config'):
         self.logger.debug("Getting hostname from git configuration file: "
                           "{0}".format(git_config_path))
+        # The host only changes when the git configuration does.
+        cache_key = None
+        if self.cache:
+            try:
+                stat = os.stat(git_config_path)
+                cache_key = "{0}:{1}:{2}".format(
+                    os.path.abspath(git_config_path), stat.st_mtime,
+                    stat.st_size)
+            except OSError:
+                pass
+            host = cache_key and self.cache.get("hosts", cache_key)
+            if host:
+                self.logger.debug("Using cached host: {0}".format(host))
+                return host
+
         # Load git configuration
         try:
             self.logger.debug("Loading git config...")
@@ -292,6 +575,8 @@ class Configure(object):
 
         if subdomain:
             host = "http://{0}.herokuapp.com".format(subdomain.strip())
+            if cache_key:
+                self.cache.set("hosts", cache_key, host)
             self.logger.debug("Returning full host: {0}".format(host))
             return host
         else:
@@ -314,6 +599,32 @@ class Configure(object):
         return subprocess.call(envvars)
 
 
+def readPhoneNumbers(patterns):
+    """Yield phone numbers from files matching the glob patterns.
+
+    Files list one number per line; blank lines and lines starting with #
+    are skipped, and only the first column of comma separated lines is read.
+    """
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise ConfigurationError("No phone number files match: "
+                                     "{0}".format(pattern))
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    line = line.split(",", 1)[0].strip()
+                    if line and not line.startswith("#"):
+                        yield line
+
+
+def splitList(value):
+    """Split a comma separated command line value into a list."""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 class ConfigurationError(Exception):
     def __init__(self, message):
         logger = logging.getLogger(__name__)
@@ -344,10 +655,16 @@ def parse_args(args):
                         help="Create a new TwiML application sid to use for "
                              " your hackpack.")
     parser.add_argument("-a", "--app_sid", default=None,
-                        help="Configure specific AppSid to use your hackpack.")
+                        help="Configure specific AppSid to use your hackpack. "
+                             "Separate several with commas.")
     parser.add_argument("-#", "--phone-number", default=None,
                         help="Configure specific Twilio number to use your "
-                             "hackpack.")
+                             "hackpack. Separate several with commas.")
+    parser.add_argument("-f", "--numbers-file", default=None,
+                        action="append",
+                        help="File or glob of files listing Twilio numbers, "
+                             "one per line, to point at your AppSid. Only "
+                             "numbers configured differently are updated.")
     parser.add_argument("-v", "--voice_url", default=None,
                         help="Set the route for your Voice Request URL: "
                              "(e.g. '/voice').")
@@ -356,6 +673,20 @@ def parse_args(args):
                              "(e.g. '/sms').")
     parser.add_argument("-d", "--domain", default=None,
                         help="Set a custom domain.")
+    parser.add_argument("-c", "--concurrency", default=8, type=int,
+                        help="Most Twilio API requests to make at once.")
+    parser.add_argument("-r", "--refresh", default=False,
+                        action="store_true",
+                        help="Ignore cached Twilio resources and discover "
+                             "them again.")
+    parser.add_argument("--cache", dest="cache_path",
+                        default=os.environ.get("HACKPACK_CACHE",
+                                               DEFAULT_PATH),
+                        help="File to cache Twilio resources in between "
+                             "runs.")
+    parser.add_argument("--api", dest="api_base",
+                        default=os.environ.get("TWILIO_API_BASE", API_BASE),
+                        help="Twilio REST API to use.")
     parser.add_argument("-D", "--debug", default=False,
                         action="store_true", help="Turn on debug output.")
     configure = Configure()
@@ -367,6 +698,7 @@ def parse_args(args):
         configure.app_sid = None
     if configure.domain:
         configure.host = configure.domain
+    configure.provisioner.max_workers = configure.concurrency
 
     # Configure logger
     if configure.debug:
@@ -384,6 +716,8 @@ def parse_args(args):
     logger.setLevel(level)
 
     configure.logger = logger
+    configure.cache = ResourceCache(configure.cache_path,
+                                    refresh=configure.refresh, logger=logger)
 
     return configure
 
@@ -1,102 +1,343 @@
-import re
+import json
 
 from flask import Flask
+from flask import Response
+from flask import abort
 from flask import render_template
 from flask import url_for
 from flask import request
 
-from twilio import twiml
-from twilio.util import TwilioCapability
-
-# Declare and configure application
-app = Flask(__name__, static_url_path='/static')
-app.config.from_pyfile('local_settings.py')
-
-
-# Voice Request URL
-@app.route('/voice', methods=['GET', 'POST'])
-def voice():
-    response = twiml.Response()
-    response.say("Congratulations! You deployed the Twilio Hackpack "
-                 "for Heroku and Flask.")
-    return str(response)
-
-
-# SMS Request URL
-@app.route('/sms', methods=['GET', 'POST'])
-def sms():
-    response = twiml.Response()
-    response.sms("Congratulations! You deployed the Twilio Hackpack "
-                 "for Heroku and Flask.")
-    return str(response)
-
-
-# Twilio Client demo template
-@app.route('/client')
-def client():
-    configuration_error = None
-    for key in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_APP_SID',
-                'TWILIO_CALLER_ID'):
-        if not app.config.get(key, None):
-            configuration_error = "Missing from local_settings.py: " \
-                                  "{0}".format(key)
-            token = None
-
-    if not configuration_error:
-        capability = TwilioCapability(app.config['TWILIO_ACCOUNT_SID'],
-                                      app.config['TWILIO_AUTH_TOKEN'])
-        capability.allow_client_incoming("joey_ramone")
-        capability.allow_client_outgoing(app.config['TWILIO_APP_SID'])
-        token = capability.generate()
-    params = {'token': token}
-    return render_template('client.html', params=params,
-                           configuration_error=configuration_error)
-
-
-@app.route('/client/incoming', methods=['POST'])
-def client_incoming():
-    try:
-        from_number = request.values.get('PhoneNumber', None)
-
-        resp = twiml.Response()
-
-        if not from_number:
-            resp.say("Your app is missing a Phone Number. "
-                     "Make a request with a Phone Number to make outgoing "
-                     "calls with the Twilio hack pack.")
-            return str(resp)
-
-        if 'TWILIO_CALLER_ID' not in app.config:
-            resp.say(
-                "Your app is missing a Caller ID parameter. "
-                "Please add a Caller ID to make outgoing calls with Twilio "
-                "Client")
-            return str(resp)
-
-        with resp.dial(callerId=app.config['TWILIO_CALLER_ID']) as r:
+from . import phone
+from . import twiml
+from .assets import Assets
+from .cache import TwiMLCache
+from .conversations import ConversationEngine
+from .ivr import CallFlowLoader
+from .metrics import Metrics
+from .pages import PageCache
+from .ratelimit import DialLimiter
+from .rules import RulesLoader
+from .security import SignatureValidation
+from .security import compare_digest
+from .security import to_bytes
+from .settings import Settings
+from .status import StatusPipeline
+from .tenants import TenantRegistry
+from .tokens import CapabilityTokenCache
+from .tokens import parse_token_request
+
+GREETING = "Congratulations! You deployed the Twilio Hackpack for Heroku " \
+           "and Flask."
+
+
+def create_app(settings=None):
+    """Build and configure an application.
+
+    Args:
+        settings: Config values overriding those in local_settings.py.
+    """
+    # Declare and configure application
+    app = Flask(__name__, static_url_path='/static')
+    app.config.from_pyfile('local_settings.py')
+    if settings:
+        app.config.update(settings)
+
+    # Read and checked once; handlers never look at app.config.
+    config = app.extensions['settings'] = Settings.from_config(app.config)
+
+    # Fingerprinted, precompressed static files built by hackpack.assets.
+    Assets(app)
+
+    # Opt-in per-route instrumentation served at /metrics.
+    metrics = Metrics(app)
+
+    # Many accounts served from TENANTS_DIRECTORY, when configured, in
+    # place of the one in local_settings.
+    tenants = app.extensions['tenants'] = \
+        TenantRegistry.from_config(app.config)
+
+    # Opt-in X-Twilio-Signature checks for the webhook routes.
+    signatures = SignatureValidation(
+        app, validators=tenants.validator if tenants.enabled else None)
+
+    # Static TwiML responses are rendered once and served from memory.
+    twiml_cache = TwiMLCache(app)
+
+    # Twilio Client tokens are reused across page loads until near expiry.
+    token_cache = app.extensions['tokens'] = CapabilityTokenCache(
+        ttl=config.client_token_ttl, refresh=config.client_token_refresh)
+    token_batch_size = app.config.get('CLIENT_TOKEN_BATCH_SIZE', 1000)
+
+    # Multi-step SMS conversations, when enabled in local_settings.
+    conversations = app.extensions['conversations'] = \
+        ConversationEngine.from_config(app.config)
+
+    # Throttles outbound calls from /client/incoming, when enabled.
+    # Ten digit numbers dialled without a + are national numbers here.
+    dial_country_code = app.config.get('DIAL_COUNTRY_CODE',
+                                       phone.DEFAULT_COUNTRY_CODE)
+
+    dial_limiter = app.extensions['dial_limiter'] = \
+        DialLimiter.from_config(app.config)
+
+    # Status callbacks queued and written to SQLite, when configured.
+    status_pipeline = app.extensions['status'] = \
+        StatusPipeline.from_config(app.config)
+
+    # IVR menus for /voice, when a call flow file is configured.
+    call_flow = app.extensions['call_flow'] = \
+        CallFlowLoader(app.config.get('IVR_FLOW'))
+
+    # Responses chosen by caller, called number and message text, when a
+    # rules file is configured.
+    rules = app.extensions['rules'] = \
+        RulesLoader(app.config.get('RULES_FILE'))
+
+    def twiml_response(response):
+        with metrics.timer('twiml'):
+            return response.encode()
+
+    def render_page(template, **context):
+        with metrics.timer('template'):
+            return render_template(template, **context)
+
+    # HTML pages are rendered once per host and served precompressed.
+    pages = PageCache(app, render=render_page)
+
+    def webhook_settings():
+        if tenants.enabled:
+            return tenants.for_webhook().settings
+        return config
+
+    def page_settings():
+        if tenants.enabled:
+            tenant = tenants.for_page()
+            if tenant is None:
+                abort(404)
+            return tenant.settings
+        return config
+
+    @app.before_request
+    def check_tenant():
+        # Webhooks for accounts this deployment doesn't serve go no further.
+        if tenants.enabled and request.endpoint in signatures.endpoints \
+                and tenants.for_webhook() is None:
+            abort(404)
+
+    def greeting(name, render):
+        if tenants.enabled:
+            tenant = tenants.for_webhook()
+            text = tenant.greetings.get(name)
+            if text:
+                return tenant.document(name, lambda: render(text)).response(
+                    twiml_cache.content_type)
+        return twiml_cache.response(name)
+
+    # Canned voice greeting, rendered once.
+    def voice_greeting(text=GREETING):
+        response = twiml.Response()
+        response.say(text)
+        return twiml_response(response)
+
+    twiml_cache.register('voice', voice_greeting)
+
+    # Voice Request URL
+    @app.route('/voice', methods=['GET', 'POST'])
+    @signatures.protect
+    def voice():
+        if rules.enabled:
+            document = rules.match('voice', request.values.get('To', None),
+                                   request.values.get('From', None))
+            if document is not None:
+                return document.response(twiml_cache.content_type)
+        if call_flow.enabled:
+            return call_flow.respond().response(twiml_cache.content_type)
+        return greeting('voice', voice_greeting)
+
+    # IVR menu nodes and the digits callers press at them
+    @app.route('/voice/ivr/<node>', methods=['GET', 'POST'])
+    @signatures.protect
+    def voice_ivr(node):
+        document = call_flow.respond(node, request.values.get('Digits', None))
+        if document is None:
+            abort(404)
+        return document.response(twiml_cache.content_type)
+
+    # Canned SMS reply, rendered once.
+    def sms_greeting(text=GREETING):
+        response = twiml.Response()
+        response.sms(text)
+        return twiml_response(response)
+
+    twiml_cache.register('sms', sms_greeting)
+
+    # SMS Request URL
+    @app.route('/sms', methods=['GET', 'POST'])
+    @signatures.protect
+    def sms():
+        sender = request.values.get('From', None)
+        if rules.enabled:
+            document = rules.match('sms', request.values.get('To', None),
+                                   sender, request.values.get('Body', None))
+            if document is not None:
+                return document.response(twiml_cache.content_type)
+        if conversations.enabled and sender:
+            reply = conversations.reply(sender,
+                                        request.values.get('Body', None))
+            if reply is not None:
+                response = twiml.Response()
+                response.sms(reply)
+                return twiml_response(response)
+        return greeting('sms', sms_greeting)
+
+    # Twilio Client demo template
+    @app.route('/client')
+    def client():
+        settings = page_settings()
+        fill = {}
+        if not settings.configuration_error:
+            fill['token'] = token_cache.get(
+                settings.account_sid, settings.auth_token,
+                app_sid=settings.app_sid,
+                client_name=settings.client_identity)
+
+        def context():
+            params = {'token': pages.slot('token')}
+            return {'params': params,
+                    'configuration_error': settings.configuration_error}
+        return pages.response('client.html', context,
+                              key=(settings.account_sid,), fill=fill)
+
+    def json_response(data, status=200):
+        return Response(json.dumps(data, separators=(',', ':')),
+                        status=status, content_type='application/json')
+
+    # Tokens for any number of Twilio Client identities, as JSON, for front
+    # ends that keep their own agents signed in.
+    @app.route('/client/token', methods=['GET', 'POST'])
+    def client_token():
+        settings = page_settings()
+        if not settings.token_api_key:
+            abort(404)
+        if not compare_digest(
+                to_bytes(request.headers.get('Authorization', '')),
+                to_bytes('Bearer ' + settings.token_api_key)):
+            return json_response({'error': "Missing or wrong API key."}, 401)
+
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {'identities': request.values.getlist('identity'),
+                    'scopes': request.values.getlist('scope'),
+                    'ttl': request.values.get('ttl')}
+        try:
+            identities, scopes, ttl = parse_token_request(
+                data, settings.client_token_ttl, token_batch_size)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        for key, value in (('TWILIO_ACCOUNT_SID', settings.account_sid),
+                           ('TWILIO_AUTH_TOKEN', settings.auth_token),
+                           ('TWILIO_APP_SID', settings.app_sid or
+                            'outgoing' not in scopes)):
+            if not value:
+                return json_response({'error': "Not configured: "
+                                               "{0}".format(key)}, 503)
+
+        signer = token_cache.signer(settings.account_sid, settings.auth_token)
+        tokens = []
+        for identity in identities:
+            token, expires = signer.sign(
+                signer.scope(identity, settings.app_sid, scopes), ttl)
+            tokens.append({'identity': identity, 'token': token,
+                           'expires': expires})
+        return json_response({'tokens': tokens})
+
+    # Refusal for calls over the dialing rate limits, rendered once.
+    def dial_limited():
+        response = twiml.Response()
+        response.say("Too many calls. Please wait a minute and try again.")
+        response.hangup()
+        return twiml_response(response)
+
+    twiml_cache.register('dial_limited', dial_limited)
+
+    @app.route('/client/incoming', methods=['POST'])
+    @signatures.protect
+    def client_incoming():
+        try:
+            from_number = request.values.get('PhoneNumber', None)
+
+            resp = twiml.Response()
+
+            if not from_number:
+                resp.say("Your app is missing a Phone Number. "
+                         "Make a request with a Phone Number to make "
+                         "outgoing calls with the Twilio hack pack.")
+                return twiml_response(resp)
+
+            caller_id = webhook_settings().caller_id
+            if not caller_id:
+                resp.say(
+                    "Your app is missing a Caller ID parameter. "
+                    "Please add a Caller ID to make outgoing calls with "
+                    "Twilio Client")
+                return twiml_response(resp)
+
             # If we have a number, and it looks like a phone number:
-            if from_number and re.search('^[\d\(\)\- \+]+$', from_number):
-                r.number(from_number)
-            else:
-                r.say("We couldn't find a phone number to dial. Make sure "
-                      "you are sending a Phone Number when you make a "
-                      "request with Twilio Client")
-
-        return str(resp)
-
-    except:
-        resp = twiml.Response()
-        resp.say("An error occurred. Check your debugger at twilio dot com "
-                 "for more information.")
-        return str(resp)
-
-
-# Installation success page
-@app.route('/')
-def index():
-    params = {
-        'Voice Request URL': url_for('.voice', _external=True),
-        'SMS Request URL': url_for('.sms', _external=True),
-        'Client URL': url_for('.client', _external=True)}
-    return render_template('index.html', params=params,
-                           configuration_error=None)
+            number = phone.dial_string(from_number, dial_country_code)
+            if not number:
+                resp.say("We couldn't find a phone number to dial. Make "
+                         "sure you are sending a Phone Number when you "
+                         "make a request with Twilio Client")
+                return twiml_response(resp)
+
+            if not dial_limiter.allow(
+                    request.values.get('From') or request.remote_addr,
+                    number):
+                return twiml_cache.response('dial_limited')
+
+            with resp.dial(callerId=caller_id) as r:
+                r.number(number)
+
+            return twiml_response(resp)
+
+        except:
+            resp = twiml.Response()
+            resp.say("An error occurred. Check your debugger at twilio dot "
+                     "com for more information.")
+            return twiml_response(resp)
+
+    # Status Callback URL for calls and messages
+    @app.route('/status', methods=['POST'])
+    @signatures.protect
+    def status():
+        if not status_pipeline.enabled:
+            abort(404)
+        if not status_pipeline.put(request.form.to_dict()):
+            # Twilio retries callbacks refused while the queue is full.
+            return Response('', status=503, headers={'Retry-After': '1'})
+        return Response('', status=204)
+
+    # Installation success page
+    @app.route('/')
+    def index():
+        return pages.response('index.html', index_context)
+
+    def index_context():
+        params = {
+            'Voice Request URL': url_for('.voice', _external=True),
+            'SMS Request URL': url_for('.sms', _external=True),
+            'Client URL': url_for('.client', _external=True)}
+        return {'params': params, 'configuration_error': None}
+
+    # Called by hackpack.server as a worker exits, so status events already
+    # acknowledged to Twilio are written.
+    def shutdown():
+        status_pipeline.stop()
+    app.shutdown = shutdown
+
+    return app
+
+
+# The application configured from local_settings.py, for servers and
+# scripts that import it.
+app = create_app()
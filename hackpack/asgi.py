@@ -0,0 +1,140 @@
+'''
+ASGI adapter for the hackpack.
+
+Connections are held open on the asyncio event loop and only the Flask view
+itself runs on a bounded thread pool, so thousands of Twilio webhooks waiting
+on the network don't cost a thread each.  The Flask app stays the single
+source of route logic.
+
+Requires Python 3.5+ and an ASGI server such as uvicorn:
+
+    uvicorn hackpack.asgi:application
+'''
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WsgiToAsgi(object):
+    """Serve a WSGI application as an ASGI 3 application.
+
+    Args:
+        wsgi_app: The WSGI application, e.g. the Flask app.
+        max_workers: Threads available to run WSGI views concurrently.
+        max_body: Largest request body accepted, in bytes.
+    """
+
+    def __init__(self, wsgi_app, max_workers=None, max_body=1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or 16)
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body:
+                await self.send_response(send, '413 Request Entity Too Large',
+                                         [], [b''])
+                return
+            body.append(chunk)
+            if not message.get('more_body', False):
+                break
+
+        environ = self.environ(scope, b''.join(body))
+        loop = asyncio.get_event_loop()
+        status, headers, chunks = await loop.run_in_executor(
+            self.executor, self.run_wsgi, environ)
+        await self.send_response(send, status, headers, chunks)
+
+    async def send_response(self, send, status, headers, chunks):
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'),
+                         value.encode('latin-1'))
+                        for name, value in headers]})
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    def run_wsgi(self, environ):
+        response = []
+
+        def start_response(status, headers, exc_info=None):
+            response[:] = [status, headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response[0], response[1], chunks
+
+    def environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        path = scope['path'].encode('utf-8').decode('latin-1')
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': path,
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/{0}'.format(
+                scope.get('http_version', '1.1')),
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False}
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = 'HTTP_' + name
+            if key in environ:
+                value = environ[key] + ',' + value
+            environ[key] = value
+        return environ
+
+
+def create_application(wsgi_app=None, **kwargs):
+    if wsgi_app is None:
+        from .app import app as wsgi_app
+    return WsgiToAsgi(wsgi_app, **kwargs)
+
+
+application = create_application()
@@ -0,0 +1,231 @@
+'''
+Fingerprinted, precompressed static assets.
+
+The build step copies the pages' stylesheets and scripts out of
+hackpack/static, minifies the stylesheets, names each file after a hash of
+its content and writes .gz (and, with the brotli package, .br) siblings and
+a manifest into hackpack/build.  Built files are served from /assets/ with
+far-future Cache-Control headers, precompressed to suit Accept-Encoding.
+
+The build first downloads the third-party files the pages used to load from
+CDNs into hackpack/static, unless they are already there or --offline is
+given.  Until then, and until the build has run, templates link to the CDN
+or unbuilt copies instead.
+
+Usage:
+    python -m hackpack.assets [--offline]
+'''
+
+from argparse import ArgumentParser
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+from flask import request
+from flask import send_from_directory
+from flask import url_for
+from werkzeug.exceptions import NotFound
+
+from .pages import brotli
+from .pages import gzip_compress
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, 'static')
+BUILD_DIR = os.path.join(ROOT, 'build')
+MANIFEST = 'manifest.json'
+
+# Files in hackpack/static the pages link to.
+ASSETS = ('js/jquery-1.8.1.min.js', 'js/twilio.min.js', 'styles/index.css',
+          'styles/client.css')
+
+# Third-party files, and where they used to be loaded from.
+VENDOR = {
+    'js/jquery-1.8.1.min.js':
+        'https://ajax.googleapis.com/ajax/libs/jquery/1.8.1/jquery.min.js',
+    'js/twilio.min.js':
+        'https://static.twilio.com/libs/twiliojs/1.2/twilio.min.js',
+    'styles/client.css':
+        'https://static0.twilio.com/packages/quickstart/client.css'}
+
+MAX_AGE = 365 * 24 * 60 * 60
+
+# Content-Encoding of each precompressed sibling, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(text):
+    text = CSS_COMMENT.sub('', text)
+    text = CSS_SPACE.sub(' ', text)
+    text = CSS_PUNCTUATION.sub(r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def fingerprint(name, data):
+    base, extension = os.path.splitext(name)
+    return '{0}.{1}{2}'.format(base, hashlib.sha1(data).hexdigest()[:12],
+                               extension)
+
+
+def vendor(static_dir=STATIC_DIR, timeout=30, logger=None):
+    """Download the third-party files missing from static_dir.
+
+    A file that can't be downloaded is logged and left out, so pages keep
+    linking to its CDN URL.
+    """
+    try:
+        from urllib.request import urlopen
+    except ImportError:
+        from urllib2 import urlopen
+    logger = logger or logging.getLogger(__name__)
+    for name, url in sorted(VENDOR.items()):
+        path = os.path.join(static_dir, name)
+        if os.path.exists(path):
+            continue
+        logger.info("Vendoring {0} from {1}".format(name, url))
+        try:
+            response = urlopen(url, timeout=timeout)
+            try:
+                data = response.read()
+            finally:
+                response.close()
+        except (IOError, OSError) as e:
+            logger.warning("Could not vendor {0}, pages will load it from "
+                           "{1}: {2}".format(name, url, e))
+            continue
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def build(static_dir=STATIC_DIR, build_dir=BUILD_DIR, names=ASSETS,
+          logger=None):
+    """Build every asset found in static_dir and write the manifest.
+
+    Returns:
+        The manifest: each asset's name mapped to its built file and the
+        encodings it is available in.
+    """
+    logger = logger or logging.getLogger(__name__)
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+
+    manifest = {}
+    for name in names:
+        source = os.path.join(static_dir, name)
+        if not os.path.exists(source):
+            logger.warning("Skipping missing asset {0}".format(name))
+            continue
+        with open(source, 'rb') as f:
+            data = f.read()
+        if name.endswith('.css') and not name.endswith('.min.css'):
+            data = minify_css(data.decode('utf-8')).encode('utf-8')
+
+        built = fingerprint(name, data)
+        variants = {None: data, 'gzip': gzip_compress(data)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data)
+        suffixes = dict(ENCODINGS)
+        for encoding, content in variants.items():
+            path = os.path.join(build_dir, built + suffixes.get(encoding, ''))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(content)
+        manifest[name] = {
+            'file': built,
+            'encodings': sorted(encoding for encoding in variants
+                                if encoding)}
+        logger.info("Built {0} ({1} bytes)".format(built, len(data)))
+
+    with open(os.path.join(build_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets(object):
+    """Links templates to built assets and serves them.
+
+    Templates call asset_url('styles/index.css'), which gives the built
+    file's URL when there is one, the unbuilt copy in hackpack/static when
+    there isn't, and for vendored files not yet downloaded, their CDN URL.
+    """
+
+    def __init__(self, app=None, build_dir=BUILD_DIR):
+        self.build_dir = build_dir
+        self.manifest = {}
+        self.files = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['assets'] = self
+        self.static_dir = app.static_folder
+        self.load()
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.view)
+        app.add_template_global(self.url, 'asset_url')
+
+    def load(self):
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.manifest = {}
+        self.files = dict((entry['file'], entry)
+                          for entry in self.manifest.values())
+
+    def url(self, name):
+        entry = self.manifest.get(name)
+        if entry is not None:
+            return url_for('assets', filename=entry['file'])
+        if name in VENDOR and \
+                not os.path.exists(os.path.join(self.static_dir, name)):
+            return VENDOR[name]
+        return url_for('static', filename=name)
+
+    def view(self, filename):
+        entry = self.files.get(filename)
+        if entry is None:
+            raise NotFound()
+        accept = request.accept_encodings
+        encoding, suffix = None, ''
+        for candidate, candidate_suffix in ENCODINGS:
+            if candidate in entry['encodings'] and accept[candidate]:
+                encoding, suffix = candidate, candidate_suffix
+                break
+        response = send_from_directory(
+            self.build_dir, filename + suffix,
+            mimetype=mimetypes.guess_type(filename)[0],
+            cache_timeout=MAX_AGE)
+        response.headers['Cache-Control'] = \
+            'public, max-age={0}, immutable'.format(MAX_AGE)
+        response.headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def parse_args(args):
+    parser = ArgumentParser(description="Build the hackpack's static "
+                                        "assets.")
+    parser.add_argument("--offline", default=False, action="store_true",
+                        help="Don't download missing third-party assets.")
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    options = parse_args(sys.argv[1:])
+    if not options.offline:
+        vendor()
+    build()
@@ -0,0 +1,158 @@
+'''
+Response caches for the hackpack's webhooks.
+'''
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .lazy import lazy_import
+
+# Only the web app needs Flask; configure.py and campaign.py use LRUCache.
+flask = lazy_import('flask')
+
+
+class LRUCache(object):
+    """A thread-safe mapping that evicts its least recently used entry."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                return default
+            self._touch(key, value)
+            return value
+
+    def _touch(self, key, value):
+        try:
+            self.data.move_to_end(key)
+        except AttributeError:
+            # Python 2's OrderedDict has no move_to_end.
+            del self.data[key]
+            self.data[key] = value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = value
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.data.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+
+class CachedDocument(object):
+    """A rendered TwiML document, encoded once and served many times.
+
+    A request whose If-None-Match names the document's ETag gets a 304.
+    """
+    __slots__ = ('config', 'body', 'etag', 'headers')
+
+    def __init__(self, config, body):
+        self.config = config
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.headers = [('ETag', '"{0}"'.format(self.etag))]
+
+    def response(self, content_type):
+        if flask.request.if_none_match.contains(self.etag):
+            return flask.Response(status=304, headers=self.headers)
+        return flask.Response(self.body, content_type=content_type,
+                              headers=self.headers)
+
+
+class TwiMLCache(object):
+    """Caches the output of views whose TwiML never changes between requests.
+
+    Each view is rendered once, on first use or through warm(), and its
+    encoded bytes are served for every request after that.  Entries are
+    keyed by endpoint and by the values of the config keys the view reads,
+    so changing any of those keys in app.config renders a fresh document.
+
+    Usage:
+
+        @app.route('/voice', methods=['GET', 'POST'])
+        @twiml_cache.cached()
+        def voice():
+            ...
+    """
+    content_type = 'text/xml; charset=utf-8'
+
+    def __init__(self, app=None):
+        self.app = None
+        self.views = {}
+        self.documents = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['twiml_cache'] = self
+
+    def cached(self, config_keys=()):
+        """Decorate a view that takes no arguments and returns TwiML.
+
+        Args:
+            config_keys: app.config keys the view's output depends on.
+        """
+        def decorator(view):
+            endpoint = view.__name__
+            self.register(endpoint, view, config_keys)
+
+            def wrapper():
+                return self.response(endpoint)
+            wrapper.__name__ = view.__name__
+            wrapper.__doc__ = view.__doc__
+            return wrapper
+        return decorator
+
+    def register(self, endpoint, view, config_keys=()):
+        """Register a TwiML renderer without routing to it, to serve with
+        response(endpoint) from a view that only sometimes uses it."""
+        self.views[endpoint] = (view, tuple(config_keys))
+
+    def response(self, endpoint):
+        view, config_keys = self.views[endpoint]
+        config = self.app.config
+        values = tuple([config.get(key) for key in config_keys])
+
+        document = self.documents.get(endpoint)
+        if document is None or document.config != values:
+            document = self.render(endpoint, values)
+        return document.response(self.content_type)
+
+    def render(self, endpoint, values):
+        view = self.views[endpoint][0]
+        body = view()
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        document = CachedDocument(values, body)
+        self.documents[endpoint] = document
+        return document
+
+    def warm(self):
+        """Render every registered view ahead of the first request."""
+        with self.app.test_request_context():
+            for endpoint in self.views:
+                self.response(endpoint)
+
+    def clear(self):
+        self.documents.clear()
@@ -0,0 +1,236 @@
+'''
+Outbound SMS and voice campaigns.
+
+Recipients are streamed from a CSV file, normalized and deduplicated, then
+sent through a bounded pool of worker threads.  The workers share a pool of
+keep-alive connections to the Twilio REST API and one throttle, so the
+account's messages-per-second limit is respected.  Progress is checkpointed
+to a file so an interrupted run resumes where it stopped, and retries the
+recipients earlier runs failed to reach.
+'''
+
+import csv
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from . import phone
+from .provision import retry
+from .resource_cache import replace
+from .rest import RestSession
+
+
+def read_recipients(path, column='phone', country_code='1'):
+    """Yield each valid number in a CSV file's column once, in E.164.
+
+    The file is read a row at a time, so it may be far larger than memory;
+    only the numbers already seen are kept, to skip duplicates.  Files
+    without a header row are read from their first column.
+    """
+    with open(path) as f:
+        sample = f.readline()
+        f.seek(0)
+        if column in next(csv.reader([sample]), []):
+            numbers = (row.get(column) for row in csv.DictReader(f))
+        else:
+            numbers = (row[0] for row in csv.reader(f) if row)
+        for number in phone.unique(numbers, country_code):
+            yield number
+
+
+class TwilioSender(RestSession):
+    """Sends messages and places calls over the session's pooled keep-alive
+    connections."""
+
+    def post(self, resource, params):
+        response = self.request('POST', self.resource_path(resource),
+                                data=params)
+        return json.loads(response.content)
+
+    def send_message(self, to, from_, body):
+        return self.post('Messages', {'To': to, 'From': from_, 'Body': body})
+
+    def place_call(self, to, from_, url):
+        return self.post('Calls', {'To': to, 'From': from_, 'Url': url})
+
+
+class Throttle(object):
+    """Spaces out calls to wait() so no more than rate happen per second,
+    across every thread sharing it."""
+
+    def __init__(self, rate, clock=time.time, sleep=time.sleep):
+        self.interval = 1.0 / rate if rate else 0
+        self.clock = clock
+        self.sleep = sleep
+        self.next = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.next)
+            self.next = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+
+class Checkpoint(object):
+    """Records how many recipients, in file order, are finished, and which
+    of those failed.
+
+    Recipients complete out of order, so the checkpoint only advances past
+    an unbroken run of finished recipients; a resumed run may repeat the few
+    sends that were in flight, but never skips one.  Failed recipients are
+    kept by index until a later run reaches them.
+    """
+
+    def __init__(self, path=None, source=None, every=100):
+        self.path = path
+        self.source = source
+        self.every = every
+        self.done = 0
+        self.finished = set()
+        self.failed = set()
+        self.unsaved = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get('source') == self.source:
+            self.done = data.get('done', 0)
+            self.failed = set(data.get('failed', ()))
+        return self.done
+
+    def finish(self, index, failed=False):
+        with self.lock:
+            if failed:
+                self.failed.add(index)
+            else:
+                self.failed.discard(index)
+            if index >= self.done:
+                self.finished.add(index)
+            while self.done in self.finished:
+                self.finished.remove(self.done)
+                self.done += 1
+            self.unsaved += 1
+            if self.unsaved >= self.every:
+                self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        self.unsaved = 0
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'source': self.source, 'done': self.done,
+                       'failed': sorted(self.failed)}, f)
+        replace(temp_path, self.path)
+
+
+class Campaign(object):
+    """Sends one message, or places one call, to every recipient.
+
+    Args:
+        sender: A TwilioSender.
+        from_: Twilio number to send from.
+        body: Text of the message; or
+        url: TwiML URL for each call.
+        workers: Most requests in flight at once.
+        rate: Most requests started per second, across every worker.
+        checkpoint: A Checkpoint, to resume interrupted runs.
+    """
+
+    def __init__(self, sender, from_, body=None, url=None, workers=8,
+                 rate=1.0, checkpoint=None, retries=5, backoff=0.5,
+                 logger=None):
+        if bool(body) == bool(url):
+            raise ValueError("A campaign sends either a message body or a "
+                             "call url.")
+        self.sender = sender
+        self.from_ = from_
+        self.body = body
+        self.url = url
+        self.workers = workers
+        self.throttle = Throttle(rate)
+        self.checkpoint = checkpoint or Checkpoint()
+        self.retries = retries
+        self.backoff = backoff
+        self.logger = logger or logging.getLogger(__name__)
+        self.stats = {'sent': 0, 'failed': 0, 'skipped': 0}
+        self.stats_lock = threading.Lock()
+
+    def send(self, number):
+        if self.body:
+            return self.sender.send_message(number, self.from_, self.body)
+        return self.sender.place_call(number, self.from_, self.url)
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def work(self, pending):
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            index, number = item
+            self.throttle.wait()
+            failed = False
+            try:
+                retry(lambda: self.send(number), retries=self.retries,
+                      backoff=self.backoff)
+                self.count('sent')
+            except Exception as e:
+                self.logger.error("Could not reach {0}: {1}".format(
+                    number, e))
+                self.count('failed')
+                failed = True
+            self.checkpoint.finish(index, failed=failed)
+
+    def run(self, recipients):
+        """Send to every recipient not already finished in the checkpoint,
+        and again to those it records as failed.
+
+        Returns:
+            Counts of recipients sent, failed and skipped.
+        """
+        skip = self.checkpoint.load()
+        failed = set(self.checkpoint.failed)
+        # Bounded, so reading the file never runs far ahead of sending.
+        pending = queue.Queue(maxsize=self.workers * 4)
+        threads = [threading.Thread(target=self.work, args=(pending,))
+                   for _ in range(self.workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            for index, number in enumerate(recipients):
+                if index < skip and index not in failed:
+                    self.stats['skipped'] += 1
+                    continue
+                pending.put((index, number))
+        finally:
+            for _ in threads:
+                pending.put(None)
+            for thread in threads:
+                thread.join()
+            self.checkpoint.save()
+        return dict(self.stats)
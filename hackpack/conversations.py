@@ -0,0 +1,262 @@
+'''
+Multi-step SMS conversations.
+
+Each sender's progress through a conversation is kept in a session looked up
+by their phone number.  Sessions live in an in-process LRU by default, or in
+Redis (or anything speaking its protocol) when several workers or dynos need
+to share them.
+'''
+
+import json
+import logging
+import socket
+import threading
+import time
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+from .cache import LRUCache
+
+
+class Session(object):
+    """A sender's place in a conversation.
+
+    Attributes:
+        number: The sender's phone number.
+        step: Name of the step the next message is handled by; None for a
+            new conversation.
+        data: Answers collected so far.
+        updated: Time of the last message.
+    """
+    __slots__ = ('number', 'step', 'data', 'updated')
+
+    def __init__(self, number, step=None, data=None, updated=None):
+        self.number = number
+        self.step = step
+        self.data = data if data is not None else {}
+        self.updated = updated
+
+    def dumps(self):
+        return json.dumps([self.step, self.data, self.updated])
+
+    @classmethod
+    def loads(cls, number, value):
+        step, data, updated = json.loads(value)
+        return cls(number, step, data, updated)
+
+
+class MemorySessionStore(object):
+    """Sessions kept in this process, evicted when least recently used or
+    idle for longer than ttl seconds."""
+
+    def __init__(self, maxsize=100000, ttl=3600, clock=time.time):
+        self.sessions = LRUCache(maxsize)
+        self.ttl = ttl
+        self.clock = clock
+
+    def get(self, number):
+        session = self.sessions.get(number)
+        if session is not None and \
+                session.updated + self.ttl < self.clock():
+            self.sessions.pop(number)
+            return None
+        return session
+
+    def save(self, session):
+        self.sessions.set(session.number, session)
+
+    def delete(self, number):
+        self.sessions.pop(number)
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection(object):
+    """A minimal client for the Redis protocol (RESP)."""
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 timeout=5):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        parsed = urlparse(url)
+        db = parsed.path.lstrip('/')
+        return cls(host=parsed.hostname or 'localhost',
+                   port=parsed.port or 6379,
+                   db=int(db) if db else 0,
+                   password=parsed.password, **kwargs)
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address, self.timeout)
+        self.reader = self.sock.makefile('rb')
+        if self.password:
+            self.command('AUTH', self.password)
+        if self.db:
+            self.command('SELECT', self.db)
+
+    def close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+        self.sock = None
+        self.reader = None
+
+    def execute(self, *args):
+        """Send a command, reconnecting once if the connection dropped."""
+        try:
+            if self.sock is None:
+                self.connect()
+            return self.command(*args)
+        except (socket.error, IOError):
+            self.close()
+            self.connect()
+            return self.command(*args)
+
+    def command(self, *args):
+        parts = [b'*' + str(len(args)).encode('ascii') + b'\r\n']
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$' + str(len(arg)).encode('ascii') + b'\r\n' +
+                         arg + b'\r\n')
+        self.sock.sendall(b''.join(parts))
+        return self.read_reply()
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise IOError("Connection closed by server.")
+        kind, value = line[:1], line[1:-2]
+        if kind == b'+':
+            return value
+        if kind == b'-':
+            raise RedisError(value.decode('utf-8'))
+        if kind == b':':
+            return int(value)
+        if kind == b'$':
+            length = int(value)
+            if length < 0:
+                return None
+            return self.reader.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(value)
+            if length < 0:
+                return None
+            return [self.read_reply() for _ in range(length)]
+        raise RedisError("Unknown reply: {0!r}".format(line))
+
+
+class RedisSessionStore(object):
+    """Sessions kept in Redis so every worker and dyno shares them.
+
+    Each thread gets its own connection.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', ttl=3600,
+                 prefix='hackpack:sms:', clock=time.time):
+        self.url = url
+        self.ttl = ttl
+        self.prefix = prefix
+        self.clock = clock
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = \
+                RedisConnection.from_url(self.url)
+        return connection
+
+    def get(self, number):
+        value = self.connection.execute('GET', self.prefix + number)
+        if value is None:
+            return None
+        return Session.loads(number, value.decode('utf-8'))
+
+    def save(self, session):
+        self.connection.execute('SET', self.prefix + session.number,
+                                session.dumps(), 'EX', int(self.ttl))
+
+    def delete(self, number):
+        self.connection.execute('DEL', self.prefix + number)
+
+
+def ramones(session, body):
+    """An example conversation: learns the sender's name, then quizzes them
+    on the best band ever."""
+    if session.step is None:
+        session.step = 'name'
+        return "Congratulations! You deployed the Twilio Hackpack for " \
+               "Heroku and Flask. What's your name?"
+    if session.step == 'name':
+        session.data['name'] = body.strip() or 'friend'
+        session.step = 'band'
+        return "Nice to meet you, {0}! Who is the best band " \
+               "ever?".format(session.data['name'])
+    session.step = None
+    if 'ramones' in body.lower():
+        return "Correct, {0}. Gabba gabba hey!".format(session.data['name'])
+    return "Wrong, {0}. It's the Ramones.".format(session.data['name'])
+
+
+class ConversationEngine(object):
+    """Routes each inbound message to the sender's session.
+
+    Args:
+        store: Where sessions are kept, e.g. a MemorySessionStore.
+        handler: Called with (session, body) for every message; updates
+            session.step and session.data and returns the reply text.
+            Setting session.step to None ends the conversation.
+    """
+
+    def __init__(self, store, handler=ramones, enabled=True,
+                 clock=time.time, logger=None):
+        self.store = store
+        self.handler = handler
+        self.enabled = enabled
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config):
+        url = config.get('SMS_SESSION_URL')
+        ttl = config.get('SMS_SESSION_TTL', 3600)
+        if url:
+            store = RedisSessionStore(url, ttl=ttl)
+        else:
+            store = MemorySessionStore(ttl=ttl)
+        return cls(store, enabled=config.get('SMS_CONVERSATIONS', False))
+
+    def reply(self, number, body):
+        """Handle a message from number and return the reply text.
+
+        Returns None when the session store can't be reached, so the caller
+        can answer with its usual greeting instead.
+        """
+        try:
+            session = self.store.get(number) or Session(number)
+            reply = self.handler(session, body or '')
+            if session.step is None:
+                self.store.delete(number)
+            else:
+                session.updated = self.clock()
+                self.store.save(session)
+        except (IOError, RedisError) as e:
+            self.logger.error("Conversation session failed: {0}".format(e))
+            return None
+        return reply
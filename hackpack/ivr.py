@@ -0,0 +1,197 @@
+'''
+Declarative IVR call flows for /voice.
+
+A flow is a JSON (or YAML, with PyYAML installed) file of menu nodes:
+
+    {
+        "start": "main",
+        "nodes": {
+            "main": {
+                "say": "Press 1 for our hours, or 2 to hear a song.",
+                "gather": {"numDigits": 1, "timeout": 5},
+                "routes": {"1": "hours", "2": "song"}
+            },
+            "hours": {"say": "We are open noon to midnight.",
+                      "redirect": "main"},
+            "song": {"play": "http://example.com/blitzkrieg-bop.mp3",
+                     "hangup": true}
+        }
+    }
+
+Nodes may have:
+
+    say       Text, or a list of texts, to read to the caller.
+    play      URL, or a list of URLs, of audio to play.
+    gather    Attributes for <Gather>; present whenever routes is.
+    routes    Digits pressed mapped to the node to go to next.
+    default   Node for digits not in routes; repeats this node by default.
+    redirect  Node to continue at once this one finishes.
+    hangup    End the call once this node finishes.
+
+The flow is compiled once into a graph of pre-rendered TwiML, so handling a
+caller's digits is a dictionary lookup.  The file is checked for changes at
+most every few seconds and recompiled without restarting workers.
+'''
+
+import logging
+import time
+
+from . import twiml
+from .cache import CachedDocument
+from .reloader import FileReloader
+from .reloader import load_document
+
+
+class FlowError(Exception):
+    pass
+
+
+class CompiledNode(object):
+    __slots__ = ('name', 'document', 'routes', 'default')
+
+    def __init__(self, name, document):
+        self.name = name
+        self.document = document
+        self.routes = {}
+        self.default = document
+
+
+class CallFlow(object):
+    """A compiled call flow: every node's TwiML, rendered ahead of time."""
+
+    def __init__(self, start, nodes):
+        self.start = start
+        self.nodes = nodes
+
+    def respond(self, name, digits=None):
+        """Return the document for a caller at node name who pressed digits,
+        or None if there is no such node."""
+        node = self.nodes.get(name)
+        if node is None:
+            return None
+        if digits is None:
+            return node.document
+        return node.routes.get(digits, node.default)
+
+
+def node_url(prefix, name):
+    return '{0}/{1}'.format(prefix, name)
+
+
+def load_flow(path):
+    return load_document(path, FlowError)
+
+
+def compile_flow(definition, prefix='/voice/ivr'):
+    """Validate a flow definition and render every node's TwiML."""
+    if not isinstance(definition, dict) or \
+            not isinstance(definition.get('nodes'), dict):
+        raise FlowError("A call flow needs a 'nodes' object.")
+    nodes = definition['nodes']
+    start = definition.get('start', 'start')
+    if start not in nodes:
+        raise FlowError("Start node not found: {0}".format(start))
+
+    for name, node in nodes.items():
+        check_node(name, node)
+        for key in ('redirect', 'default'):
+            if node.get(key) is not None and node[key] not in nodes:
+                raise FlowError("Node {0} has an unknown {1}: "
+                                "{2}".format(name, key, node[key]))
+        for digits, target in node.get('routes', {}).items():
+            if target not in nodes:
+                raise FlowError("Node {0} routes {1} to an unknown node: "
+                                "{2}".format(name, digits, target))
+
+    compiled = dict((name, CompiledNode(name, render_node(name, node,
+                                                          prefix)))
+                    for name, node in nodes.items())
+    for name, node in nodes.items():
+        routes = compiled[name].routes
+        for digits, target in node.get('routes', {}).items():
+            routes[str(digits)] = compiled[target].document
+        if node.get('default'):
+            compiled[name].default = compiled[node['default']].document
+    return CallFlow(start, compiled)
+
+
+def check_node(name, node):
+    """Raise FlowError if a node's values are not of the types compile_flow
+    reads."""
+    if not isinstance(node, dict):
+        raise FlowError("Node {0} must be an object.".format(name))
+    for key in ('routes', 'gather'):
+        if not isinstance(node.get(key, {}), dict):
+            raise FlowError("Node {0} has a {1} that is not an "
+                            "object.".format(name, key))
+    for key in ('say', 'play'):
+        values = node.get(key) or []
+        if not isinstance(values, list):
+            values = [values]
+        if any(isinstance(value, (dict, list)) for value in values):
+            raise FlowError("Node {0} has a {1} that is not text or a list "
+                            "of texts.".format(name, key))
+    for key in ('redirect', 'default'):
+        if isinstance(node.get(key), (dict, list)):
+            raise FlowError("Node {0} has a {1} that is not a node "
+                            "name.".format(name, key))
+    for digits, target in node.get('routes', {}).items():
+        if isinstance(target, (dict, list)):
+            raise FlowError("Node {0} routes {1} to something that is not a "
+                            "node name.".format(name, digits))
+
+
+def render_node(name, node, prefix):
+    response = twiml.Response()
+    if node.get('routes'):
+        attributes = dict(node.get('gather', {}))
+        attributes.setdefault('action', node_url(prefix, name))
+        attributes.setdefault('method', 'POST')
+        with response.gather(**attributes) as gather:
+            add_prompts(gather, node)
+        # Callers who press nothing hear the menu again.
+        response.redirect(node_url(prefix, name), method='POST')
+    else:
+        add_prompts(response, node)
+        if node.get('redirect'):
+            response.redirect(node_url(prefix, node['redirect']),
+                              method='POST')
+        elif node.get('hangup'):
+            response.hangup()
+    return CachedDocument(None, response.encode())
+
+
+def add_prompts(verb, node):
+    for key, add in (('say', verb.say), ('play', verb.play)):
+        values = node.get(key) or []
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            add(value)
+
+
+class CallFlowLoader(FileReloader):
+    """Serves a compiled call flow, recompiling it when its file changes.
+
+    Args:
+        path: The flow's JSON or YAML file.
+        prefix: URL the flow's nodes are routed under.
+        check_interval: Least number of seconds between checks of the file.
+    """
+    errors = (FlowError,)
+    description = 'call flow'
+
+    def __init__(self, path=None, prefix='/voice/ivr', check_interval=2.0,
+                 clock=time.time, logger=None):
+        self.prefix = prefix
+        super(CallFlowLoader, self).__init__(
+            path, check_interval, clock, logger or logging.getLogger(__name__))
+
+    def compile(self, path):
+        return compile_flow(load_flow(path), self.prefix)
+
+    def respond(self, name=None, digits=None):
+        flow = self.current()
+        if flow is None:
+            return None
+        return flow.respond(name or flow.start, digits)
@@ -0,0 +1,34 @@
+'''
+Deferred imports.
+
+Importing anything from the twilio package imports its whole REST client,
+which takes longer than the rest of the hackpack put together.  Modules
+that only need twilio on some requests import it through lazy_import, so
+that starting a worker or running configure.py --help doesn't pay for it.
+'''
+
+import importlib
+
+
+class LazyModule(object):
+    """Stands in for a module until one of its attributes is used.
+
+    The first attribute lookup imports the module and copies its namespace
+    onto this object, so later lookups cost the same as on the module.
+    """
+
+    def __init__(self, name):
+        self.__dict__['__lazy_name__'] = name
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self.__dict__['__lazy_name__'])
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return '<lazy module {0!r}>'.format(self.__dict__['__lazy_name__'])
+
+
+def lazy_import(name):
+    """Return the module called name, imported when first used."""
+    return LazyModule(name)
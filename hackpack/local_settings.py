@@ -17,3 +17,75 @@ TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', None)
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', None)
 TWILIO_CALLER_ID = os.environ.get('TWILIO_CALLER_ID', None)
 TWILIO_APP_SID = os.environ.get('TWILIO_APP_SID', None)
+
+# Serve many Twilio accounts, each configured by a file in this directory
+# named after its AccountSid, instead of the one above.  See
+# hackpack/tenants.py for the format.  TENANTS_CACHE_SIZE accounts are kept
+# in memory.
+TENANTS_DIRECTORY = os.environ.get('HACKPACK_TENANTS', None)
+TENANTS_CACHE_SIZE = int(os.environ.get('TENANTS_CACHE_SIZE', 1024))
+
+# Twilio Client capability tokens live for CLIENT_TOKEN_TTL seconds and are
+# reused until CLIENT_TOKEN_REFRESH of that lifetime has passed.
+CLIENT_TOKEN_TTL = int(os.environ.get('CLIENT_TOKEN_TTL', 3600))
+CLIENT_TOKEN_REFRESH = float(os.environ.get('CLIENT_TOKEN_REFRESH', 0.5))
+
+# The Twilio Client name the /client page signs in as.
+CLIENT_IDENTITY = os.environ.get('HACKPACK_CLIENT_IDENTITY', 'joey_ramone')
+
+# /client/token issues tokens as JSON, up to CLIENT_TOKEN_BATCH_SIZE at a
+# time, to callers sending "Authorization: Bearer <CLIENT_TOKEN_API_KEY>".
+# It is off unless the key is set.
+CLIENT_TOKEN_API_KEY = os.environ.get('HACKPACK_TOKEN_API_KEY', None)
+CLIENT_TOKEN_BATCH_SIZE = int(os.environ.get('CLIENT_TOKEN_BATCH_SIZE', 1000))
+
+# Per-route metrics in Prometheus format at /metrics.
+METRICS_ENABLED = os.environ.get('HACKPACK_METRICS', '') in ('1', 'true')
+
+# Multi-step SMS conversations on /sms.  Sessions are kept in memory, or in
+# Redis when REDIS_URL is set.
+SMS_CONVERSATIONS = os.environ.get('HACKPACK_SMS_CONVERSATIONS',
+                                   '') in ('1', 'true')
+SMS_SESSION_URL = os.environ.get('REDIS_URL', None)
+SMS_SESSION_TTL = int(os.environ.get('SMS_SESSION_TTL', 3600))
+
+# JSON or YAML call flow file for IVR menus on /voice,
+# e.g. hackpack/flows/example.json.
+IVR_FLOW = os.environ.get('HACKPACK_IVR_FLOW', None)
+
+# JSON or YAML routing rules answering /voice and /sms by caller, called
+# number and message keywords, e.g. hackpack/flows/rules.json.
+RULES_FILE = os.environ.get('HACKPACK_RULES', None)
+
+# Refuse webhook requests without a valid X-Twilio-Signature.  Routes in
+# TWILIO_SIGNATURE_EXEMPT (comma separated endpoint names, e.g. "sms") are
+# left open, and a signature seen twice within TWILIO_REPLAY_TTL seconds is
+# refused as a replay.
+TWILIO_VALIDATE_SIGNATURES = os.environ.get('HACKPACK_VALIDATE_SIGNATURES',
+                                            '') in ('1', 'true')
+TWILIO_SIGNATURE_EXEMPT = [endpoint.strip() for endpoint in os.environ.get(
+    'TWILIO_SIGNATURE_EXEMPT', '').split(',') if endpoint.strip()]
+TWILIO_REPLAY_TTL = int(os.environ.get('TWILIO_REPLAY_TTL', 5))
+
+# The country calling code of ten digit numbers dialed from /client/incoming
+# without a +, e.g. 44 to take 2079460958 as a London number.
+DIAL_COUNTRY_CODE = os.environ.get('DIAL_COUNTRY_CODE', '1')
+
+# Rate limits on calls placed from /client/incoming, as "calls/seconds":
+# per Twilio Client identity, per number dialed, per prefix of
+# DIAL_PREFIX_LENGTH characters of the number, and in total.  Limits are
+# kept per process, or in Redis when DIAL_LIMIT_URL is set.
+DIAL_RATE_LIMITS = os.environ.get('HACKPACK_DIAL_LIMITS', '') in ('1', 'true')
+DIAL_LIMIT_CLIENT = os.environ.get('DIAL_LIMIT_CLIENT', '10/60')
+DIAL_LIMIT_NUMBER = os.environ.get('DIAL_LIMIT_NUMBER', '3/60')
+DIAL_LIMIT_PREFIX = os.environ.get('DIAL_LIMIT_PREFIX', '30/60')
+DIAL_PREFIX_LENGTH = int(os.environ.get('DIAL_PREFIX_LENGTH', 5))
+DIAL_LIMIT_TOTAL = os.environ.get('DIAL_LIMIT_TOTAL', '5/1')
+DIAL_LIMIT_URL = os.environ.get('DIAL_LIMIT_URL', None)
+
+# SQLite database /status writes StatusCallback events to; /status is off
+# when unset.  Callbacks are refused with 503 while STATUS_QUEUE_SIZE events
+# are waiting to be written.
+STATUS_DATABASE = os.environ.get('HACKPACK_STATUS_DB', None)
+STATUS_QUEUE_SIZE = int(os.environ.get('STATUS_QUEUE_SIZE', 10000))
+STATUS_BATCH_SIZE = int(os.environ.get('STATUS_BATCH_SIZE', 500))
@@ -0,0 +1,212 @@
+'''
+Per-route request instrumentation, exposed in Prometheus text format.
+
+Enable with METRICS_ENABLED in local_settings (or HACKPACK_METRICS=1 in the
+environment).  When disabled no request hooks or routes are registered, so
+the hot path pays nothing beyond a no-op timer in the few places that time
+TwiML serialization and template rendering.
+
+Each worker process keeps its own counts; scrape every worker, or run a
+single worker, to see the whole picture.
+'''
+
+import threading
+import timeit
+from bisect import bisect_left
+
+from flask import Response
+from flask import g
+from flask import request
+
+clock = timeit.default_timer
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+
+class Counter(object):
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield self.name, self.labelnames, labels, value
+
+
+class Histogram(object):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # One count per bucket plus +Inf, then sum.
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self.lock:
+            items = sorted((labels, list(series))
+                           for labels, series in self.series.items())
+        names = self.labelnames + ('le',)
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                yield (self.name + '_bucket', names,
+                       labels + (format_value(bound),), cumulative)
+            yield self.name + '_sum', self.labelnames, labels, series[-1]
+            yield self.name + '_count', self.labelnames, labels, cumulative
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ['{0}="{1}"'.format(name, str(value).replace('\\', '\\\\')
+                                                 .replace('"', '\\"'))
+             for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}'
+
+
+class Timer(object):
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe((request.endpoint or 'unknown',),
+                               clock() - self.start)
+        return False
+
+
+class NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics(object):
+    """Collects per-endpoint handler time, TwiML serialization time,
+    template render time and response size.
+
+    Usage:
+
+        metrics = Metrics(app)
+
+        with metrics.timer('twiml'):
+            body = str(response)
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.requests = Counter('hackpack_requests_total',
+                                'Requests handled.', ('endpoint', 'status'))
+        self.request_duration = Histogram(
+            'hackpack_request_duration_seconds',
+            'Time spent handling a request.', ('endpoint',))
+        self.response_size = Histogram(
+            'hackpack_response_size_bytes', 'Size of response bodies.',
+            ('endpoint',), buckets=SIZE_BUCKETS)
+        self.timers = {
+            'twiml': Histogram('hackpack_twiml_serialization_seconds',
+                               'Time spent serializing TwiML.',
+                               ('endpoint',)),
+            'template': Histogram('hackpack_template_render_seconds',
+                                  'Time spent rendering templates.',
+                                  ('endpoint',))}
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def collectors(self):
+        return [self.requests, self.request_duration, self.response_size] + \
+            [self.timers[name] for name in sorted(self.timers)]
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        self.enabled = bool(app.config.get('METRICS_ENABLED', False))
+        if not self.enabled:
+            return
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def timer(self, name):
+        """Context manager timing a block into the named histogram."""
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self.timers[name])
+
+    def start_request(self):
+        g.metrics_start = clock()
+
+    def finish_request(self, response):
+        start = getattr(g, 'metrics_start', None)
+        if start is None:
+            return response
+        labels = (request.endpoint or 'unknown',)
+        self.request_duration.observe(labels, clock() - start)
+        self.requests.inc(labels + (str(response.status_code),))
+        size = response.calculate_content_length()
+        if size is not None:
+            self.response_size.observe(labels, size)
+        return response
+
+    def render(self):
+        lines = []
+        for collector in self.collectors:
+            lines.append('# HELP {0} {1}'.format(collector.name,
+                                                 collector.help))
+            lines.append('# TYPE {0} {1}'.format(collector.name,
+                                                 collector.type))
+            for name, labelnames, labels, value in collector.samples():
+                lines.append('{0}{1} {2}'.format(
+                    name, format_labels(labelnames, labels),
+                    format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        return Response(self.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
@@ -0,0 +1,193 @@
+'''
+Pre-rendered, precompressed HTML pages.
+
+A page's template is rendered once per host and per set of values it
+depends on.  Values that change from request to request, like a Twilio
+Client token, are rendered as slots and spliced into the pre-rendered text,
+so templates are never rendered on the hot path.  Each finished page is
+kept with gzip (and, if the brotli package is installed, brotli) variants
+and an ETag, so uptime probes and repeat visitors mostly get a 304.
+
+Cached pages are dropped whenever a file in the app's template folder
+changes.
+'''
+
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+
+from flask import Response
+from flask import render_template
+from flask import request
+from markupsafe import escape
+
+from .cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SLOT = '@@hackpack-slot:{0}@@'
+SLOTS = re.compile(SLOT.format(r'(\w+)'))
+
+
+def gzip_compress(data):
+    # wbits=31 writes a gzip container with no timestamp, so the output is
+    # the same every time.
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class CompressedPage(object):
+    """A finished page's bytes, its compressed variants and its ETag.
+
+    The headers for each variant are built once, up front.
+    """
+    __slots__ = ('variants', 'etags')
+
+    def __init__(self, body, cache_control='no-cache'):
+        etag = hashlib.sha1(body).hexdigest()
+        encoded = [(None, body), ('gzip', gzip_compress(body))]
+        if brotli is not None:
+            encoded.append(('br', brotli.compress(body)))
+        self.variants = {}
+        self.etags = {}
+        for encoding, data in encoded:
+            tag = etag + '-' + encoding if encoding else etag
+            headers = [('ETag', '"{0}"'.format(tag)),
+                       ('Vary', 'Accept-Encoding'),
+                       ('Cache-Control', cache_control)]
+            if encoding:
+                headers.append(('Content-Encoding', encoding))
+            self.variants[encoding] = (data, headers)
+            self.etags[encoding] = tag
+
+    def encoding(self):
+        accept = request.accept_encodings
+        if 'br' in self.variants and accept['br']:
+            return 'br'
+        if accept['gzip']:
+            return 'gzip'
+        return None
+
+    def response(self, content_type):
+        encoding = self.encoding()
+        body, headers = self.variants[encoding]
+        if request.if_none_match.contains(self.etags[encoding]):
+            return Response(status=304, headers=headers[:3])
+        return Response(body, headers=headers, content_type=content_type)
+
+
+class PageCache(object):
+    """Serves template pages rendered once per host and set of values.
+
+    Usage:
+
+        pages = PageCache(app)
+
+        @app.route('/client')
+        def client():
+            token = ...
+            return pages.response(
+                'client.html',
+                lambda: {'token': pages.slot('token')},
+                fill={'token': token})
+
+    Args:
+        render: Renders a template with a context, like render_template.
+        check_interval: Least number of seconds between checks of the
+            template folder for changes.
+    """
+    content_type = 'text/html; charset=utf-8'
+
+    def __init__(self, app=None, render=render_template, maxsize=256,
+                 check_interval=2.0, clock=time.time):
+        self.app = None
+        self.render = render
+        self.templates = LRUCache(maxsize)
+        self.pages = LRUCache(maxsize)
+        self.check_interval = check_interval
+        self.clock = clock
+        self.checked = 0
+        self.mtime = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['pages'] = self
+        self.mtime = self.template_mtime()
+
+    def slot(self, name):
+        """Placeholder for a value filled in on every request."""
+        return SLOT.format(name)
+
+    def response(self, template, context, key=(), fill=None):
+        """Serve template, rendering it only if it isn't cached.
+
+        Args:
+            template: Template name.
+            context: Callable returning the template's context; only called
+                when the page is rendered.
+            key: Values, besides the host, the rendered page depends on.
+            fill: Values for the page's slots, escaped and spliced in.
+        """
+        self.check_templates()
+        fill = fill or {}
+        names = tuple(sorted(fill))
+        template_key = (template, request.host_url, tuple(key), names)
+        page_key = (template_key, tuple([fill[name] for name in names]))
+
+        page = self.pages.get(page_key)
+        if page is None:
+            segments = self.templates.get(template_key)
+            if segments is None:
+                segments = SLOTS.split(self.render(template, **context()))
+                self.templates.set(template_key, segments)
+            page = CompressedPage(self.splice(segments, fill).encode('utf-8'),
+                                  'private, no-cache' if fill else 'no-cache')
+            self.pages.set(page_key, page)
+        return page.response(self.content_type)
+
+    def splice(self, segments, fill):
+        # Split on SLOTS, segments alternates text and slot names.
+        parts = list(segments)
+        for i in range(1, len(parts), 2):
+            parts[i] = escape(fill[parts[i]])
+        return ''.join(parts)
+
+    def template_mtime(self):
+        latest = 0
+        for folder in getattr(self.app.jinja_loader, 'searchpath', []):
+            for root, dirs, files in os.walk(folder):
+                for name in files:
+                    latest = max(latest, os.stat(os.path.join(root, name))
+                                 .st_mtime)
+        return latest
+
+    def check_templates(self):
+        now = self.clock()
+        if now - self.checked < self.check_interval or \
+                not self.lock.acquire(False):
+            return
+        try:
+            self.checked = now
+            mtime = self.template_mtime()
+            if mtime != self.mtime:
+                self.mtime = mtime
+                self.clear()
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.templates.clear()
+        self.pages.clear()
+        # Jinja doesn't recheck templates itself unless auto_reload is on.
+        cache = getattr(self.app.jinja_env, 'cache', None)
+        if cache is not None:
+            cache.clear()
@@ -0,0 +1,115 @@
+'''
+Phone number validation and normalization.
+
+Numbers are normalized to E.164 (e.g. +15558675309) so that the same phone
+number written different ways is always dialled, deduplicated and compared
+as one string.  Ten digit numbers written without a + are taken to be
+national numbers in DEFAULT_COUNTRY_CODE, or the country code given.
+
+Short codes and local numbers, such as 911 or 555-1234, have no E.164 form.
+dial_string() passes them to Twilio as their digits instead of refusing
+them.
+'''
+
+import re
+
+from .cache import LRUCache
+
+# Characters a caller may reasonably type into a phone number.
+PHONE_NUMBER = re.compile(r'^\+?[\d\(\)\-\. ]+$')
+NON_DIGIT = re.compile(r'\D')
+E164 = re.compile(r'^\+[1-9]\d{7,14}$')
+# Most digits in a phone number, per E.164.
+MAX_DIGITS = 15
+
+DEFAULT_COUNTRY_CODE = '1'
+
+_normalized = LRUCache(maxsize=4096)
+
+
+def normalize(number, country_code=DEFAULT_COUNTRY_CODE):
+    """Normalize a phone number to E.164.
+
+    Ten digit numbers without a leading + are treated as national numbers
+    and prefixed with country_code.
+
+    Args:
+        number: The phone number as entered, e.g. '+1 (555) 867-5309'.
+        country_code: Country calling code for national numbers.
+
+    Returns:
+        The number in E.164 format, or None if it is not a phone number.
+    """
+    if not number:
+        return None
+    key = (number, country_code)
+    result = _normalized.get(key, False)
+    if result is False:
+        result = _normalize(number, country_code)
+        _normalized.set(key, result)
+    return result
+
+
+def _normalize(number, country_code):
+    number = number.strip()
+    if not PHONE_NUMBER.match(number):
+        return None
+    digits = NON_DIGIT.sub('', number)
+    if not number.startswith('+') and len(digits) == 10:
+        digits = country_code + digits
+    candidate = '+' + digits
+    if E164.match(candidate):
+        return candidate
+    return None
+
+
+def dial_string(number, country_code=DEFAULT_COUNTRY_CODE):
+    """The number to dial for a phone number as entered.
+
+    Returns:
+        The number in E.164 format when it has one; otherwise, for a number
+        entered without a +, e.g. the short code '911', its digits; or None
+        if it is not a phone number.
+    """
+    result = normalize(number, country_code)
+    if result is None and number:
+        number = number.strip()
+        digits = NON_DIGIT.sub('', number)
+        if PHONE_NUMBER.match(number) and not number.startswith('+') and \
+                0 < len(digits) <= MAX_DIGITS:
+            result = digits
+    return result
+
+
+def normalize_many(numbers, country_code=DEFAULT_COUNTRY_CODE):
+    """Normalize a sequence of phone numbers in one pass.
+
+    Returns:
+        A list the same length as numbers holding each E.164 number, or None
+        where the input was not a phone number.
+    """
+    get = _normalized.get
+    store = _normalized.set
+    results = []
+    append = results.append
+    for number in numbers:
+        if not number:
+            append(None)
+            continue
+        key = (number, country_code)
+        result = get(key, False)
+        if result is False:
+            result = _normalize(number, country_code)
+            store(key, result)
+        append(result)
+    return results
+
+
+def unique(numbers, country_code=DEFAULT_COUNTRY_CODE):
+    """Yield each valid number once, in E.164, in first-seen order."""
+    seen = set()
+    for number in numbers:
+        number = normalize(number, country_code)
+        if number and number not in seen:
+            seen.add(number)
+            yield number
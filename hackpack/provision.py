@@ -0,0 +1,117 @@
+'''
+Concurrent Twilio REST provisioning.
+
+Runs independent REST calls on a bounded pool of threads and retries calls
+that Twilio rate limits (HTTP 429) with exponential backoff.
+'''
+
+import logging
+import random
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .lazy import lazy_import
+
+exceptions = lazy_import('twilio.rest.exceptions')
+
+RETRY_STATUSES = (429,)
+
+
+def retry(func, retries=5, backoff=0.5, max_backoff=16.0, sleep=time.sleep):
+    """Call func, retrying with jittered exponential backoff while Twilio
+    answers 429 Too Many Requests.
+
+    Args:
+        func: Callable taking no arguments.
+        retries: Retries after the first attempt before giving up.
+        backoff: Seconds to wait before the first retry; doubles each time.
+        max_backoff: Longest wait between attempts, in seconds.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except exceptions.TwilioRestException as e:
+            if e.status not in RETRY_STATUSES or attempt >= retries:
+                raise
+            delay = min(max_backoff, backoff * (2 ** attempt))
+            sleep(delay / 2 + random.uniform(0, delay / 2))
+            attempt += 1
+
+
+def run_concurrently(calls, max_workers=8):
+    """Run zero-argument callables on up to max_workers threads.
+
+    Returns:
+        Their results, in the order the calls were given.
+
+    Raises:
+        The first exception raised by any call, once every call has finished.
+    """
+    calls = list(calls)
+    if len(calls) <= 1 or max_workers <= 1:
+        return [call() for call in calls]
+
+    results = [None] * len(calls)
+    errors = []
+    pending = queue.Queue()
+    for item in enumerate(calls):
+        pending.put(item)
+
+    def work():
+        while True:
+            try:
+                index, call = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[index] = call()
+            except Exception as e:
+                errors.append((index, e))
+
+    threads = [threading.Thread(target=work)
+               for _ in range(min(max_workers, len(calls)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise sorted(errors, key=lambda error: error[0])[0][1]
+    return results
+
+
+class Provisioner(object):
+    """Makes Twilio REST calls with retries, optionally many at once.
+
+    Args:
+        max_workers: Most REST calls in flight at the same time.
+        retries: Retries per call when rate limited.
+        backoff: Initial backoff in seconds when rate limited.
+    """
+
+    def __init__(self, max_workers=8, retries=5, backoff=0.5, logger=None):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.logger = logger or logging.getLogger(__name__)
+
+    def call(self, func, *args, **kwargs):
+        return retry(lambda: func(*args, **kwargs), retries=self.retries,
+                     backoff=self.backoff)
+
+    def run(self, calls):
+        """Run zero-argument callables concurrently; see run_concurrently."""
+        return run_concurrently(calls, max_workers=self.max_workers)
+
+    def map(self, func, items):
+        """Call func(item) for every item concurrently, with retries."""
+        return self.run([self._bind(func, item) for item in items])
+
+    def _bind(self, func, item):
+        return lambda: self.call(func, item)
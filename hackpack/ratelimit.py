@@ -0,0 +1,200 @@
+'''
+Rate limits for outbound dialing from /client/incoming.
+
+Each call is checked against token buckets keyed by the Twilio Client
+identity placing it, the number dialed and that number's prefix, and then
+against a global cap shared by every caller.  Buckets live in this process,
+spread over independently locked stripes so that threads rarely contend, or
+in Redis when every dyno must share the same limits.
+'''
+
+import logging
+import threading
+import time
+
+from .cache import LRUCache
+from .conversations import RedisConnection
+from .conversations import RedisError
+
+
+class Limit(object):
+    """Allow count calls per period seconds, in bursts of up to count."""
+    __slots__ = ('count', 'period')
+
+    def __init__(self, count, period=1.0):
+        self.count = count
+        self.period = period
+
+    @classmethod
+    def parse(cls, value):
+        """Parse 'count/seconds', e.g. '10/60'; None or '' is no limit."""
+        if not value:
+            return None
+        if isinstance(value, cls):
+            return value
+        count, _, period = str(value).partition('/')
+        return cls(int(count), float(period or 1))
+
+    @property
+    def rate(self):
+        return self.count / float(self.period)
+
+    def __repr__(self):
+        return 'Limit({0!r}, {1!r})'.format(self.count, self.period)
+
+
+class TokenBucket(object):
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class MemoryBuckets(object):
+    """Token buckets kept in this process.
+
+    Keys are spread over stripes, each with its own lock and its own LRU of
+    buckets, so threads checking different callers don't wait on each other
+    and idle buckets are evicted.
+    """
+
+    def __init__(self, stripes=32, maxsize=100000, clock=time.time):
+        self.stripes = [(threading.Lock(), LRUCache(maxsize // stripes or 1))
+                        for _ in range(stripes)]
+        self.clock = clock
+
+    def take(self, key, limit):
+        """Take a token from key's bucket; return False if it is empty."""
+        lock, buckets = self.stripes[hash(key) % len(self.stripes)]
+        with lock:
+            now = self.clock()
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(limit.count, now)
+                buckets.set(key, bucket)
+            else:
+                bucket.tokens = min(limit.count, bucket.tokens +
+                                    (now - bucket.updated) * limit.rate)
+                bucket.updated = now
+            if bucket.tokens < 1:
+                return False
+            bucket.tokens -= 1
+            return True
+
+    def give(self, key, limit):
+        """Return a token taken from key's bucket."""
+        lock, buckets = self.stripes[hash(key) % len(self.stripes)]
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.tokens = min(limit.count, bucket.tokens + 1)
+
+
+class RedisBuckets(object):
+    """Limits kept in Redis, shared by every worker and dyno.
+
+    Counts calls in fixed windows of the limit's period with INCR, which is
+    a little burstier at window edges than a token bucket.  If Redis can't
+    be reached calls are allowed rather than refused.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0',
+                 prefix='hackpack:limit:', clock=time.time, logger=None):
+        self.url = url
+        self.prefix = prefix
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = \
+                RedisConnection.from_url(self.url)
+        return connection
+
+    def name(self, key, limit):
+        window = int(self.clock() // limit.period)
+        return '{0}{1}:{2}'.format(self.prefix, key, window)
+
+    def take(self, key, limit):
+        name = self.name(key, limit)
+        try:
+            count = self.connection.execute('INCR', name)
+            if count == 1:
+                self.connection.execute('EXPIRE', name,
+                                        int(limit.period) + 1)
+        except (IOError, RedisError) as e:
+            self.logger.error("Rate limit check failed: {0}".format(e))
+            return True
+        return count <= limit.count
+
+    def give(self, key, limit):
+        try:
+            self.connection.execute('DECR', self.name(key, limit))
+        except (IOError, RedisError) as e:
+            self.logger.error("Rate limit refund failed: {0}".format(e))
+
+
+class DialLimiter(object):
+    """Decides whether an outbound call may be placed.
+
+    Args:
+        buckets: MemoryBuckets or RedisBuckets.
+        client: Limit per Twilio Client identity.
+        number: Limit per number dialed.
+        prefix: Limit per prefix of prefix_length characters of the number
+            dialed, e.g. '+1900' for a length of 5.
+        total: Limit on every call placed by this app.
+    """
+
+    def __init__(self, buckets, client=None, number=None, prefix=None,
+                 prefix_length=5, total=None, enabled=True):
+        self.buckets = buckets
+        self.client = client
+        self.number = number
+        self.prefix = prefix
+        self.prefix_length = prefix_length
+        self.total = total
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, config):
+        url = config.get('DIAL_LIMIT_URL')
+        if url:
+            buckets = RedisBuckets(url)
+        else:
+            buckets = MemoryBuckets()
+        return cls(buckets,
+                   client=Limit.parse(config.get('DIAL_LIMIT_CLIENT')),
+                   number=Limit.parse(config.get('DIAL_LIMIT_NUMBER')),
+                   prefix=Limit.parse(config.get('DIAL_LIMIT_PREFIX')),
+                   prefix_length=config.get('DIAL_PREFIX_LENGTH', 5),
+                   total=Limit.parse(config.get('DIAL_LIMIT_TOTAL')),
+                   enabled=config.get('DIAL_RATE_LIMITS', False))
+
+    def allow(self, identity, number):
+        """Return True if identity may dial number now.
+
+        The most specific limits are checked first, so a caller over their
+        own limit doesn't use up the global allowance, and tokens taken for
+        a call another limit refuses are given back.
+        """
+        if not self.enabled:
+            return True
+        checks = ((self.client, 'caller:' + (identity or '')),
+                  (self.number, 'number:' + number),
+                  (self.prefix, 'prefix:' + number[:self.prefix_length]),
+                  (self.total, 'total'))
+        taken = []
+        for limit, key in checks:
+            if limit is None:
+                continue
+            if not self.buckets.take(key, limit):
+                for limit, key in taken:
+                    self.buckets.give(key, limit)
+                return False
+            taken.append((limit, key))
+        return True
@@ -0,0 +1,106 @@
+'''
+Configuration files that are reloaded while the app runs.
+
+The IVR call flow and the routing rules are JSON or YAML files compiled
+once, checked for changes at most every few seconds and recompiled without
+restarting workers.  A file that fails to load or compile is logged and the
+previous version keeps serving.
+'''
+
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+if yaml is None:
+    YAML_ERRORS = ()
+else:
+    YAML_ERRORS = (yaml.YAMLError,)
+
+
+def load_document(path, error=ValueError):
+    """Read a JSON file, or a YAML one if PyYAML is installed.
+
+    Raises:
+        error: The file is YAML and can't be read as such.
+    """
+    with open(path) as f:
+        if not path.endswith(('.yaml', '.yml')):
+            return json.load(f)
+        if yaml is None:
+            raise error("PyYAML is required to load {0}; "
+                        "pip install PyYAML".format(path))
+        try:
+            return yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise error("Invalid YAML in {0}: {1}".format(path, e))
+
+
+class FileReloader(object):
+    """Serves what compile() makes of a file, compiling it again when the
+    file's modification time changes.
+
+    Subclasses implement compile(path) and list the exceptions it raises
+    for a bad file in errors.
+
+    Args:
+        path: The file; None to serve nothing.
+        check_interval: Least number of seconds between checks of the file.
+    """
+    errors = ()
+    description = 'file'
+
+    def __init__(self, path=None, check_interval=2.0, clock=time.time,
+                 logger=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.value = None
+        self.mtime = None
+        self.checked = 0
+        self.lock = threading.Lock()
+        if path:
+            self.reload()
+
+    @property
+    def enabled(self):
+        return self.value is not None
+
+    def compile(self, path):
+        raise NotImplementedError
+
+    def reload(self):
+        """Compile the file; on error the previous version keeps serving."""
+        mtime = os.stat(self.path).st_mtime
+        value = self.compile(self.path)
+        self.value = value
+        self.mtime = mtime
+        self.logger.info("Loaded {0} from {1}".format(self.describe(value),
+                                                      self.path))
+        return value
+
+    def describe(self, value):
+        return self.description
+
+    def current(self):
+        errors = (OSError, IOError, ValueError) + YAML_ERRORS + self.errors
+        now = self.clock()
+        if self.path and now - self.checked >= self.check_interval and \
+                self.lock.acquire(False):
+            try:
+                self.checked = now
+                if os.stat(self.path).st_mtime != self.mtime:
+                    self.reload()
+            except errors as e:
+                self.logger.error("Could not reload {0} {1}: {2}".format(
+                    self.description, self.path, e))
+            finally:
+                self.lock.release()
+        return self.value
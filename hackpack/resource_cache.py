@@ -0,0 +1,97 @@
+'''
+On-disk cache of Twilio account resources for configure.py.
+
+Remembers application and phone number sids, the URLs last applied to them
+and the Heroku host resolved from .git/config, so configuring an already
+configured hackpack needs one verification request instead of a full
+discovery.
+'''
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+DEFAULT_PATH = '.hackpack_cache.json'
+DEFAULT_TTL = 24 * 60 * 60
+
+# os.rename won't replace an existing file on Windows.
+replace = getattr(os, 'replace', os.rename)
+
+
+class ResourceCache(object):
+    """A JSON file of cached values, grouped in sections, that expire.
+
+    Args:
+        path: File the cache is read from and saved to.
+        ttl: Default lifetime of an entry in seconds.
+        refresh: Ignore cached values; new values are still saved.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, refresh=False,
+                 clock=time.time, logger=None):
+        self.path = path
+        self.ttl = ttl
+        self.refresh = refresh
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.data = None
+        self.dirty = False
+
+    def load(self):
+        if self.data is not None:
+            return self.data
+        try:
+            with open(self.path) as f:
+                self.data = json.load(f)
+            if not isinstance(self.data, dict):
+                raise ValueError("Cache is not a JSON object.")
+        except (IOError, OSError, ValueError) as e:
+            self.logger.debug("Starting with an empty resource cache: "
+                              "{0}".format(e))
+            self.data = {}
+        return self.data
+
+    def get(self, section, key):
+        if self.refresh:
+            return None
+        entry = self.load().get(section, {}).get(key)
+        if entry is None or entry.get('expires', 0) < self.clock():
+            return None
+        return entry['value']
+
+    def set(self, section, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.load().setdefault(section, {})[key] = {
+            'value': value,
+            'expires': self.clock() + ttl}
+        self.dirty = True
+
+    def delete(self, section, key):
+        if self.load().get(section, {}).pop(key, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        """Write the cache atomically, dropping expired entries."""
+        if not self.dirty:
+            return
+        now = self.clock()
+        data = {}
+        for section, entries in self.load().items():
+            live = dict((key, entry) for key, entry in entries.items()
+                        if entry.get('expires', 0) >= now)
+            if live:
+                data[section] = live
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            replace(temp_path, self.path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+        self.data = data
+        self.dirty = False
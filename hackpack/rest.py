@@ -0,0 +1,293 @@
+'''
+A shared client for the Twilio REST API.
+
+RestSession keeps a pool of keep-alive connections to the API, so any number
+of threads reuse a few connections instead of each opening its own.  A GET
+for a URL another thread is already fetching waits for that answer instead
+of being sent again, and the time each endpoint takes is recorded for
+stats().
+
+rest_client() wraps a session in the twilio library's TwilioRestClient, so
+code written against the library, like configure.py, gets the same pooling.
+'''
+
+import base64
+import json
+import re
+import socket
+import threading
+import time
+from functools import partial
+
+try:
+    from http.client import HTTPConnection
+    from http.client import HTTPException
+    from http.client import HTTPSConnection
+    from urllib.parse import urlencode
+    from urllib.parse import urlparse
+except ImportError:
+    from httplib import HTTPConnection
+    from httplib import HTTPException
+    from httplib import HTTPSConnection
+    from urllib import urlencode
+    from urlparse import urlparse
+
+from .lazy import lazy_import
+
+exceptions = lazy_import('twilio.rest.exceptions')
+resources = lazy_import('twilio.rest.resources')
+twilio_rest = lazy_import('twilio.rest')
+
+API_BASE = 'https://api.twilio.com'
+API_VERSION = '2010-04-01'
+
+# Sids in a path, so stats count every phone number's updates as one
+# endpoint.
+SID = re.compile(r'/[A-Z]{2}[0-9a-z]{6,}(?=[/.]|$)')
+
+
+class Response(object):
+    """The parts of a response the twilio library's resources read."""
+    __slots__ = ('status_code', 'content', 'url')
+
+    def __init__(self, status_code, content, url):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class Call(object):
+    """A GET in flight, which requests for the same URL wait on."""
+    __slots__ = ('done', 'response', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class RestSession(object):
+    """Sends requests to the Twilio REST API over pooled keep-alive
+    connections.
+
+    Errors are raised as TwilioRestException, like the twilio library's own
+    client, so provision.retry can back off when rate limited.
+
+    Args:
+        base: The API's URL; tests point it at a local server.
+        maxsize: Most idle connections kept open for reuse.
+    """
+
+    def __init__(self, account_sid, auth_token, base=API_BASE, timeout=30,
+                 maxsize=8, clock=time.time):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.base_url = base.rstrip('/')
+        self.base = urlparse(self.base_url)
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.clock = clock
+        credentials = '{0}:{1}'.format(account_sid, auth_token)
+        self.headers = {
+            'Authorization': 'Basic ' + base64.b64encode(
+                credentials.encode('utf-8')).decode('ascii'),
+            'Accept': 'application/json'}
+        self.form_headers = dict(
+            self.headers, **{'Content-Type':
+                             'application/x-www-form-urlencoded'})
+        self.idle = []
+        self.in_flight = {}
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.base.scheme == 'https':
+            factory = HTTPSConnection
+        else:
+            factory = HTTPConnection
+        return factory(self.base.netloc, timeout=self.timeout)
+
+    def acquire(self):
+        """Return a connection, and whether it was idle in the pool."""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop(), True
+        return self.connect(), False
+
+    def release(self, connection):
+        with self.lock:
+            if len(self.idle) < self.maxsize:
+                self.idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+
+    def resource_path(self, resource):
+        """The path of one of the account's list resources, e.g. Messages."""
+        return '{0}/{1}/Accounts/{2}/{3}.json'.format(
+            self.base.path, API_VERSION, self.account_sid, resource)
+
+    def request(self, method, url, params=None, data=None):
+        """Send a request and return its Response.
+
+        Args:
+            url: A path, or a full URL on the API's host.
+            params: Query string parameters.
+            data: Form parameters for the body.
+        """
+        parsed = urlparse(url)
+        path = parsed.path
+        if parsed.query:
+            path += '?' + parsed.query
+        if params:
+            path += ('&' if parsed.query else '?') + urlencode(
+                sorted(params.items()), doseq=True)
+        if method == 'GET':
+            return self.get(path)
+        if data is not None:
+            data = urlencode(sorted(data.items()), doseq=True)
+        return self.send(method, path, data)
+
+    def get(self, path):
+        with self.lock:
+            call = self.in_flight.get(path)
+            leader = call is None
+            if leader:
+                call = self.in_flight[path] = Call()
+        if not leader:
+            call.done.wait()
+            self.record('GET', path, coalesced=True)
+            if call.error is not None:
+                raise call.error
+            return call.response
+
+        try:
+            call.response = self.send('GET', path)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[path]
+            call.done.set()
+        return call.response
+
+    def send(self, method, path, body=None):
+        headers = self.headers if body is None else self.form_headers
+        start = self.clock()
+        try:
+            status, content = self.exchange(method, path, body, headers)
+        except Exception:
+            self.record(method, path, self.clock() - start, error=True)
+            raise
+        self.record(method, path, self.clock() - start, error=status >= 400)
+
+        if status >= 400:
+            try:
+                error = json.loads(content)
+            except ValueError:
+                error = {}
+            raise exceptions.TwilioRestException(
+                status, path, error.get('message', content),
+                error.get('code'), method)
+        return Response(status, content, self.base_url + path)
+
+    def exchange(self, method, path, body, headers):
+        connection, reused = self.acquire()
+        try:
+            response = self.start(connection, method, path, body, headers)
+        except (socket.error, HTTPException) as e:
+            # A pooled connection the server closed while it sat idle fails
+            # before the request is handled, so it is safe to send again.  A
+            # timeout, or a failure on a new connection, may mean it is being
+            # handled, and sending it again could send a message twice.
+            if not reused or isinstance(e, socket.timeout):
+                raise
+            connection = self.connect()
+            response = self.start(connection, method, path, body, headers)
+        try:
+            content = response.read().decode('utf-8')
+        except Exception:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self.release(connection)
+        return response.status, content
+
+    def start(self, connection, method, path, body, headers):
+        """Send a request and read the status line and headers of its
+        response."""
+        try:
+            connection.request(method, path, body, headers)
+            return connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+
+    def record(self, method, path, seconds=0, error=False, coalesced=False):
+        endpoint = '{0} {1}'.format(method, SID.sub('/{sid}',
+                                                    path.split('?', 1)[0]))
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    'requests': 0, 'errors': 0, 'coalesced': 0,
+                    'seconds': 0.0, 'max_seconds': 0.0}
+            if coalesced:
+                stats['coalesced'] += 1
+                return
+            stats['requests'] += 1
+            stats['errors'] += error
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def stats(self):
+        """Requests, errors, coalesced GETs and latency per endpoint."""
+        with self.lock:
+            endpoints = [(endpoint, dict(stats))
+                         for endpoint, stats in self.endpoints.items()]
+        result = {}
+        for endpoint, stats in endpoints:
+            requests = stats['requests']
+            result[endpoint] = {
+                'requests': requests,
+                'errors': stats['errors'],
+                'coalesced': stats['coalesced'],
+                'mean_ms': stats['seconds'] / requests * 1e3 if requests
+                else 0.0,
+                'max_ms': stats['max_seconds'] * 1e3}
+        return result
+
+
+def resource_request(session, resource, method, uri, params=None, data=None,
+                     **kwargs):
+    """twilio's Resource.request, sent through session."""
+    if resource.use_json_extension:
+        uri += '.json'
+    response = session.request(method, uri, params=params, data=data)
+    if method == 'DELETE':
+        return response, {}
+    return response, json.loads(response.content)
+
+
+def rest_client(session):
+    """A twilio TwilioRestClient whose list resources, like applications and
+    phone_numbers, send their requests through session."""
+    client = twilio_rest.TwilioRestClient(session.account_sid,
+                                          session.auth_token,
+                                          base=session.base_url)
+    for resource in list(vars(client).values()):
+        if isinstance(resource, resources.Resource):
+            resource.request = partial(resource_request, session, resource)
+    return client
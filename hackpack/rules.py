@@ -0,0 +1,290 @@
+'''
+Routing rules for /voice and /sms.
+
+A rules file is a JSON (or YAML, with PyYAML installed) list of responses
+and the calls or messages they answer:
+
+    {
+        "rules": [
+            {"keywords": ["stop", "unsubscribe"],
+             "sms": "You won't hear from us again."},
+            {"to": "+15558675309", "keywords": "hours",
+             "sms": "We are open noon to midnight."},
+            {"from": ["+1212", "+1646"], "say": "Hello, New York!",
+             "hangup": true}
+        ]
+    }
+
+Rules may match on:
+
+    to        Called number, or prefixes of it (a string or a list).
+    from      Caller's number, or prefixes of it.
+    keywords  Words or phrases, any of which must appear in the message
+              body; case is ignored and partial words don't match.
+
+and answer with:
+
+    sms       Reply to a message.
+    say       Text, or a list of texts, to read to a caller.
+    play      URL, or a list of URLs, of audio to play to a caller.
+    redirect  URL to continue the call at.
+    hangup    End the call.
+
+The first rule, in file order, that matches every condition it has answers
+the request; when none does, the routes answer as they would without rules.
+
+Rules are compiled once into a prefix trie per number field and an
+Aho-Corasick automaton for keywords, each yielding a bitmask of the rules
+they satisfy, so matching costs about the same for ten rules or ten
+thousand.  Each rule's TwiML is rendered when it is compiled.  The file is
+checked for changes at most every few seconds; the new rules are compiled in
+full before they replace the old ones, so requests never see a partial set.
+'''
+
+from collections import deque
+import logging
+import time
+
+from . import twiml
+from .cache import CachedDocument
+from .reloader import FileReloader
+from .reloader import load_document
+
+VOICE_ACTIONS = ('say', 'play', 'redirect', 'hangup')
+
+
+class RuleError(Exception):
+    pass
+
+
+class PrefixTrie(object):
+    """Maps strings to the masks of every prefix added for them."""
+    __slots__ = ('root',)
+
+    def __init__(self):
+        # Each node is [children, mask].
+        self.root = [{}, 0]
+
+    def add(self, prefix, mask):
+        node = self.root
+        for char in prefix:
+            child = node[0].get(char)
+            if child is None:
+                child = node[0][char] = [{}, 0]
+            node = child
+        node[1] |= mask
+
+    def match(self, text):
+        node = self.root
+        mask = node[1]
+        for char in text:
+            node = node[0].get(char)
+            if node is None:
+                break
+            mask |= node[1]
+        return mask
+
+
+class KeywordAutomaton(object):
+    """Aho-Corasick automaton finding whole-word keywords in a text.
+
+    Keywords are matched case-insensitively, and only where they are not
+    part of a longer word.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.built = True
+
+    def add(self, keyword, mask):
+        keyword = keyword.lower()
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append((len(keyword), mask))
+        self.built = False
+
+    def build(self):
+        """Link each state to the longest proper suffix also in the
+        automaton, breadth first."""
+        goto, fail, output = self.goto, self.fail, self.output
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in goto[state].items():
+                pending.append(next_state)
+                suffix = fail[state]
+                while suffix and char not in goto[suffix]:
+                    suffix = fail[suffix]
+                fail[next_state] = goto[suffix].get(char, 0)
+                output[next_state] = output[next_state] + \
+                    output[fail[next_state]]
+        self.built = True
+
+    def match(self, text):
+        if not self.built:
+            self.build()
+        goto, fail, output = self.goto, self.fail, self.output
+        text = text.lower()
+        end = len(text) - 1
+        mask = 0
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            for length, bits in output[state]:
+                start = i - length + 1
+                if (start == 0 or not text[start - 1].isalnum()) and \
+                        (i == end or not text[i + 1].isalnum()):
+                    mask |= bits
+        return mask
+
+
+def as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def render_voice(rule):
+    response = twiml.Response()
+    for text in as_list(rule.get('say')):
+        response.say(text)
+    for url in as_list(rule.get('play')):
+        response.play(url)
+    if rule.get('redirect'):
+        response.redirect(rule['redirect'])
+    elif rule.get('hangup'):
+        response.hangup()
+    return CachedDocument(None, response.encode())
+
+
+def render_sms(rule):
+    response = twiml.Response()
+    response.sms(rule['sms'])
+    return CachedDocument(None, response.encode())
+
+
+class RuleIndex(object):
+    """A compiled set of rules."""
+
+    def __init__(self, rules=()):
+        self.to = PrefixTrie()
+        self.from_ = PrefixTrie()
+        self.keywords = KeywordAutomaton()
+        # Rules without a condition on a field match every value of it.
+        self.any_to = self.any_from = self.any_body = 0
+        self.channels = {'voice': 0, 'sms': 0}
+        self.documents = {'voice': {}, 'sms': {}}
+        self.count = 0
+        for position, rule in enumerate(rules):
+            self.add(position, rule)
+        self.keywords.build()
+
+    def __len__(self):
+        return self.count
+
+    def add(self, position, rule):
+        if not isinstance(rule, dict):
+            raise RuleError("Rule {0} is not an object.".format(position))
+        bit = 1 << position
+        voice = any(rule.get(key) for key in VOICE_ACTIONS)
+        if not voice and not rule.get('sms'):
+            raise RuleError("Rule {0} has no response.".format(position))
+        if rule.get('keywords') and not rule.get('sms'):
+            raise RuleError("Rule {0} has keywords but no sms "
+                            "reply.".format(position))
+
+        for key, trie, wildcard in (('to', self.to, 'any_to'),
+                                    ('from', self.from_, 'any_from')):
+            prefixes = as_list(rule.get(key))
+            if not prefixes:
+                setattr(self, wildcard, getattr(self, wildcard) | bit)
+            for prefix in prefixes:
+                trie.add(str(prefix).strip(), bit)
+        keywords = [str(keyword).strip() for keyword
+                    in as_list(rule.get('keywords'))]
+        if not keywords:
+            self.any_body |= bit
+        for keyword in keywords:
+            if not keyword:
+                raise RuleError("Rule {0} has an empty "
+                                "keyword.".format(position))
+            self.keywords.add(keyword, bit)
+
+        if voice:
+            self.channels['voice'] |= bit
+            self.documents['voice'][position] = render_voice(rule)
+        if rule.get('sms'):
+            self.channels['sms'] |= bit
+            self.documents['sms'][position] = render_sms(rule)
+        self.count += 1
+
+    def match(self, channel, to=None, from_=None, body=None):
+        """Return the document of the first rule for channel ('voice' or
+        'sms') matching a request, or None."""
+        mask = self.channels[channel]
+        # Each structure is only searched if a candidate depends on it.
+        if mask & ~self.any_to:
+            mask &= self.any_to | self.to.match(to or '')
+        if mask & ~self.any_from:
+            mask &= self.any_from | self.from_.match(from_ or '')
+        if mask & ~self.any_body:
+            mask &= self.any_body | self.keywords.match(body or '')
+        if not mask:
+            return None
+        # The lowest set bit is the rule earliest in the file.
+        return self.documents[channel][(mask & -mask).bit_length() - 1]
+
+
+def load_rules(path):
+    definition = load_document(path, RuleError)
+    if not isinstance(definition, dict) or \
+            not isinstance(definition.get('rules'), list):
+        raise RuleError("A rules file needs a 'rules' list.")
+    return definition['rules']
+
+
+class RulesLoader(FileReloader):
+    """Serves a compiled rules file, recompiling it when the file changes.
+
+    To change the rules without a window where the file is half written,
+    write the new file beside the old one and rename it over it.
+
+    Args:
+        path: The rules' JSON or YAML file.
+        check_interval: Least number of seconds between checks of the file.
+    """
+    errors = (RuleError,)
+    description = 'routing rules'
+
+    def __init__(self, path=None, check_interval=2.0, clock=time.time,
+                 logger=None):
+        super(RulesLoader, self).__init__(
+            path, check_interval, clock, logger or logging.getLogger(__name__))
+
+    def compile(self, path):
+        return RuleIndex(load_rules(path))
+
+    def describe(self, index):
+        return '{0} routing rules'.format(len(index))
+
+    def match(self, channel, to=None, from_=None, body=None):
+        index = self.current()
+        if index is None:
+            return None
+        return index.match(channel, to, from_, body)
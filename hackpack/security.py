@@ -0,0 +1,206 @@
+'''
+Twilio request signature validation for the hackpack's webhooks.
+
+Twilio signs every webhook with an HMAC-SHA1 of the URL it requested and the
+POSTed form parameters, sorted by name, keyed with the account's auth token,
+and sends it in the X-Twilio-Signature header.  Requests to protected routes
+that are unsigned, wrongly signed or replayed are refused with 403 Forbidden
+before the view runs, so forged traffic never reaches TwiML rendering or
+dialing.  A signature only counts as seen once its request has been answered
+without a server error, so Twilio's retries of a 5xx are still accepted.
+
+Enable with TWILIO_VALIDATE_SIGNATURES in local_settings (or
+HACKPACK_VALIDATE_SIGNATURES=1 in the environment).
+'''
+
+import base64
+import hmac
+import logging
+import time
+from hashlib import sha1
+
+from flask import Response
+from flask import g
+from flask import request
+
+from .cache import LRUCache
+
+try:
+    compare_digest = hmac.compare_digest
+except AttributeError:
+    # Python 2.7 before 2.7.7.
+    def compare_digest(a, b):
+        if len(a) != len(b):
+            return False
+        result = 0
+        for x, y in zip(bytearray(a), bytearray(b)):
+            result |= x ^ y
+        return result == 0
+
+
+def to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return value.encode('utf-8')
+
+
+class RequestValidator(object):
+    """Checks X-Twilio-Signature values for one auth token.
+
+    The HMAC key schedule is computed once and copied for every request, and
+    the URL and parameters are hashed in a single update.
+
+    Args:
+        auth_token: The account's auth token.
+        replay_ttl: Seconds a signature is remembered; the same signature
+            seen again within that time is refused.  0 turns this off.
+        replay_maxsize: Most signatures remembered at once.
+    """
+
+    def __init__(self, auth_token, replay_ttl=5, replay_maxsize=100000,
+                 clock=time.time):
+        self.mac = hmac.new(to_bytes(auth_token), digestmod=sha1)
+        self.replay_ttl = replay_ttl
+        self.seen = LRUCache(replay_maxsize)
+        self.clock = clock
+
+    def compute_signature(self, url, params=()):
+        """Return the base64 signature Twilio sends for url and params,
+        where params is a sequence of (name, [values]) pairs."""
+        parts = [url]
+        for name, values in sorted(params):
+            for value in sorted(values):
+                parts.append(name)
+                parts.append(value)
+        mac = self.mac.copy()
+        mac.update(to_bytes(''.join(parts)))
+        return base64.b64encode(mac.digest())
+
+    def check(self, url, params, signature):
+        """Return True if signature is valid for url and params and hasn't
+        been remembered within replay_ttl seconds."""
+        if not signature:
+            return False
+        signature = to_bytes(signature)
+        if not compare_digest(self.compute_signature(url, params),
+                              signature):
+            return False
+        if self.replay_ttl:
+            expires = self.seen.get(signature)
+            if expires is not None and expires > self.clock():
+                return False
+        return True
+
+    def remember(self, signature):
+        """Refuse signature for the next replay_ttl seconds."""
+        if self.replay_ttl:
+            self.seen.set(to_bytes(signature),
+                          self.clock() + self.replay_ttl)
+
+    def validate(self, url, params, signature):
+        """check() the signature and, if it passes, remember() it."""
+        if not self.check(url, params, signature):
+            return False
+        self.remember(signature)
+        return True
+
+
+def request_url():
+    """The URL Twilio requested, as it signed it.
+
+    Heroku's router terminates TLS, so the scheme comes from
+    X-Forwarded-Proto when it is set.  The query string is used exactly as
+    sent.
+    """
+    url = request.base_url
+    scheme = request.headers.get('X-Forwarded-Proto')
+    if scheme and not url.startswith(scheme + ':'):
+        url = scheme + url[url.index(':'):]
+    query = request.environ.get('QUERY_STRING')
+    if query:
+        url = url + '?' + query
+    return url
+
+
+class SignatureValidation(object):
+    """Refuses unsigned requests to the webhook routes it protects.
+
+    Usage:
+
+        signatures = SignatureValidation(app)
+
+        @app.route('/voice', methods=['POST'])
+        @signatures.protect
+        def voice():
+            ...
+
+    Routes named in TWILIO_SIGNATURE_EXEMPT are left unprotected.  A
+    request's signature is remembered against replays only once it has been
+    answered with a status below 500.
+
+    Args:
+        validators: For apps serving several accounts, a callable returning
+            the RequestValidator for the current request's account, or None
+            to refuse it.  Otherwise every request is checked against
+            TWILIO_AUTH_TOKEN.
+    """
+
+    def __init__(self, app=None, validators=None):
+        self.enabled = False
+        self.endpoints = set()
+        self.exempt = set()
+        self.validator = None
+        self.validators = validators
+        self.logger = logging.getLogger(__name__)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['signatures'] = self
+        self.enabled = bool(app.config.get('TWILIO_VALIDATE_SIGNATURES',
+                                           False))
+        if not self.enabled:
+            return
+        if self.validators is None:
+            auth_token = app.config.get('TWILIO_AUTH_TOKEN')
+            if not auth_token:
+                raise ValueError("TWILIO_VALIDATE_SIGNATURES needs "
+                                 "TWILIO_AUTH_TOKEN to be set.")
+            self.validator = RequestValidator(
+                auth_token,
+                replay_ttl=app.config.get('TWILIO_REPLAY_TTL', 5))
+        self.exempt = set(app.config.get('TWILIO_SIGNATURE_EXEMPT', ()))
+        app.before_request(self.check_request)
+        app.after_request(self.remember_signature)
+
+    def protect(self, view):
+        """Mark a view as a Twilio webhook whose requests must be signed."""
+        self.endpoints.add(view.__name__)
+        return view
+
+    def check_request(self):
+        endpoint = request.endpoint
+        if endpoint not in self.endpoints or endpoint in self.exempt:
+            return None
+        if request.method == 'POST':
+            params = request.form.lists()
+        else:
+            params = ()
+        validator = self.validator
+        if self.validators is not None:
+            validator = self.validators()
+        signature = request.headers.get('X-Twilio-Signature')
+        if validator is not None and validator.check(request_url(), params,
+                                                     signature):
+            g.twilio_signature = (validator, signature)
+            return None
+        self.logger.warning("Refused unsigned request to {0}".format(
+            request.path))
+        return Response('', status=403)
+
+    def remember_signature(self, response):
+        checked = getattr(g, 'twilio_signature', None)
+        if checked is not None and response.status_code < 500:
+            validator, signature = checked
+            validator.remember(signature)
+        return response
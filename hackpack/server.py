@@ -0,0 +1,306 @@
+'''
+Pre-forking, multi-threaded launcher for running the hackpack in production.
+
+The master process loads the app, binds the listening socket and forks
+worker processes which share it.  Each worker serves requests on a fixed
+pool of threads.
+
+Tuning knobs are read from the environment:
+
+    PORT                      Port to listen on (default 5000)
+    WEB_CONCURRENCY           Worker processes (default: number of CPUs)
+    HACKPACK_THREADS          Threads per worker (default 4)
+    HACKPACK_MAX_REQUESTS     Recycle a worker after this many requests
+                              (default 0, never)
+    HACKPACK_GRACEFUL_TIMEOUT Seconds workers get to finish in-flight
+                              requests on reload or shutdown (default 30)
+
+Signals sent to the master:
+
+    SIGHUP            Gracefully replace every worker.  Old workers still
+                      busy after the graceful timeout are killed.
+    SIGTERM, SIGINT   Gracefully stop every worker, then exit.
+
+A worker that fails within MIN_UPTIME seconds of starting is replaced after
+a delay that doubles with each such failure, up to MAX_BACKOFF seconds.
+'''
+
+import errno
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from werkzeug.serving import BaseWSGIServer
+
+MIN_UPTIME = 1.0
+MAX_BACKOFF = 30.0
+
+
+class ServerSettings(object):
+    def __init__(self, host='0.0.0.0', port=5000, workers=1, threads=4,
+                 max_requests=0, graceful_timeout=30):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.max_requests = max_requests
+        self.graceful_timeout = graceful_timeout
+
+    @classmethod
+    def from_environ(cls, environ=None, host='0.0.0.0'):
+        environ = os.environ if environ is None else environ
+        try:
+            cpus = multiprocessing.cpu_count()
+        except NotImplementedError:
+            cpus = 1
+        return cls(host=host,
+                   port=int(environ.get('PORT', 5000)),
+                   workers=int(environ.get('WEB_CONCURRENCY', cpus)),
+                   threads=int(environ.get('HACKPACK_THREADS', 4)),
+                   max_requests=int(environ.get('HACKPACK_MAX_REQUESTS', 0)),
+                   graceful_timeout=float(
+                       environ.get('HACKPACK_GRACEFUL_TIMEOUT', 30)))
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """A WSGI server handling requests on a fixed pool of threads.
+
+    Once max_requests requests have been accepted the server stops
+    accepting new connections, finishes the ones it has and returns from
+    serve_forever().
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads=4, max_requests=0, fd=None):
+        BaseWSGIServer.__init__(self, host, port, app, fd=fd)
+        self.threads = threads
+        self.max_requests = max_requests
+        self.requests_handled = 0
+        self.requests = queue.Queue()
+        self.pool = []
+
+    def serve_forever(self):
+        self.pool = [threading.Thread(target=self.process_requests)
+                     for _ in range(self.threads)]
+        for thread in self.pool:
+            thread.daemon = True
+            thread.start()
+        try:
+            BaseWSGIServer.serve_forever(self)
+        finally:
+            for thread in self.pool:
+                self.requests.put(None)
+            for thread in self.pool:
+                thread.join()
+
+    def process_request(self, request, client_address):
+        self.requests.put((request, client_address))
+        self.requests_handled += 1
+        if self.max_requests and self.requests_handled >= self.max_requests:
+            self.stop()
+
+    def process_requests(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def stop(self):
+        """Stop accepting connections; safe to call from any thread."""
+        thread = threading.Thread(target=self.shutdown)
+        thread.daemon = True
+        thread.start()
+
+
+class Arbiter(object):
+    """Master process that forks, monitors and replaces workers.
+
+    Args:
+        app: The WSGI application, loaded before forking so that workers
+            share its memory copy-on-write.  If it has a shutdown()
+            method, each worker calls it after its last request.
+        settings: A ServerSettings instance.
+    """
+
+    def __init__(self, app, settings, logger=None):
+        self.app = app
+        self.settings = settings
+        self.logger = logger or logging.getLogger(__name__)
+        self.socket = None
+        self.workers = {}
+        self.retiring = {}
+        self.failures = 0
+        self.spawn_after = 0
+        self.running = False
+        self.reloading = False
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.settings.host, self.settings.port))
+        sock.listen(128)
+        self.socket = sock
+        return sock
+
+    def run(self):
+        if self.socket is None:
+            self.bind()
+
+        if not hasattr(os, 'fork'):
+            self.logger.info("fork() unavailable, serving in one process.")
+            return self.serve()
+
+        self.running = True
+        signal.signal(signal.SIGHUP, self.handle_hup)
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        self.logger.info("Listening on {0}:{1} with {2} workers of {3} "
+                         "threads.".format(self.settings.host,
+                                           self.socket.getsockname()[1],
+                                           self.settings.workers,
+                                           self.settings.threads))
+        try:
+            while self.running:
+                if self.reloading:
+                    self.reload()
+                self.reap()
+                self.kill_retiring()
+                while len(self.workers) < self.settings.workers and \
+                        time.time() >= self.spawn_after:
+                    self.spawn()
+                time.sleep(0.2)
+        finally:
+            self.stop()
+
+    def handle_hup(self, signum, frame):
+        self.reloading = True
+
+    def handle_stop(self, signum, frame):
+        self.running = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.time()
+            return pid
+
+        # Worker process.
+        status = 0
+        try:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            self.serve()
+        except Exception:
+            self.logger.exception("Worker {0} failed.".format(os.getpid()))
+            status = 1
+        finally:
+            os._exit(status)
+
+    def serve(self):
+        server = PooledWSGIServer(self.settings.host, self.settings.port,
+                                  self.app, threads=self.settings.threads,
+                                  max_requests=self.settings.max_requests,
+                                  fd=self.socket.fileno())
+
+        def stop(signum, frame):
+            server.stop()
+
+        if hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        try:
+            server.serve_forever()
+        finally:
+            # Workers leave through os._exit, which skips atexit handlers.
+            shutdown = getattr(self.app, 'shutdown', None)
+            if shutdown is not None:
+                shutdown()
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.ECHILD:
+                    return
+                raise
+            if not pid:
+                return
+            self.retiring.pop(pid, None)
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            if status and time.time() - started < MIN_UPTIME:
+                self.failures += 1
+                delay = min(0.1 * 2 ** min(self.failures, 10), MAX_BACKOFF)
+                self.spawn_after = time.time() + delay
+                self.logger.warning("Worker {0} failed to start; starting "
+                                    "another in {1:.1f}s.".format(pid, delay))
+            else:
+                self.failures = 0
+                self.logger.debug("Worker {0} exited.".format(pid))
+
+    def reload(self):
+        self.reloading = False
+        self.failures = 0
+        self.spawn_after = 0
+        self.logger.info("Reloading workers...")
+        old = list(self.workers)
+        deadline = time.time() + self.settings.graceful_timeout
+        for pid in old:
+            self.retiring[pid] = deadline
+        self.workers = {}
+        for _ in range(self.settings.workers):
+            self.spawn()
+        self.kill(old, signal.SIGTERM)
+
+    def kill_retiring(self):
+        """Kill replaced workers still running after the graceful
+        timeout."""
+        now = time.time()
+        late = [pid for pid, deadline in self.retiring.items()
+                if deadline <= now]
+        if late:
+            self.logger.warning("Killing workers {0} after the graceful "
+                                "timeout.".format(late))
+            self.kill(late, signal.SIGKILL)
+
+    def stop(self):
+        self.kill(list(self.workers), signal.SIGTERM)
+        deadline = time.time() + self.settings.graceful_timeout
+        while (self.workers or self.retiring) and time.time() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.kill(list(self.workers) + list(self.retiring), signal.SIGKILL)
+        self.reap()
+        self.workers = {}
+        self.retiring = {}
+
+    def kill(self, pids, sig):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except OSError as e:
+                if e.errno != errno.ESRCH:
+                    raise
+
+
+def run(app, settings=None):
+    """Serve app with pre-forked workers configured from the environment."""
+    settings = settings or ServerSettings.from_environ()
+    Arbiter(app, settings).run()
@@ -0,0 +1,85 @@
+'''
+Validated, read-only application settings.
+
+create_app() checks the values its request handlers use once, when the app
+is built, and freezes them into a Settings object the handlers close over,
+so no request looks up or validates app.config.
+'''
+
+# Needed for the Twilio Client demo, in the order they are reported.
+REQUIRED = ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_APP_SID',
+            'TWILIO_CALLER_ID')
+
+
+class Settings(object):
+    """Immutable snapshot of the configuration the handlers read.
+
+    Args:
+        account_sid, auth_token, app_sid, caller_id: Twilio credentials,
+            TwiML App and Caller ID; any may be missing.
+        client_token_ttl: Lifetime in seconds of Twilio Client tokens.
+        client_token_refresh: Fraction of that lifetime after which a new
+            token is signed.
+        client_identity: Twilio Client name the /client page signs in as.
+        token_api_key: Secret callers of /client/token must send; the
+            endpoint is off without one.
+        source: Where the values came from, for the configuration error.
+    """
+    __slots__ = ('account_sid', 'auth_token', 'app_sid', 'caller_id',
+                 'client_token_ttl', 'client_token_refresh',
+                 'client_identity', 'token_api_key', 'configuration_error')
+
+    def __init__(self, account_sid=None, auth_token=None, app_sid=None,
+                 caller_id=None, client_token_ttl=3600,
+                 client_token_refresh=0.5, client_identity='joey_ramone',
+                 token_api_key=None,
+                 source='local_settings.py'):
+        if int(client_token_ttl) <= 0:
+            raise ValueError("CLIENT_TOKEN_TTL must be positive, "
+                             "got: {0}".format(client_token_ttl))
+        if not 0 < float(client_token_refresh) <= 1:
+            raise ValueError("CLIENT_TOKEN_REFRESH must be between 0 and 1, "
+                             "got: {0}".format(client_token_refresh))
+        values = dict(zip(REQUIRED, (account_sid, auth_token, app_sid,
+                                     caller_id)))
+        missing = [key for key in REQUIRED if not values[key]]
+        if missing:
+            configuration_error = "Missing from {0}: {1}".format(
+                source, missing[0])
+        else:
+            configuration_error = None
+
+        set_value = super(Settings, self).__setattr__
+        set_value('account_sid', account_sid or None)
+        set_value('auth_token', auth_token or None)
+        set_value('app_sid', app_sid or None)
+        set_value('caller_id', caller_id or None)
+        set_value('client_token_ttl', int(client_token_ttl))
+        set_value('client_token_refresh', float(client_token_refresh))
+        set_value('client_identity', client_identity or None)
+        set_value('token_api_key', token_api_key or None)
+        set_value('configuration_error', configuration_error)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(account_sid=config.get('TWILIO_ACCOUNT_SID'),
+                   auth_token=config.get('TWILIO_AUTH_TOKEN'),
+                   app_sid=config.get('TWILIO_APP_SID'),
+                   caller_id=config.get('TWILIO_CALLER_ID'),
+                   client_token_ttl=config.get('CLIENT_TOKEN_TTL', 3600),
+                   client_token_refresh=config.get('CLIENT_TOKEN_REFRESH',
+                                                   0.5),
+                   client_identity=config.get('CLIENT_IDENTITY',
+                                              'joey_ramone'),
+                   token_api_key=config.get('CLIENT_TOKEN_API_KEY'))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are read-only.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Settings are read-only.")
+
+    def __repr__(self):
+        return '<Settings account_sid={0!r} app_sid={1!r} ' \
+               'caller_id={2!r}>'.format(self.account_sid, self.app_sid,
+                                         self.caller_id)
@@ -0,0 +1,192 @@
+'''
+Ingestion of Twilio StatusCallback events.
+
+/status acknowledges each callback at once and hands its parameters to a
+bounded in-process queue.  A background thread drains the queue and writes
+events to SQLite in batches, in WAL mode so readers never block it.  When
+the queue is full, callbacks are refused with 503 so Twilio retries them
+later instead of the process buffering without bound, as they are when the
+database can't be opened.  Events still queued when a process exits are
+written before it does, so none that were acknowledged are lost.
+'''
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS status_events (
+    id INTEGER PRIMARY KEY,
+    received REAL NOT NULL,
+    sid TEXT,
+    status TEXT,
+    error_code TEXT,
+    params TEXT NOT NULL
+)'''
+INDEX = 'CREATE INDEX IF NOT EXISTS status_events_sid ON status_events (sid)'
+INSERT = 'INSERT INTO status_events (received, sid, status, error_code, ' \
+         'params) VALUES (?, ?, ?, ?, ?)'
+
+
+def event_row(received, params):
+    """The status_events row for a callback's parameters."""
+    return (received,
+            params.get('MessageSid') or params.get('CallSid'),
+            params.get('MessageStatus') or params.get('CallStatus'),
+            params.get('ErrorCode'),
+            json.dumps(params, sort_keys=True))
+
+
+class StatusPipeline(object):
+    """Queues status callbacks and writes them to SQLite in batches.
+
+    The writer thread starts with the first event, in whichever process
+    receives it, so it survives the pre-forking server starting workers.
+
+    Args:
+        path: SQLite database file.
+        maxsize: Most events waiting to be written before callbacks are
+            refused.
+        batch_size: Most events written in one transaction.
+        stop_timeout: Most seconds stop() waits for queued events to be
+            written.
+    """
+
+    def __init__(self, path=None, maxsize=10000, batch_size=500,
+                 stop_timeout=10, clock=time.time, logger=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.stop_timeout = stop_timeout
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue = queue.Queue(maxsize)
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.stop_registered = False
+        self.stats = {'received': 0, 'dropped': 0, 'written': 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('STATUS_DATABASE'),
+                   maxsize=config.get('STATUS_QUEUE_SIZE', 10000),
+                   batch_size=config.get('STATUS_BATCH_SIZE', 500))
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def put(self, params):
+        """Queue a callback's parameters; return False if the queue is
+        full or the writer thread has stopped."""
+        if self.pid != os.getpid():
+            self.start()
+        if not self.thread.is_alive():
+            self.stats['dropped'] += 1
+            return False
+        try:
+            self.queue.put_nowait((self.clock(), params))
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['received'] += 1
+        return True
+
+    def start(self):
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # A forked worker inherits the queue but not the thread.  Each
+            # thread drains its own queue, so one still finishing after
+            # stop() timed out doesn't read the new one.
+            self.queue = queue.Queue(self.maxsize)
+            self.thread = threading.Thread(target=self.write_forever,
+                                           args=(self.queue,))
+            self.thread.daemon = True
+            self.thread.start()
+            self.pid = os.getpid()
+            if not self.stop_registered:
+                self.stop_registered = True
+                atexit.register(self.stop)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(SCHEMA)
+        connection.execute(INDEX)
+        return connection
+
+    def write_forever(self, events_queue):
+        try:
+            connection = self.connect()
+        except sqlite3.Error as e:
+            self.logger.error("Could not open {0}, refusing status "
+                              "callbacks: {1}".format(self.path, e))
+            return
+        while True:
+            batch = [events_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(events_queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = [item for item in batch if item is not None]
+            try:
+                if events:
+                    self.write(connection, events)
+            finally:
+                for _ in batch:
+                    events_queue.task_done()
+            if len(events) < len(batch):
+                connection.close()
+                return
+
+    def write(self, connection, events):
+        try:
+            with connection:
+                connection.executemany(INSERT, [event_row(*event)
+                                                for event in events])
+            self.stats['written'] += len(events)
+        except sqlite3.Error as e:
+            self.logger.error("Could not write {0} status events: "
+                              "{1}".format(len(events), e))
+
+    def flush(self):
+        """Wait until every queued event is written, or the writer thread
+        has stopped."""
+        if self.pid != os.getpid():
+            return
+        done = self.queue.all_tasks_done
+        with done:
+            while self.queue.unfinished_tasks and self.thread.is_alive():
+                done.wait(0.1)
+
+    def stop(self):
+        """Write every queued event, then stop the writer thread, waiting
+        at most stop_timeout seconds."""
+        with self.lock:
+            if self.pid != os.getpid():
+                return
+            self.pid = None
+            deadline = time.time() + self.stop_timeout
+            try:
+                if self.thread.is_alive():
+                    self.queue.put(None, timeout=self.stop_timeout)
+            except queue.Full:
+                pass
+            self.thread.join(max(deadline - time.time(), 0))
+            if self.thread.is_alive() or self.queue.qsize():
+                self.logger.error("Gave up writing status events after "
+                                  "{0}s with {1} still queued.".format(
+                                      self.stop_timeout, self.queue.qsize()))
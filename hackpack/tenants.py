@@ -0,0 +1,269 @@
+'''
+Serving many Twilio accounts from one deployment.
+
+With TENANTS_DIRECTORY set, each account the hackpack answers for has a
+JSON file in that directory named after its AccountSid, with the same
+settings as local_settings.py, e.g. ACxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx.json:
+
+    {
+        "TWILIO_AUTH_TOKEN": "yyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyy",
+        "TWILIO_APP_SID": "APzzzzzzzzzzzzzzzzzzzzzzzzzzzzzzzz",
+        "TWILIO_CALLER_ID": "+17778889999",
+        "CLIENT_IDENTITY": "acme_agent",
+        "CLIENT_TOKEN_API_KEY": "a long random secret",
+        "VOICE_GREETING": "Thanks for calling Acme.",
+        "SMS_GREETING": "Thanks for texting Acme."
+    }
+
+The Client identity, the token API key and the greetings, in place of the
+hackpack's own, are optional.  hosts.json in the same directory maps host
+names to AccountSids, for pages browsers load, like /client:
+
+    {"acme.example.com": "ACxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"}
+
+Webhooks are matched to an account by the AccountSid Twilio sends with
+them; pages only by host, so a browser can't ask for another account's
+token.  Accounts are loaded when first needed and kept in an LRU cache,
+along with each one's signature validator and rendered TwiML.  Changes to
+an account's file, or to hosts.json, are picked up within a few seconds.
+'''
+
+import json
+import logging
+import os
+import re
+import time
+
+from flask import g
+from flask import request
+
+from .cache import CachedDocument
+from .cache import LRUCache
+from .security import RequestValidator
+from .settings import Settings
+
+ACCOUNT_SID = re.compile(r'^AC[0-9a-fA-F]{32}\Z')
+HOSTS = 'hosts.json'
+
+
+class Tenant(object):
+    """One account's settings, greetings and rendered TwiML."""
+    __slots__ = ('settings', 'greetings', 'documents', 'validator')
+
+    def __init__(self, settings, greetings=None, replay_ttl=5):
+        self.settings = settings
+        self.greetings = greetings or {}
+        self.documents = {}
+        if settings.auth_token:
+            self.validator = RequestValidator(settings.auth_token,
+                                              replay_ttl=replay_ttl)
+        else:
+            self.validator = None
+
+    def document(self, name, render):
+        """The TwiML render() returns, rendered once for this account."""
+        document = self.documents.get(name)
+        if document is None:
+            document = self.documents[name] = CachedDocument(None, render())
+        return document
+
+
+class TenantRegistry(object):
+    """Finds the account a request is for, loading it from disk if needed.
+
+    Args:
+        directory: Where the accounts' files are; None for a single account
+            configured in local_settings.
+        maxsize: Most accounts kept in memory.
+        miss_ttl: Most seconds an AccountSid without a file is remembered
+            as unknown; adding a file to the directory forgets them all.
+        misses: Most unknown AccountSids remembered, apart from the known
+            ones so made up AccountSids can't push real accounts out.
+        check_interval: Least number of seconds between checks of an
+            account's file, and of hosts.json, for changes.
+        client_token_ttl, client_token_refresh, replay_ttl: Defaults for
+            every account.
+    """
+
+    def __init__(self, directory=None, maxsize=1024, miss_ttl=60, misses=256,
+                 check_interval=5.0, client_token_ttl=3600,
+                 client_token_refresh=0.5, replay_ttl=5, clock=time.time,
+                 logger=None):
+        self.directory = directory
+        self.tenants = LRUCache(maxsize)
+        self.misses = LRUCache(misses)
+        self.miss_ttl = miss_ttl
+        self.check_interval = check_interval
+        self.client_token_ttl = client_token_ttl
+        self.client_token_refresh = client_token_refresh
+        self.replay_ttl = replay_ttl
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.hosts = {}
+        self.hosts_mtime = None
+        self.hosts_checked = None
+        self.directory_mtime = None
+        self.directory_checked = 0
+        if directory:
+            self.load_hosts()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('TENANTS_DIRECTORY'),
+                   maxsize=config.get('TENANTS_CACHE_SIZE', 1024),
+                   client_token_ttl=config.get('CLIENT_TOKEN_TTL', 3600),
+                   client_token_refresh=config.get('CLIENT_TOKEN_REFRESH',
+                                                   0.5),
+                   replay_ttl=config.get('TWILIO_REPLAY_TTL', 5))
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def load_hosts(self):
+        """Read hosts.json if it changed; a bad file is logged and the hosts
+        read before keep serving."""
+        self.hosts_checked = self.clock()
+        path = os.path.join(self.directory, HOSTS)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self.hosts = {}
+            self.hosts_mtime = None
+            return
+        if mtime == self.hosts_mtime:
+            return
+        self.hosts_mtime = mtime
+        try:
+            with open(path) as f:
+                hosts = json.load(f)
+            if not isinstance(hosts, dict):
+                raise ValueError("Expected an object of host names.")
+        except (IOError, OSError, ValueError) as e:
+            self.logger.error("Could not load {0}: {1}".format(path, e))
+            return
+        self.hosts = dict((host.lower(), sid) for host, sid in hosts.items())
+
+    def get(self, account_sid):
+        """The account with this AccountSid, or None."""
+        if not account_sid or not ACCOUNT_SID.match(account_sid):
+            return None
+        now = self.clock()
+        entry = self.tenants.get(account_sid)
+        if entry is not None:
+            return self.refresh(account_sid, entry, now)
+
+        self.forget_misses(now)
+        if self.misses.get(account_sid, 0) > now:
+            return None
+        mtime = self.mtime(account_sid)
+        if mtime is None:
+            self.misses.set(account_sid, now + self.miss_ttl)
+            return None
+        tenant = self.load(account_sid)
+        if tenant is None:
+            return None
+        self.misses.pop(account_sid)
+        self.tenants.set(account_sid, (tenant, mtime, now))
+        return tenant
+
+    def refresh(self, account_sid, entry, now):
+        """A loaded account, read again if its file changed.  A file that
+        fails to load leaves the previous version serving."""
+        tenant, mtime, checked = entry
+        if now - checked < self.check_interval:
+            return tenant
+        current = self.mtime(account_sid)
+        if current is None:
+            self.tenants.pop(account_sid)
+            self.misses.set(account_sid, now + self.miss_ttl)
+            return None
+        if current != mtime:
+            loaded = self.load(account_sid)
+            if loaded is not None:
+                tenant, mtime = loaded, current
+        self.tenants.set(account_sid, (tenant, mtime, now))
+        return tenant
+
+    def forget_misses(self, now):
+        """Clear the unknown AccountSids when a file is added to or removed
+        from the directory."""
+        if now - self.directory_checked < self.check_interval:
+            return
+        self.directory_checked = now
+        try:
+            mtime = os.stat(self.directory).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.directory_mtime:
+            self.directory_mtime = mtime
+            self.misses.clear()
+
+    def mtime(self, account_sid):
+        try:
+            return os.stat(os.path.join(self.directory,
+                                        account_sid + '.json')).st_mtime
+        except OSError:
+            return None
+
+    def load(self, account_sid):
+        name = account_sid + '.json'
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Expected an object of settings.")
+        except (IOError, OSError):
+            return None
+        except ValueError as e:
+            self.logger.error("Could not load account {0}: {1}".format(
+                account_sid, e))
+            return None
+        settings = Settings(account_sid=account_sid,
+                            auth_token=data.get('TWILIO_AUTH_TOKEN'),
+                            app_sid=data.get('TWILIO_APP_SID'),
+                            caller_id=data.get('TWILIO_CALLER_ID'),
+                            client_token_ttl=self.client_token_ttl,
+                            client_token_refresh=self.client_token_refresh,
+                            client_identity=data.get('CLIENT_IDENTITY',
+                                                     'joey_ramone'),
+                            token_api_key=data.get('CLIENT_TOKEN_API_KEY'),
+                            source=name)
+        greetings = {'voice': data.get('VOICE_GREETING'),
+                     'sms': data.get('SMS_GREETING')}
+        return Tenant(settings, greetings, replay_ttl=self.replay_ttl)
+
+    def for_host(self, host):
+        if self.clock() - self.hosts_checked >= self.check_interval:
+            self.load_hosts()
+        host = host.lower()
+        account_sid = self.hosts.get(host)
+        if account_sid is None and ':' in host:
+            account_sid = self.hosts.get(host.rsplit(':', 1)[0])
+        return self.get(account_sid)
+
+    def for_webhook(self):
+        """The account the current webhook request was sent for.
+
+        Looked up once per request and kept on flask.g, so every hook and
+        view sees the same account even if its file changes meanwhile.
+        """
+        if 'webhook_tenant' not in g:
+            g.webhook_tenant = self.get(request.values.get('AccountSid',
+                                                           None))
+        return g.webhook_tenant
+
+    def for_page(self):
+        """The account whose host the current page was requested on."""
+        return self.for_host(request.host)
+
+    def validator(self):
+        """The signature validator for the current webhook's account."""
+        tenant = self.for_webhook()
+        if tenant is None:
+            return None
+        return tenant.validator
+
+    def __len__(self):
+        return len(self.tenants)
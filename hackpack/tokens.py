@@ -0,0 +1,195 @@
+'''
+Twilio Client capability tokens.
+
+Tokens are the same HS256 JSON Web Tokens twilio.util.TwilioCapability
+generates, signed by a CapabilitySigner that encodes the JWT header once and
+computes each account's HMAC key schedule once, copying it for every token.
+'''
+
+import base64
+import hashlib
+import hmac
+import json
+import re
+import time
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+from .cache import LRUCache
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+SCOPES = ('incoming', 'outgoing', 'events')
+DEFAULT_SCOPES = ('incoming', 'outgoing')
+
+# Twilio Client names are letters, digits and underscores.
+IDENTITY = re.compile(r'^[A-Za-z0-9_]{1,121}\Z')
+
+# The longest lifetime Twilio accepts for a capability token.
+MAX_TTL = 24 * 60 * 60
+
+
+def base64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+HEADER = base64url(b'{"typ": "JWT", "alg": "HS256"}')
+
+
+def scope_uri(service, privilege, params):
+    return 'scope:{0}:{1}?{2}'.format(service, privilege,
+                                      urlencode(sorted(params.items())))
+
+
+class CapabilitySigner(object):
+    """Signs capability tokens for one account."""
+
+    def __init__(self, account_sid, auth_token, clock=time.time):
+        self.account_sid = account_sid
+        self.issuer = json.dumps(account_sid)
+        self.mac = hmac.new(auth_token.encode('utf-8'),
+                            digestmod=hashlib.sha256)
+        self.clock = clock
+
+    def scope(self, client_name=None, app_sid=None, scopes=DEFAULT_SCOPES):
+        """The scope claim allowing client_name to take calls, and calls
+        out through app_sid, as scopes allows."""
+        uris = []
+        if 'incoming' in scopes and client_name:
+            uris.append(scope_uri('client', 'incoming',
+                                  {'clientName': client_name}))
+        if 'outgoing' in scopes and app_sid:
+            params = {'appSid': app_sid}
+            if client_name:
+                params['clientName'] = client_name
+            uris.append(scope_uri('client', 'outgoing', params))
+        if 'events' in scopes:
+            uris.append(scope_uri('stream', 'subscribe',
+                                  {'path': '/2010-04-01/Events'}))
+        return ' '.join(uris)
+
+    def sign(self, scope, ttl=3600):
+        """Return a token for scope and the time it expires."""
+        expires = int(self.clock() + ttl)
+        payload = '{{"scope": {0}, "iss": {1}, "exp": {2}}}'.format(
+            json.dumps(scope), self.issuer, expires)
+        signing_input = HEADER + b'.' + base64url(payload.encode('utf-8'))
+        mac = self.mac.copy()
+        mac.update(signing_input)
+        token = signing_input + b'.' + base64url(mac.digest())
+        return token.decode('ascii'), expires
+
+    def generate(self, client_name=None, app_sid=None, scopes=DEFAULT_SCOPES,
+                 ttl=3600):
+        return self.sign(self.scope(client_name, app_sid, scopes), ttl)[0]
+
+
+class CapabilityTokenCache(object):
+    """Reuses signed capability tokens until they are close to expiring.
+
+    A token is issued with a lifetime of ttl seconds and handed out again
+    for every matching request until refresh * ttl seconds have passed, so
+    clients always receive a token with plenty of life left in it.
+
+    Args:
+        ttl: Lifetime in seconds of each generated token.
+        refresh: Fraction of the lifetime after which a new token is signed.
+        maxsize: Number of client identities to keep tokens for.
+    """
+
+    def __init__(self, ttl=3600, refresh=0.5, maxsize=1024, clock=time.time):
+        if not 0 < refresh <= 1:
+            raise ValueError("refresh must be between 0 and 1, "
+                             "got: {0}".format(refresh))
+        self.ttl = ttl
+        self.refresh = refresh
+        self.clock = clock
+        self.tokens = LRUCache(maxsize)
+        self.signers = LRUCache(64)
+        self.hits = 0
+        self.misses = 0
+
+    def signer(self, account_sid, auth_token):
+        """The signer for an account, kept for reuse."""
+        key = (account_sid, auth_token)
+        signer = self.signers.get(key)
+        if signer is None:
+            signer = CapabilitySigner(account_sid, auth_token, self.clock)
+            self.signers.set(key, signer)
+        return signer
+
+    def get(self, account_sid, auth_token, app_sid=None, client_name=None):
+        """Return a token allowing outgoing calls through app_sid and
+        incoming calls to client_name, generating one only if needed."""
+        key = (account_sid, auth_token, app_sid, client_name)
+        now = self.clock()
+
+        entry = self.tokens.get(key)
+        if entry is not None and now < entry[1]:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        token = self.signer(account_sid, auth_token).generate(
+            client_name, app_sid, ttl=self.ttl)
+        self.tokens.set(key, (token, now + self.ttl * self.refresh))
+        return token
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.tokens)}
+
+    def clear(self):
+        self.tokens.clear()
+
+
+def parse_token_request(data, default_ttl=3600, batch_size=1000):
+    """Read a token request's identities, scopes and ttl.
+
+    Args:
+        data: The request's JSON object, with an "identities" list or an
+            "identity", and optionally "scopes" and "ttl".
+
+    Returns:
+        (identities, scopes, ttl)
+
+    Raises:
+        ValueError: The request is malformed; the message says why.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object.")
+    identities = data.get('identities')
+    if identities is None:
+        identities = [data['identity']] if data.get('identity') else []
+    if not isinstance(identities, list) or not identities:
+        raise ValueError("Give an identity or a list of identities.")
+    if len(identities) > batch_size:
+        raise ValueError("At most {0} identities per request.".format(
+            batch_size))
+    for identity in identities:
+        if not isinstance(identity, string_types) or \
+                not IDENTITY.match(identity):
+            raise ValueError("Invalid identity: {0!r}".format(identity))
+
+    scopes = data.get('scopes') or DEFAULT_SCOPES
+    if not isinstance(scopes, (list, tuple)) or \
+            not all(scope in SCOPES for scope in scopes):
+        raise ValueError("Scopes must be a list of: {0}".format(
+            ', '.join(SCOPES)))
+
+    ttl = data.get('ttl') or default_ttl
+    try:
+        ttl = int(ttl)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid ttl: {0!r}".format(ttl))
+    if not 0 < ttl <= MAX_TTL:
+        raise ValueError("ttl must be between 1 and {0} seconds.".format(
+            MAX_TTL))
+    return identities, tuple(scopes), ttl
@@ -0,0 +1,250 @@
+'''
+A streaming TwiML writer.
+
+twilio.twiml builds a tree of verb objects and serializes it through
+ElementTree.  This writer appends escaped XML fragments to a list as each
+verb is added, using precomputed tags and attribute names, and joins and
+encodes them once when the document is finished.  It covers the verbs the
+hackpack uses, with the same methods as twilio.twiml.Response:
+
+    response = twiml.Response()
+    response.say("Hello")
+    with response.dial(callerId='+15558675309') as dial:
+        dial.number('+16667778888')
+    body = response.encode()
+
+Attributes are written in sorted order, None values are left out and
+booleans are written as true and false, as twilio.twiml does.
+'''
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+
+# Keyword arguments that aren't spelled like the attribute they write.
+ALIASES = {'sender': 'from', 'from_': 'from'}
+
+# Attribute name fragments, e.g. ' callerId="'.  Names not listed are added
+# when first used.
+ATTRIBUTES = dict((name, ' {0}="'.format(ALIASES.get(name, name)))
+                  for name in ('action', 'callerId', 'digits', 'finishOnKey',
+                               'from_', 'language', 'length', 'loop',
+                               'method', 'numDigits', 'record', 'sender',
+                               'statusCallback', 'timeLimit', 'timeout',
+                               'to', 'url', 'voice'))
+
+
+class Tag(object):
+    """Precomputed fragments for one verb."""
+    __slots__ = ('start', 'opened', 'end', 'empty')
+
+    def __init__(self, name):
+        self.start = '<' + name
+        self.opened = '<' + name + '>'
+        self.end = '</' + name + '>'
+        self.empty = '<' + name + ' />'
+
+
+TAGS = dict((name, Tag(name)) for name in (
+    'Response', 'Say', 'Play', 'Pause', 'Sms', 'Redirect', 'Hangup',
+    'Reject', 'Dial', 'Number', 'Client', 'Gather'))
+
+
+def escape_text(text):
+    if not isinstance(text, text_type):
+        text = text_type(text)
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def escape_attribute(value):
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    value = escape_text(value)
+    if '"' in value:
+        value = value.replace('"', '&quot;')
+    if '\n' in value or '\r' in value or '\t' in value:
+        value = value.replace('\n', '&#10;').replace('\r', '&#13;') \
+                     .replace('\t', '&#9;')
+    return value
+
+
+def write_attributes(parts, attributes):
+    for name in sorted(attributes):
+        value = attributes[name]
+        if value is None:
+            continue
+        fragment = ATTRIBUTES.get(name)
+        if fragment is None:
+            fragment = ATTRIBUTES.setdefault(
+                name, ' {0}="'.format(ALIASES.get(name, name)))
+        parts.append(fragment)
+        parts.append(escape_attribute(value))
+        parts.append('"')
+
+
+class Writer(object):
+    """Appends verbs to a document's list of fragments."""
+    __slots__ = ('parts', 'stack')
+
+    def __init__(self, parts, stack):
+        self.parts = parts
+        self.stack = stack
+
+    def element(self, tag, text=None, attributes=None):
+        parts = self.parts
+        if attributes:
+            parts.append(tag.start)
+            write_attributes(parts, attributes)
+            if text is None:
+                parts.append(' />')
+                return
+            parts.append('>')
+        elif text is None:
+            parts.append(tag.empty)
+            return
+        else:
+            parts.append(tag.opened)
+        parts.append(escape_text(text))
+        parts.append(tag.end)
+
+    def nest(self, cls, tag, attributes):
+        parts = self.parts
+        if attributes:
+            parts.append(tag.start)
+            write_attributes(parts, attributes)
+            parts.append('>')
+        else:
+            parts.append(tag.opened)
+        verb = cls(parts, self.stack, tag.end)
+        self.stack.append(verb)
+        return verb
+
+
+class Nested(Writer):
+    """A verb other verbs are written inside of, until it is closed.
+
+    Used as a context manager, it closes when the block ends; otherwise it
+    is closed when the document is finished.
+    """
+    __slots__ = ('end',)
+
+    def __init__(self, parts, stack, end):
+        Writer.__init__(self, parts, stack)
+        self.end = end
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        if self.end:
+            self.parts.append(self.end)
+            self.end = None
+            self.stack.remove(self)
+
+
+class Prompts(object):
+    """Verbs that speak to the caller."""
+    __slots__ = ()
+
+    def say(self, text, **attributes):
+        self.element(TAGS['Say'], text, attributes)
+
+    def play(self, url=None, **attributes):
+        self.element(TAGS['Play'], url, attributes)
+
+    def pause(self, **attributes):
+        self.element(TAGS['Pause'], None, attributes)
+
+
+class Gather(Prompts, Nested):
+    __slots__ = ()
+
+
+class Dial(Nested):
+    __slots__ = ()
+
+    def number(self, number, **attributes):
+        self.element(TAGS['Number'], number, attributes)
+
+    def client(self, name, **attributes):
+        self.element(TAGS['Client'], name, attributes)
+
+
+class Response(Prompts, Writer):
+    """A TwiML document, written as verbs are added to it."""
+    __slots__ = ()
+
+    def __init__(self, **attributes):
+        parts = [DECLARATION]
+        Writer.__init__(self, parts, [])
+        if attributes:
+            parts.append(TAGS['Response'].start)
+            write_attributes(parts, attributes)
+            parts.append('>')
+        else:
+            parts.append(TAGS['Response'].opened)
+
+    def sms(self, msg, **attributes):
+        self.element(TAGS['Sms'], msg, attributes)
+
+    def redirect(self, url=None, **attributes):
+        self.element(TAGS['Redirect'], url, attributes)
+
+    def hangup(self, **attributes):
+        self.element(TAGS['Hangup'], None, attributes)
+
+    def reject(self, reason=None, **attributes):
+        attributes['reason'] = reason
+        self.element(TAGS['Reject'], None, attributes)
+
+    def dial(self, number=None, **attributes):
+        """Dial number, or return a Dial to add numbers to.
+
+        A Dial is only returned when no number is given; with one, the Dial
+        is already written and there is nothing left to add to it.
+        """
+        if number is not None:
+            self.element(TAGS['Dial'], number, attributes)
+            return None
+        return self.nest(Dial, TAGS['Dial'], attributes)
+
+    def gather(self, **attributes):
+        return self.nest(Gather, TAGS['Gather'], attributes)
+
+    def toxml(self, xml_declaration=True):
+        while self.stack:
+            self.stack[-1].close()
+        parts = self.parts
+        parts.append(TAGS['Response'].end)
+        try:
+            return ''.join(parts if xml_declaration else parts[1:])
+        finally:
+            parts.pop()
+
+    def encode(self):
+        """The finished document, encoded as UTF-8."""
+        return self.toxml().encode('utf-8')
+
+    def __str__(self):
+        # Python 2's str() needs bytes; non-ASCII text can't be coerced.
+        if text_type is str:
+            return self.toxml()
+        return self.encode()
+
+    def __unicode__(self):
+        return self.toxml()
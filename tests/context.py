@@ -6,3 +6,14 @@ from twilio.rest import resources
 
 import configure
 from app import app
+from hackpack.app import create_app
+
+
+class Clock(object):
+    """A clock for tests to move by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,105 @@
+'''
+A local stand-in for Redis speaking just enough of its protocol for the
+hackpack's tests.
+'''
+
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(self.server.execute(args))
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0),
+                                                 FakeRedisHandler)
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'redis://127.0.0.1:{0}/0'.format(self.server_address[1])
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def execute(self, args):
+        command = args[0].upper().decode('ascii')
+        self.commands.append(command)
+        with self.lock:
+            now = time.time()
+            for key, expires in list(self.expires.items()):
+                if expires <= now:
+                    self.data.pop(key, None)
+                    del self.expires[key]
+            return getattr(self, 'do_' + command.lower())(*args[1:])
+
+    def do_select(self, db):
+        return b'+OK\r\n'
+
+    def do_get(self, key):
+        value = self.data.get(key)
+        if value is None:
+            return b'$-1\r\n'
+        return b'$' + str(len(value)).encode('ascii') + b'\r\n' + value + \
+            b'\r\n'
+
+    def do_set(self, key, value, *options):
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if options and options[0].upper() == b'EX':
+            self.expires[key] = time.time() + int(options[1])
+        return b'+OK\r\n'
+
+    def do_del(self, *keys):
+        count = 0
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                count += 1
+            self.expires.pop(key, None)
+        return ':{0}\r\n'.format(count).encode('ascii')
+
+    def do_incr(self, key):
+        value = int(self.data.get(key, b'0')) + 1
+        self.data[key] = str(value).encode('ascii')
+        return ':{0}\r\n'.format(value).encode('ascii')
+
+    def do_decr(self, key):
+        value = int(self.data.get(key, b'0')) - 1
+        self.data[key] = str(value).encode('ascii')
+        return ':{0}\r\n'.format(value).encode('ascii')
+
+    def do_expire(self, key, seconds):
+        if key not in self.data:
+            return b':0\r\n'
+        self.expires[key] = time.time() + int(seconds)
+        return b':1\r\n'
@@ -0,0 +1,98 @@
+'''
+A local stand-in for the Twilio REST API, answering just the requests the
+hackpack's tests make.
+'''
+
+import json
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qsl
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = dict(parse_qsl(self.rfile.read(length).decode('utf-8')))
+        status, body = self.server.respond('POST', self.path, params,
+                                           self.client_address)
+        self.reply(status, body)
+
+    def do_GET(self):
+        status, body = self.server.respond('GET', self.path, {},
+                                           self.client_address)
+        self.reply(status, body)
+
+    def reply(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeTwilio(ThreadingMixIn, HTTPServer):
+    """Records every request and answers with a made up resource.
+
+    Set failures to a list of statuses to answer the next requests with,
+    e.g. [429] to rate limit one request, and delay to the seconds each
+    request takes.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeTwilioHandler)
+        self.requests = []
+        self.connections = set()
+        self.failures = []
+        self.responses = {}
+        self.delay = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.server_address[1])
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def respond(self, method, path, params, client_address):
+        if self.delay:
+            time.sleep(self.delay)
+        with self.lock:
+            self.requests.append((method, path, params))
+            self.connections.add(client_address)
+            if self.failures:
+                status = self.failures.pop(0)
+                return status, {'status': status, 'code': 20429,
+                                'message': 'Too Many Requests'}
+            count = len(self.requests)
+        body = self.responses.get(path.split('?')[0])
+        if body is not None:
+            return 200, body
+        body = dict(params)
+        body['sid'] = 'SM{0:032d}'.format(count)
+        return 201, body
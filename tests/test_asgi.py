@@ -0,0 +1,71 @@
+import sys
+import unittest
+
+from .context import create_app
+
+# The adapter is written with async def, which is a SyntaxError before 3.5.
+if sys.version_info >= (3, 5):
+    import asyncio
+    from hackpack.asgi import WsgiToAsgi
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "Requires Python 3.5+.")
+class ASGITest(unittest.TestCase):
+    def setUp(self):
+        app = create_app({'TWILIO_CALLER_ID': '+15558675309'})
+        self.application = WsgiToAsgi(app, max_workers=2)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.application.executor.shutdown()
+
+    def request(self, method, path, body=b'', headers=None):
+        scope = {'type': 'http', 'method': method, 'path': path,
+                 'query_string': b'', 'headers': headers or [],
+                 'server': ('example.com', 80), 'client': ('127.0.0.1', 1)}
+        messages = [{'type': 'http.request', 'body': body,
+                     'more_body': False}]
+        sent = []
+
+        def done(result=None):
+            future = self.loop.create_future()
+            future.set_result(result)
+            return future
+
+        def receive():
+            return done(messages.pop(0))
+
+        def send(message):
+            sent.append(message)
+            return done()
+
+        self.loop.run_until_complete(self.application(scope, receive, send))
+        return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+    def test_voice(self):
+        status, headers, body = self.request('POST', '/voice')
+        self.assertEqual(200, status)
+        self.assertEqual(b'text/xml; charset=utf-8', headers[b'content-type'])
+        self.assertTrue(b'</Response>' in body)
+
+    def test_client_incoming_form(self):
+        status, headers, body = self.request(
+            'POST', '/client/incoming', body=b'PhoneNumber=16667778888',
+            headers=[(b'content-type', b'application/x-www-form-urlencoded')])
+        self.assertEqual(200, status)
+        self.assertTrue(b'+16667778888' in body, body)
+
+    def test_index(self):
+        status, headers, body = self.request('GET', '/')
+        self.assertEqual(200, status)
+        self.assertTrue(b'http://example.com/voice' in body)
+
+    def test_not_found(self):
+        status, headers, body = self.request('GET', '/nope')
+        self.assertEqual(404, status)
+
+    def test_body_too_large(self):
+        self.application.max_body = 4
+        status, headers, body = self.request('POST', '/sms', body=b'x' * 5)
+        self.assertEqual(413, status)
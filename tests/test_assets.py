@@ -0,0 +1,159 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zlib
+
+from flask import Flask
+from mock import patch
+
+from .context import create_app
+from .test_web import SETTINGS
+from hackpack import assets
+
+if sys.version_info[0] >= 3:
+    URLOPEN = 'urllib.request.urlopen'
+else:
+    URLOPEN = 'urllib2.urlopen'
+
+
+class BuildTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.directory, 'static')
+        self.build_dir = os.path.join(self.directory, 'build')
+        self.write('styles/index.css', '/* Hey */\nbody {\n    color: red;\n'
+                                       '}\n')
+        self.write('js/app.min.js', 'var a=1;')
+        self.manifest = assets.build(self.static_dir, self.build_dir,
+                                     names=('styles/index.css',
+                                            'js/app.min.js',
+                                            'js/missing.js'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.static_dir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.build_dir, name), 'rb') as f:
+            return f.read()
+
+    def create_app(self):
+        app = Flask(__name__, static_folder=self.static_dir)
+        assets.Assets(app, build_dir=self.build_dir)
+        return app
+
+    def test_manifest(self):
+        self.assertEqual(['js/app.min.js', 'styles/index.css'],
+                         sorted(self.manifest))
+        built = self.manifest['styles/index.css']['file']
+        self.assertTrue(built.startswith('styles/index.'))
+        self.assertTrue(built.endswith('.css'))
+        self.assertTrue('gzip' in self.manifest['styles/index.css']
+                        ['encodings'])
+
+    def test_minified_and_compressed(self):
+        built = self.manifest['styles/index.css']['file']
+        self.assertEqual(b'body{color: red}', self.read(built))
+        self.assertEqual(self.read(built),
+                         zlib.decompress(self.read(built + '.gz'), 31))
+        self.assertEqual(b'var a=1;',
+                         self.read(self.manifest['js/app.min.js']['file']))
+
+    def test_fingerprint_changes_with_content(self):
+        self.assertNotEqual(assets.fingerprint('a.css', b'a'),
+                            assets.fingerprint('a.css', b'b'))
+        self.assertEqual(assets.fingerprint('a.css', b'a'),
+                         assets.fingerprint('a.css', b'a'))
+
+    def test_serves_precompressed(self):
+        built = self.manifest['styles/index.css']['file']
+        client = self.create_app().test_client()
+        response = client.get('/assets/' + built,
+                              headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertTrue(response.headers['Content-Type']
+                        .startswith('text/css'))
+        self.assertTrue('max-age=31536000' in
+                        response.headers['Cache-Control'])
+        self.assertEqual(b'body{color: red}',
+                         zlib.decompress(response.data, 31))
+
+        response = client.get('/assets/' + built)
+        self.assertFalse('Content-Encoding' in response.headers)
+        self.assertEqual(b'body{color: red}', response.data)
+
+    def test_unknown_asset(self):
+        client = self.create_app().test_client()
+        self.assertEqual(404, client.get('/assets/manifest.json')
+                         .status_code)
+
+    def test_urls(self):
+        app = self.create_app()
+        with app.test_request_context():
+            url = app.extensions['assets'].url
+            self.assertEqual(
+                '/assets/' + self.manifest['styles/index.css']['file'],
+                url('styles/index.css'))
+            self.assertEqual('/static/js/other.js', url('js/other.js'))
+            self.assertEqual(assets.VENDOR['js/twilio.min.js'],
+                             url('js/twilio.min.js'))
+
+
+class VendorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'js', 'twilio.min.js')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('var Twilio;')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_vendor_missing(self):
+        opened = []
+
+        def urlopen(url, timeout=None):
+            opened.append((url, timeout))
+            if url.endswith('.css'):
+                raise IOError("unreachable")
+            return io.BytesIO(b'jQuery')
+        with patch(URLOPEN, urlopen):
+            assets.vendor(self.directory, timeout=5)
+        self.assertEqual([(assets.VENDOR['js/jquery-1.8.1.min.js'], 5),
+                          (assets.VENDOR['styles/client.css'], 5)], opened)
+        with open(os.path.join(self.directory, 'js',
+                               'jquery-1.8.1.min.js')) as f:
+            self.assertEqual('jQuery', f.read())
+        self.assertFalse(os.path.exists(os.path.join(
+            self.directory, 'styles', 'client.css')))
+
+    def test_default_build_vendors(self):
+        self.assertFalse(assets.parse_args([]).offline)
+        self.assertTrue(assets.parse_args(['--offline']).offline)
+
+
+class MinifyTest(unittest.TestCase):
+    def test_minify_css(self):
+        self.assertEqual('a,b>c{margin:0 auto;color:#fff}',
+                         assets.minify_css('a, b > c {\n  margin:0 auto;\n'
+                                           '  color:#fff;\n}\n'))
+
+
+class ClientTemplateTest(unittest.TestCase):
+    def test_no_nested_scripts(self):
+        data = create_app(SETTINGS).test_client().get('/client').data
+        self.assertFalse(b'document.write' in data)
+        self.assertTrue(b'jquery-1.8.1.min.js' in data or
+                        b'jquery/1.8.1/' in data)
+        self.assertEqual(data.count(b'<script'), data.count(b'</script>'))
@@ -0,0 +1,51 @@
+import unittest
+
+from .context import create_app
+from benchmarks import webhooks
+
+
+class PercentileTest(unittest.TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(50, webhooks.percentile(samples, 50))
+        self.assertEqual(95, webhooks.percentile(samples, 95))
+        self.assertEqual(99, webhooks.percentile(samples, 99))
+        self.assertEqual(0.0, webhooks.percentile([], 50))
+
+
+class CompareTest(unittest.TestCase):
+    def result(self, p95, throughput):
+        return {'transport': 'inprocess',
+                'routes': {'voice': {'p50_ms': 1.0, 'p95_ms': p95,
+                                     'p99_ms': 3.0,
+                                     'throughput': throughput}}}
+
+    def test_no_regression(self):
+        self.assertEqual([], webhooks.compare(self.result(2.0, 1000),
+                                              self.result(2.2, 900)))
+
+    def test_regression(self):
+        regressions = webhooks.compare(self.result(2.0, 1000),
+                                       self.result(3.0, 500))
+        self.assertEqual(2, len(regressions))
+
+    def test_transport_mismatch(self):
+        current = self.result(2.0, 1000)
+        current['transport'] = 'socket'
+        self.assertRaises(ValueError, webhooks.compare,
+                          self.result(2.0, 1000), current)
+
+
+class RunTest(unittest.TestCase):
+    def test_every_route_in_process(self):
+        results = webhooks.run(create_app(webhooks.CONFIG), requests=5)
+        self.assertEqual(sorted(webhooks.ROUTES), sorted(results['routes']))
+        for route, result in results['routes'].items():
+            self.assertEqual(5, result['requests'])
+            self.assertTrue(result['p99_ms'] >= result['p50_ms'])
+
+    def test_socket(self):
+        results = webhooks.run(create_app(webhooks.CONFIG),
+                               transport='socket', routes=['voice'],
+                               requests=5)
+        self.assertEqual(5, results['routes']['voice']['requests'])
@@ -0,0 +1,65 @@
+import unittest
+
+from flask import Flask
+
+from hackpack.cache import TwiMLCache
+
+
+class TwiMLCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.flask_app = Flask(__name__)
+        self.cache = TwiMLCache(self.flask_app)
+        self.renders = []
+
+        @self.flask_app.route('/voice', methods=['GET', 'POST'])
+        @self.cache.cached(config_keys=('TWILIO_CALLER_ID',))
+        def voice():
+            self.renders.append(1)
+            return '<?xml version="1.0" encoding="UTF-8"?><Response>' \
+                   '<Say>{0}</Say></Response>'.format(
+                       self.flask_app.config.get('TWILIO_CALLER_ID'))
+
+        self.app = self.flask_app.test_client()
+
+    def test_renders_once(self):
+        first = self.app.post('/voice')
+        second = self.app.post('/voice')
+        self.assertEqual(1, len(self.renders))
+        self.assertEqual(first.data, second.data)
+
+    def test_headers(self):
+        response = self.app.post('/voice')
+        self.assertEqual("200 OK", response.status)
+        self.assertEqual('text/xml; charset=utf-8', response.content_type)
+        self.assertEqual(str(len(response.data)),
+                         response.headers['Content-Length'])
+        self.assertTrue(response.headers['ETag'].startswith('"'))
+
+    def test_not_modified(self):
+        etag = self.app.post('/voice').headers['ETag']
+        response = self.app.post('/voice', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.data)
+        self.assertEqual(etag, response.headers['ETag'])
+        response = self.app.post('/voice', headers={'If-None-Match': '"x"'})
+        self.assertEqual(200, response.status_code)
+
+    def test_config_change_invalidates(self):
+        self.flask_app.config['TWILIO_CALLER_ID'] = '+15558675309'
+        first = self.app.post('/voice')
+        self.flask_app.config['TWILIO_CALLER_ID'] = '+16667778888'
+        second = self.app.post('/voice')
+        self.assertEqual(2, len(self.renders))
+        self.assertTrue(b'+16667778888' in second.data)
+        self.assertNotEqual(first.headers['ETag'], second.headers['ETag'])
+
+    def test_warm(self):
+        self.cache.warm()
+        self.app.get('/voice')
+        self.assertEqual(1, len(self.renders))
+
+    def test_clear(self):
+        self.app.get('/voice')
+        self.cache.clear()
+        self.app.get('/voice')
+        self.assertEqual(2, len(self.renders))
@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from twilio.rest.exceptions import TwilioRestException
+
+import campaign as campaign_script
+from .context import Clock
+from .fake_twilio import FakeTwilio
+from hackpack.campaign import Campaign
+from hackpack.campaign import Checkpoint
+from hackpack.campaign import Throttle
+from hackpack.campaign import TwilioSender
+from hackpack.campaign import read_recipients
+
+MESSAGES = '/2010-04-01/Accounts/ACxxxxxx/Messages.json'
+
+
+class TempDirTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+
+class ReadRecipientsTest(TempDirTest):
+    def test_header(self):
+        path = self.write('recipients.csv',
+                          'name,phone\nJoey,555-867-5309\n'
+                          'Dee Dee,+1 (555) 867-5309\nJohnny,not a number\n'
+                          'Tommy,6667778888\n')
+        self.assertEqual(['+15558675309', '+16667778888'],
+                         list(read_recipients(path)))
+
+    def test_no_header(self):
+        path = self.write('recipients.csv',
+                          '5558675309,Joey\n\n6667778888,Dee Dee\n')
+        self.assertEqual(['+15558675309', '+16667778888'],
+                         list(read_recipients(path)))
+
+
+class ThrottleTest(unittest.TestCase):
+    def test_spacing(self):
+        clock = Clock()
+        sleeps = []
+        throttle = Throttle(4, clock=clock, sleep=sleeps.append)
+        for _ in range(3):
+            throttle.wait()
+        self.assertEqual([0.25, 0.5], sleeps)
+        clock.now += 10
+        throttle.wait()
+        self.assertEqual(2, len(sleeps))
+
+
+class CheckpointTest(TempDirTest):
+    def test_advances_past_finished_run(self):
+        checkpoint = Checkpoint()
+        checkpoint.finish(1)
+        checkpoint.finish(2)
+        self.assertEqual(0, checkpoint.done)
+        checkpoint.finish(0)
+        self.assertEqual(3, checkpoint.done)
+
+    def test_failed(self):
+        checkpoint = Checkpoint()
+        checkpoint.finish(0, failed=True)
+        checkpoint.finish(1)
+        self.assertEqual(2, checkpoint.done)
+        self.assertEqual(set([0]), checkpoint.failed)
+        checkpoint.finish(0)
+        self.assertEqual(set(), checkpoint.failed)
+        self.assertEqual(set(), checkpoint.finished)
+
+    def test_save_and_load(self):
+        path = os.path.join(self.directory, 'checkpoint.json')
+        checkpoint = Checkpoint(path, source='a.csv', every=2)
+        checkpoint.finish(0)
+        self.assertFalse(os.path.exists(path))
+        checkpoint.finish(1)
+        self.assertEqual(2, Checkpoint(path, source='a.csv').load())
+        self.assertEqual(0, Checkpoint(path, source='b.csv').load())
+
+
+class SenderTest(unittest.TestCase):
+    def setUp(self):
+        self.twilio = FakeTwilio().start()
+        self.sender = TwilioSender('ACxxxxxx', 'yyyyyyyyy',
+                                   base=self.twilio.url)
+
+    def tearDown(self):
+        self.sender.close()
+        self.twilio.stop()
+
+    def test_send_message(self):
+        result = self.sender.send_message('+15558675309', '+16667778888',
+                                          'Hey ho')
+        self.assertTrue(result['sid'].startswith('SM'))
+        self.assertEqual([('POST', MESSAGES,
+                           {'To': '+15558675309', 'From': '+16667778888',
+                            'Body': 'Hey ho'})], self.twilio.requests)
+
+    def test_place_call(self):
+        self.sender.place_call('+15558675309', '+16667778888',
+                               'http://example.com/voice')
+        method, path, params = self.twilio.requests[0]
+        self.assertTrue(path.endswith('/Calls.json'))
+        self.assertEqual('http://example.com/voice', params['Url'])
+
+    def test_keep_alive(self):
+        for _ in range(5):
+            self.sender.send_message('+15558675309', '+16667778888', 'Hey')
+        self.assertEqual(1, len(self.twilio.connections))
+
+    def test_error(self):
+        self.twilio.failures = [400]
+        try:
+            self.sender.send_message('+15558675309', '+16667778888', 'Hey')
+        except TwilioRestException as e:
+            self.assertEqual(400, e.status)
+        else:
+            self.fail("Expected TwilioRestException")
+
+
+class CampaignTest(TempDirTest):
+    def setUp(self):
+        super(CampaignTest, self).setUp()
+        self.twilio = FakeTwilio().start()
+        self.sender = TwilioSender('ACxxxxxx', 'yyyyyyyyy',
+                                   base=self.twilio.url)
+        self.numbers = ['+1555000{0:04d}'.format(i) for i in range(20)]
+
+    def tearDown(self):
+        self.twilio.stop()
+        super(CampaignTest, self).tearDown()
+
+    def campaign(self, **kwargs):
+        kwargs.setdefault('body', 'Hey ho')
+        return Campaign(self.sender, '+16667778888', workers=4, rate=0,
+                        backoff=0.01, **kwargs)
+
+    def sent(self):
+        return sorted(params['To'] for _, _, params in self.twilio.requests)
+
+    def test_sends_to_everyone(self):
+        stats = self.campaign().run(iter(self.numbers))
+        self.assertEqual({'sent': 20, 'failed': 0, 'skipped': 0}, stats)
+        self.assertEqual(self.numbers, self.sent())
+        self.assertTrue(len(self.twilio.connections) <= 4)
+
+    def test_retries_rate_limited(self):
+        self.twilio.failures = [429, 429]
+        stats = self.campaign().run(iter(self.numbers[:3]))
+        self.assertEqual(3, stats['sent'])
+        self.assertEqual(5, len(self.twilio.requests))
+
+    def test_failures_counted(self):
+        self.twilio.failures = [400]
+        stats = self.campaign().run(iter(self.numbers[:3]))
+        self.assertEqual({'sent': 2, 'failed': 1, 'skipped': 0}, stats)
+
+    def test_resume(self):
+        path = os.path.join(self.directory, 'checkpoint.json')
+        with open(path, 'w') as f:
+            json.dump({'source': 'a.csv', 'done': 15}, f)
+        stats = self.campaign(checkpoint=Checkpoint(path, source='a.csv')) \
+            .run(iter(self.numbers))
+        self.assertEqual({'sent': 5, 'failed': 0, 'skipped': 15}, stats)
+        self.assertEqual(self.numbers[15:], self.sent())
+        with open(path) as f:
+            self.assertEqual(20, json.load(f)['done'])
+
+    def test_resume_retries_failed(self):
+        path = os.path.join(self.directory, 'checkpoint.json')
+        self.twilio.failures = [400]
+        stats = self.campaign(checkpoint=Checkpoint(path, source='a.csv')) \
+            .run(iter(self.numbers[:3]))
+        self.assertEqual(1, stats['failed'])
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(3, data['done'])
+        self.assertEqual(1, len(data['failed']))
+        failed = self.numbers[data['failed'][0]]
+
+        del self.twilio.requests[:]
+        stats = self.campaign(checkpoint=Checkpoint(path, source='a.csv')) \
+            .run(iter(self.numbers[:3]))
+        self.assertEqual({'sent': 1, 'failed': 0, 'skipped': 2}, stats)
+        self.assertEqual([failed], self.sent())
+        with open(path) as f:
+            self.assertEqual([], json.load(f)['failed'])
+
+    def test_body_or_url(self):
+        self.assertRaises(ValueError, Campaign, self.sender, '+16667778888')
+        self.assertRaises(ValueError, Campaign, self.sender, '+16667778888',
+                          body='Hey', url='http://example.com/voice')
+
+
+class CampaignScriptTest(TempDirTest):
+    def setUp(self):
+        super(CampaignScriptTest, self).setUp()
+        self.twilio = FakeTwilio().start()
+
+    def tearDown(self):
+        self.twilio.stop()
+        super(CampaignScriptTest, self).tearDown()
+
+    def test_main(self):
+        path = self.write('recipients.csv',
+                          'phone\n5558675309\n555-867-5309\n6667778888\n')
+        stats = campaign_script.main([
+            path, '--body', 'Hey ho', '-S', 'ACxxxxxx', '-K', 'yyyyyyyyy',
+            '--from', '+17778889999', '--rate', '0', '--api',
+            self.twilio.url])
+        self.assertEqual(2, stats['sent'])
+        self.assertEqual(2, len(self.twilio.requests))
+
+    def test_body_or_url_required(self):
+        self.assertRaises(SystemExit, campaign_script.parse_args,
+                          ['recipients.csv', '-S', 'AC', '-K', 'x',
+                           '--from', '+17778889999'])
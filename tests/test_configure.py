@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 import unittest
 from mock import Mock
 from mock import patch
@@ -6,8 +9,11 @@ import logging
 
 from twilio.rest import TwilioRestClient
 from twilio.exceptions import TwilioException
+from twilio.rest.exceptions import TwilioRestException
 
 from .context import configure
+from .fake_twilio import FakeTwilio
+from hackpack.resource_cache import ResourceCache
 
 
 class ConfigureTest(unittest.TestCase):
@@ -20,6 +26,16 @@ class ConfigureTest(unittest.TestCase):
                                                  self.configure.auth_token)
 
 
+class DefaultsTest(unittest.TestCase):
+    @patch.object(configure.local_settings, 'TWILIO_APP_SID', 'APdefault')
+    @patch.object(configure.local_settings, 'TWILIO_CALLER_ID', '+15550000000')
+    def test_defaultsFromLocalSettings(self):
+        self.assertEqual('APdefault', configure.Configure().app_sid)
+        overridden = configure.Configure(app_sid='', phone_number='')
+        self.assertEqual('', overridden.app_sid)
+        self.assertEqual('', overridden.phone_number)
+
+
 class TwilioTest(ConfigureTest):
     @patch('twilio.rest.resources.Applications')
     @patch('twilio.rest.resources.Application')
@@ -410,6 +426,297 @@ class TwilioTest(ConfigureTest):
                                   self.configure.phone_number)
 
 
+class FleetTest(ConfigureTest):
+    def setUp(self):
+        super(FleetTest, self).setUp()
+        self.configure.provisioner.backoff = 0
+        self.configure.client.applications = Mock()
+        self.configure.client.phone_numbers = Mock()
+
+        def update_app(sid, **kwargs):
+            app = Mock()
+            app.sid = sid
+            return app
+        self.configure.client.applications.update.side_effect = update_app
+
+        def list_numbers(phone_number=None):
+            number = Mock()
+            number.sid = "PN" + phone_number[1:]
+            number.friendly_name = phone_number
+            return [number]
+        self.configure.client.phone_numbers.list.side_effect = list_numbers
+
+    def test_configureFleet(self):
+        numbers = self.configure.configureFleet(
+            self.configure.voice_url, self.configure.sms_url,
+            ["AP1", "AP2"], ["+15555555555", "+15555555556"])
+
+        self.assertEqual(["PN15555555555", "PN15555555556"],
+                         [number.sid for number in numbers])
+        apps = self.configure.client.applications.update
+        self.assertEqual(2, apps.call_count)
+        update = self.configure.client.phone_numbers.update
+        self.assertEqual(2, update.call_count)
+        update.assert_any_call("PN15555555555",
+                               voice_application_sid="AP1",
+                               sms_application_sid="AP1")
+        update.assert_any_call("PN15555555556",
+                               voice_application_sid="AP2",
+                               sms_application_sid="AP2")
+
+    def test_configureFleetOneApp(self):
+        self.configure.configureFleet(
+            self.configure.voice_url, self.configure.sms_url,
+            ["AP1"], ["+15555555555", "+15555555556", "+15555555557"])
+        update = self.configure.client.phone_numbers.update
+        self.assertEqual(3, update.call_count)
+        update.assert_any_call("PN15555555557",
+                               voice_application_sid="AP1",
+                               sms_application_sid="AP1")
+
+    def test_configureFleetMismatched(self):
+        self.assertRaises(configure.ConfigurationError,
+                          self.configure.configureFleet,
+                          self.configure.voice_url, self.configure.sms_url,
+                          ["AP1", "AP2"], ["+15555555555", "+15555555556",
+                                           "+15555555557"])
+        self.assertFalse(self.configure.client.applications.update.called)
+
+    @patch.object(subprocess, 'call')
+    @patch.object(configure.Configure, 'configureFleet')
+    def test_startFleet(self, mock_configureFleet, mock_call):
+        self.configure.host = 'http://look-here-snacky-11211.herokuapp.com'
+        self.configure.app_sid = "AP1,AP2"
+        self.configure.phone_number = "+15555555555, +15555555556"
+        self.configure.start()
+        mock_configureFleet.assert_called_once_with(
+            'http://look-here-snacky-11211.herokuapp.com/voice',
+            'http://look-here-snacky-11211.herokuapp.com/sms',
+            ["AP1", "AP2"], ["+15555555555", "+15555555556"])
+        self.assertEqual("AP1", self.configure.app_sid)
+        self.assertEqual("+15555555555", self.configure.phone_number)
+
+    def test_startFleetWithoutNumbers(self):
+        self.configure.host = 'http://look-here-snacky-11211.herokuapp.com'
+        self.configure.app_sid = "AP1,AP2"
+        self.configure.phone_number = None
+        self.assertRaises(configure.ConfigurationError, self.configure.start)
+
+    def test_retryRateLimited(self):
+        limited = TwilioRestException(429, "/Applications/AP1", "Slow down")
+        update = self.configure.client.applications.update
+        update.side_effect = [limited, limited, Mock(sid="AP1")]
+        app = self.configure.setAppRequestUrls("AP1",
+                                               self.configure.voice_url,
+                                               self.configure.sms_url)
+        self.assertEqual("AP1", app.sid)
+        self.assertEqual(3, update.call_count)
+
+
+class FakeTwilioTest(unittest.TestCase):
+    def setUp(self):
+        self.twilio = FakeTwilio().start()
+        self.account_sid = 'AC' + '0' * 32
+        numbers = '/2010-04-01/Accounts/{0}/IncomingPhoneNumbers.json'
+        self.twilio.responses[numbers.format(self.account_sid)] = {
+            'incoming_phone_numbers': [{'sid': 'PN' + '1' * 32,
+                                        'phone_number': '+15558675309',
+                                        'friendly_name': '(555) 867-5309'}]}
+        self.configure = configure.Configure(account_sid=self.account_sid,
+                                             auth_token="yyyyyyyy",
+                                             api_base=self.twilio.url)
+        self.configure.createClient()
+
+    def tearDown(self):
+        self.configure.session.close()
+        self.twilio.stop()
+
+    def test_configureFleet(self):
+        self.twilio.delay = 0.1
+        numbers = self.configure.configureFleet(
+            'http://example.com/voice', 'http://example.com/sms',
+            ['AP' + '2' * 32], ['+15558675309', '+15558675309'])
+        self.assertEqual(['PN' + '1' * 32] * 2,
+                         [number.sid for number in numbers])
+        methods = [method for method, path, params in self.twilio.requests]
+        # The two lookups of the same number are made once.
+        self.assertEqual(['GET', 'POST', 'POST', 'POST'], sorted(methods))
+        self.assertTrue(len(self.twilio.connections) <= 2)
+        stats = self.configure.session.stats()
+        self.assertEqual(1, stats['GET /2010-04-01/Accounts/{sid}/'
+                                  'IncomingPhoneNumbers.json']['coalesced'])
+
+
+class BulkTest(ConfigureTest):
+    def setUp(self):
+        super(BulkTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, "east.txt"), "w") as f:
+            f.write("# East coast\n+1 (555) 555-0001\n\n5555550002,NYC\n")
+        with open(os.path.join(self.directory, "west.txt"), "w") as f:
+            f.write("+15555550003\n+15555550001\n+15555550009\n")
+        self.pattern = os.path.join(self.directory, "*.txt")
+
+        self.voice_url = "http://example.com/voice"
+        self.sms_url = "http://example.com/sms"
+        self.account_numbers = []
+        for i in range(1, 6):
+            number = Mock()
+            number.sid = "PN{0}".format(i)
+            number.phone_number = "+1555555000{0}".format(i)
+            number.friendly_name = "(555) 555-000{0}".format(i)
+            number.voice_application_sid = "APold"
+            number.sms_application_sid = "APold"
+            self.account_numbers.append(number)
+
+        app = Mock(sid="APzzzzzzzzz", voice_url=self.voice_url,
+                   sms_url=self.sms_url)
+        self.configure.client.applications = Mock()
+        self.configure.client.applications.get.return_value = app
+        self.configure.client.phone_numbers = Mock()
+        self.configure.client.phone_numbers.list.side_effect = self.list_page
+        self.configure.client.phone_numbers.update.side_effect = self.update
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def list_page(self, page=0, page_size=50):
+        return self.account_numbers[page * page_size:(page + 1) * page_size]
+
+    def update(self, sid, voice_application_sid=None,
+               sms_application_sid=None):
+        for number in self.account_numbers:
+            if number.sid == sid:
+                number.voice_application_sid = voice_application_sid
+                number.sms_application_sid = sms_application_sid
+
+    def test_readPhoneNumbers(self):
+        self.assertEqual(["+1 (555) 555-0001", "5555550002", "+15555550003",
+                          "+15555550001", "+15555550009"],
+                         list(configure.readPhoneNumbers([self.pattern])))
+
+    def test_readPhoneNumbersNoMatch(self):
+        self.assertRaises(configure.ConfigurationError, list,
+                          configure.readPhoneNumbers(["/nonexistent/*.txt"]))
+
+    def test_indexPhoneNumbersPages(self):
+        index = self.configure.indexPhoneNumbers(page_size=2)
+        self.assertEqual(5, len(index))
+        self.assertEqual("PN4", index["+15555550004"].sid)
+        pages = self.configure.client.phone_numbers.list
+        self.assertEqual(3, pages.call_count)
+
+    def test_configureBulk(self):
+        self.account_numbers[1].voice_application_sid = "APzzzzzzzzz"
+        self.account_numbers[1].sms_application_sid = "APzzzzzzzzz"
+
+        found = self.configure.configureBulk(self.voice_url, self.sms_url,
+                                             "APzzzzzzzzz", [self.pattern])
+
+        self.assertEqual(["PN1", "PN2", "PN3"], [n.sid for n in found])
+        update = self.configure.client.phone_numbers.update
+        self.assertEqual(2, update.call_count)
+        update.assert_any_call("PN1", voice_application_sid="APzzzzzzzzz",
+                               sms_application_sid="APzzzzzzzzz")
+        update.assert_any_call("PN3", voice_application_sid="APzzzzzzzzz",
+                               sms_application_sid="APzzzzzzzzz")
+        self.assertFalse(self.configure.client.applications.update.called)
+
+    def test_configureBulkRerunMakesNoWrites(self):
+        self.configure.configureBulk(self.voice_url, self.sms_url,
+                                     "APzzzzzzzzz", [self.pattern])
+        self.configure.client.phone_numbers.update.reset_mock()
+
+        self.configure.configureBulk(self.voice_url, self.sms_url,
+                                     "APzzzzzzzzz", [self.pattern])
+
+        self.assertFalse(self.configure.client.phone_numbers.update.called)
+        self.assertFalse(self.configure.client.applications.update.called)
+
+    def test_configureBulkUpdatesAppUrls(self):
+        self.configure.client.applications.update.return_value = \
+            self.configure.client.applications.get.return_value
+        self.configure.configureBulk("http://new.example.com/voice",
+                                     self.sms_url, "APzzzzzzzzz",
+                                     [self.pattern])
+        self.assertTrue(self.configure.client.applications.update.called)
+
+
+class ResourceCacheTest(ConfigureTest):
+    def setUp(self):
+        super(ResourceCacheTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.configure.cache = ResourceCache(os.path.join(self.directory,
+                                                          "cache.json"))
+        self.configure.client.applications = Mock()
+        self.configure.client.applications.update.return_value = \
+            Mock(sid=self.configure.app_sid)
+        self.number = Mock(sid="PN123", friendly_name="(555) 555-5555",
+                           phone_number=self.configure.phone_number,
+                           voice_application_sid=self.configure.app_sid,
+                           sms_application_sid=self.configure.app_sid)
+        self.configure.client.phone_numbers = Mock()
+        self.configure.client.phone_numbers.list.return_value = [self.number]
+        self.configure.client.phone_numbers.get.return_value = self.number
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def configureHackpack(self):
+        return self.configure.configureHackpack(self.configure.voice_url,
+                                                self.configure.sms_url,
+                                                self.configure.app_sid,
+                                                self.configure.phone_number)
+
+    def test_rerunVerifiesFromCache(self):
+        self.configureHackpack()
+        self.configure.client.applications.update.reset_mock()
+        self.configure.client.phone_numbers.update.reset_mock()
+        self.configure.client.phone_numbers.list.reset_mock()
+
+        self.assertEqual("PN123", self.configureHackpack().sid)
+
+        self.configure.client.phone_numbers.get.assert_called_once_with(
+            "PN123")
+        self.assertFalse(self.configure.client.applications.update.called)
+        self.assertFalse(self.configure.client.phone_numbers.list.called)
+        self.assertFalse(self.configure.client.phone_numbers.update.called)
+
+    def test_rerunWithNationalNumberVerifiesFromCache(self):
+        self.number.phone_number = "+15555555555"
+        self.configureHackpack()
+        self.configure.client.phone_numbers.list.reset_mock()
+
+        self.configure.phone_number = "(555) 555-5555"
+        self.assertEqual("PN123", self.configureHackpack().sid)
+        self.assertFalse(self.configure.client.phone_numbers.list.called)
+
+    def test_rerunWithChangedNumberReconfigures(self):
+        self.configureHackpack()
+        self.configure.client.phone_numbers.update.reset_mock()
+        self.number.voice_application_sid = "APother"
+
+        self.configureHackpack()
+
+        self.assertTrue(self.configure.client.phone_numbers.update.called)
+
+    def test_refreshSkipsCache(self):
+        self.configureHackpack()
+        self.configure.cache.refresh = True
+        self.configureHackpack()
+        self.assertFalse(self.configure.client.phone_numbers.get.called)
+        pages = self.configure.client.phone_numbers.list
+        self.assertEqual(2, pages.call_count)
+
+    def test_getHerokuHostnameCached(self):
+        host = self.configure.getHerokuHostname(
+            git_config_path='./tests/test_assets/good_git_config')
+        with patch.object(configure, 'open', create=True) as mock_open:
+            self.assertEqual(host, self.configure.getHerokuHostname(
+                git_config_path='./tests/test_assets/good_git_config'))
+            self.assertFalse(mock_open.called)
+
+
 class HerokuTest(ConfigureTest):
     def test_getHerokuHostname(self):
         test = self.configure.getHerokuHostname(git_config_path='./tests'
@@ -551,6 +858,23 @@ class CommandLineTest(unittest.TestCase):
         parser = configure.parse_args(['-dtwilio.com'])
         self.assertEquals(parser.host, "twilio.com")
 
+    def test_numbers_file(self):
+        parser = configure.parse_args(['-f', 'a.txt', '-f', 'numbers/*.txt'])
+        self.assertEqual(['a.txt', 'numbers/*.txt'], parser.numbers_file)
+
+    def test_refresh(self):
+        parser = configure.parse_args(['--refresh', '--cache', 'c.json'])
+        self.assertTrue(parser.cache.refresh)
+        self.assertEqual('c.json', parser.cache.path)
+
+    def test_concurrency(self):
+        parser = configure.parse_args(['-c', '16'])
+        self.assertEqual(16, parser.provisioner.max_workers)
+
+    def test_api(self):
+        parser = configure.parse_args(['--api', 'http://127.0.0.1:8080'])
+        self.assertEqual('http://127.0.0.1:8080', parser.api_base)
+
     def test_debug(self):
         parser = configure.parse_args(['-D'])
         self.assertTrue(parser.logger.level, logging.DEBUG)
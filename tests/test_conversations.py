@@ -0,0 +1,122 @@
+import socket
+import unittest
+
+from .context import Clock
+from .fake_redis import FakeRedis
+from .context import create_app
+from .test_twilio import SETTINGS
+from .test_twilio import TwiMLTest
+from hackpack.conversations import ConversationEngine
+from hackpack.conversations import MemorySessionStore
+from hackpack.conversations import RedisConnection
+from hackpack.conversations import RedisError
+from hackpack.conversations import RedisSessionStore
+from hackpack.conversations import Session
+
+
+class EngineTests(object):
+    """Runs the example conversation against self.engine."""
+
+    def test_conversation(self):
+        self.assertTrue("What's your name?" in
+                        self.engine.reply('+15558675309', 'Hi'))
+        self.assertTrue("Joey" in self.engine.reply('+15558675309', 'Joey'))
+        self.assertEqual("Correct, Joey. Gabba gabba hey!",
+                         self.engine.reply('+15558675309', 'The Ramones'))
+        self.assertEqual(None, self.engine.store.get('+15558675309'))
+
+    def test_senders_are_separate(self):
+        self.engine.reply('+15558675309', 'Hi')
+        self.engine.reply('+15558675309', 'Joey')
+        self.assertTrue("What's your name?" in
+                        self.engine.reply('+16667778888', 'Hi'))
+        self.assertEqual('band', self.engine.store.get('+15558675309').step)
+
+
+class MemoryEngineTest(EngineTests, unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.engine = ConversationEngine(
+            MemorySessionStore(maxsize=2, ttl=60, clock=self.clock),
+            clock=self.clock)
+
+    def test_idle_sessions_expire(self):
+        self.engine.reply('+15558675309', 'Hi')
+        self.clock.now += 61
+        self.assertEqual(None, self.engine.store.get('+15558675309'))
+
+    def test_least_recently_used_evicted(self):
+        for number in ('+15550000001', '+15550000002', '+15550000003'):
+            self.engine.reply(number, 'Hi')
+        self.assertEqual(2, len(self.engine.store))
+        self.assertEqual(None, self.engine.store.get('+15550000001'))
+
+
+class RedisEngineTest(EngineTests, unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis().start()
+        self.engine = ConversationEngine(RedisSessionStore(self.redis.url,
+                                                           ttl=60))
+
+    def tearDown(self):
+        self.redis.stop()
+
+    def test_session_expiry_set(self):
+        self.engine.reply('+15558675309', 'Hi')
+        self.assertTrue(b'hackpack:sms:+15558675309' in self.redis.expires)
+
+
+class RedisConnectionTest(unittest.TestCase):
+    def test_from_url(self):
+        connection = RedisConnection.from_url('redis://:secret@example.com:'
+                                              '6380/2')
+        self.assertEqual(('example.com', 6380), connection.address)
+        self.assertEqual(2, connection.db)
+        self.assertEqual('secret', connection.password)
+
+    def test_error_reply(self):
+        redis = FakeRedis().start()
+        try:
+            connection = RedisConnection.from_url(redis.url)
+            redis.do_get = lambda key: b'-ERR wrong type\r\n'
+            self.assertRaises(RedisError, connection.execute, 'GET', 'key')
+        finally:
+            redis.stop()
+
+
+class SessionTest(unittest.TestCase):
+    def test_round_trip(self):
+        session = Session('+15558675309', 'band', {'name': 'Joey'}, 10.0)
+        loaded = Session.loads('+15558675309', session.dumps())
+        self.assertEqual(('band', {'name': 'Joey'}, 10.0),
+                         (loaded.step, loaded.data, loaded.updated))
+
+
+class SMSConversationTest(TwiMLTest):
+    settings = {'SMS_CONVERSATIONS': True, 'SMS_SESSION_URL': None}
+
+    def test_sms_conversation(self):
+        response = self.sms("Hi", from_='+15550001111')
+        self.assertTwiML(response)
+        self.assertTrue(b"What's your name?" in response.data)
+        response = self.sms("Dee Dee", from_='+15550001111')
+        self.assertTrue(b"Nice to meet you, Dee Dee!" in response.data)
+
+    def test_disabled_serves_greeting(self):
+        self.app = create_app(SETTINGS).test_client()
+        response = self.sms("Hi", from_='+15550002222')
+        self.assertTwiML(response)
+        self.assertFalse(b"What's your name?" in response.data)
+
+    def test_unreachable_store_serves_greeting(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        settings = dict(SETTINGS, SMS_CONVERSATIONS=True,
+                        SMS_SESSION_URL='redis://127.0.0.1:{0}/0'.format(port))
+        self.app = create_app(settings).test_client()
+        response = self.sms("Hi", from_='+15550003333')
+        self.assertEqual(response.status_code, 200)
+        self.assertTwiML(response)
+        self.assertFalse(b"What's your name?" in response.data)
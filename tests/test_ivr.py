@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from .context import Clock
+from .test_twilio import TwiMLTest
+from hackpack import ivr
+from hackpack import reloader
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'hackpack', 'flows', 'example.json')
+
+
+class CompileFlowTest(unittest.TestCase):
+    def setUp(self):
+        self.flow = ivr.compile_flow(ivr.load_flow(EXAMPLE))
+
+    def test_menu(self):
+        body = self.flow.respond('main').body
+        self.assertTrue(b'<Gather action="/voice/ivr/main" method="POST" '
+                        b'numDigits="1" timeout="5">' in body, body)
+        self.assertTrue(b'<Redirect method="POST">/voice/ivr/main'
+                        b'</Redirect>' in body, body)
+
+    def test_digits_route(self):
+        self.assertTrue(self.flow.respond('main', '1') is
+                        self.flow.respond('band'))
+        self.assertTrue(b'<Hangup />' in self.flow.respond('main', '2').body)
+
+    def test_unknown_digits_repeat_menu(self):
+        self.assertTrue(self.flow.respond('main', '9') is
+                        self.flow.respond('main'))
+
+    def test_unknown_node(self):
+        self.assertEqual(None, self.flow.respond('nope'))
+
+    def test_redirect(self):
+        self.assertTrue(b'<Redirect method="POST">/voice/ivr/main'
+                        b'</Redirect>' in self.flow.respond('band').body)
+
+    def test_default(self):
+        flow = ivr.compile_flow({
+            'start': 'main',
+            'nodes': {'main': {'say': 'Menu', 'routes': {'1': 'one'},
+                               'default': 'oops'},
+                      'one': {'say': 'One'},
+                      'oops': {'say': ['Oops', 'Try again'],
+                               'redirect': 'main'}}})
+        self.assertTrue(b'<Say>Oops</Say><Say>Try again</Say>' in
+                        flow.respond('main', '5').body)
+
+    def test_invalid_flows(self):
+        for definition in ({},
+                           {'start': 'main', 'nodes': {}},
+                           {'start': 'main',
+                            'nodes': {'main': {'routes': {'1': 'nope'}}}},
+                           {'start': 'main',
+                            'nodes': {'main': {'redirect': 'nope'}}},
+                           {'start': 'main', 'nodes': {'main': 'oops'}},
+                           {'start': 'main',
+                            'nodes': {'main': {'routes': ['1']}}},
+                           {'start': 'main',
+                            'nodes': {'main': {'routes': {'1': ['main']}}}},
+                           {'start': 'main',
+                            'nodes': {'main': {'say': {'text': 'Hi'}}}}):
+            self.assertRaises(ivr.FlowError, ivr.compile_flow, definition)
+
+
+class CallFlowLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'flow.json')
+        self.write('Hello')
+        self.clock = Clock()
+        self.loader = ivr.CallFlowLoader(self.path, check_interval=2,
+                                         clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, text, mtime=None):
+        with open(self.path, 'w') as f:
+            json.dump({'start': 'main', 'nodes': {'main': {'say': text}}}, f)
+        if mtime:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_hot_reload(self):
+        self.assertTrue(b'Hello' in self.loader.respond().body)
+        self.write('Goodbye', mtime=os.stat(self.path).st_mtime + 10)
+        self.assertTrue(b'Hello' in self.loader.respond().body)
+        self.clock.now += 2
+        self.assertTrue(b'Goodbye' in self.loader.respond().body)
+
+    def reload(self, text, path=None):
+        path = path or self.path
+        with open(path, 'w') as f:
+            f.write(text)
+        os.utime(path, (self.clock.now + 10, self.clock.now + 10))
+        self.clock.now += 2
+
+    def test_bad_reload_keeps_serving(self):
+        self.reload('{not json')
+        self.assertTrue(b'Hello' in self.loader.respond().body)
+
+    def test_wrong_shape_keeps_serving(self):
+        self.reload('{"start": "main", "nodes": {"main": "oops"}}')
+        self.assertTrue(b'Hello' in self.loader.respond().body)
+
+    @unittest.skipIf(reloader.yaml is None, "PyYAML is not installed.")
+    def test_bad_yaml_reload_keeps_serving(self):
+        path = os.path.join(self.directory, 'flow.yaml')
+        with open(path, 'w') as f:
+            f.write("start: main\nnodes:\n  main:\n    say: Hey ho\n")
+        loader = ivr.CallFlowLoader(path, check_interval=2, clock=self.clock)
+        self.reload("start: main\nnodes: [unclosed\n", path)
+        self.assertTrue(b'Hey ho' in loader.respond().body)
+
+    def test_disabled(self):
+        loader = ivr.CallFlowLoader()
+        self.assertFalse(loader.enabled)
+        self.assertEqual(None, loader.respond())
+
+
+@unittest.skipIf(reloader.yaml is None, "PyYAML is not installed.")
+class YAMLFlowTest(unittest.TestCase):
+    def test_yaml(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'flow.yaml')
+            with open(path, 'w') as f:
+                f.write("start: main\nnodes:\n  main:\n    say: Hey ho\n")
+            flow = ivr.compile_flow(ivr.load_flow(path))
+            self.assertTrue(b'<Say>Hey ho</Say>' in flow.respond('main').body)
+        finally:
+            shutil.rmtree(directory)
+
+
+class IVRWebTest(TwiMLTest):
+    settings = {'IVR_FLOW': EXAMPLE}
+
+    def test_voice_starts_flow(self):
+        response = self.call()
+        self.assertTwiML(response)
+        self.assertTrue(b'<Gather' in response.data)
+
+    def test_digits(self):
+        response = self.call(url='/voice/ivr/main', digits='1')
+        self.assertTwiML(response)
+        self.assertTrue(b'Ramones' in response.data)
+
+    def test_unknown_node(self):
+        response = self.call(url='/voice/ivr/nope')
+        self.assertEqual("404 NOT FOUND", response.status)
@@ -0,0 +1,70 @@
+import unittest
+
+from flask import Flask
+
+from .context import app
+from hackpack.metrics import Histogram
+from hackpack.metrics import Metrics
+from hackpack.metrics import NULL_TIMER
+
+
+class HistogramTest(unittest.TestCase):
+    def test_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test.', ('endpoint',),
+                              buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(('voice',), value)
+        samples = dict((name + str(labels), value) for name, _, labels, value
+                       in histogram.samples())
+        self.assertEqual(1, samples["test_seconds_bucket('voice', '0.1')"])
+        self.assertEqual(3, samples["test_seconds_bucket('voice', '1.0')"])
+        self.assertEqual(4, samples["test_seconds_bucket('voice', '+Inf')"])
+        self.assertEqual(4, samples["test_seconds_count('voice',)"])
+        self.assertAlmostEqual(6.05, samples["test_seconds_sum('voice',)"])
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.flask_app = Flask(__name__)
+        self.flask_app.config['METRICS_ENABLED'] = True
+        self.metrics = Metrics(self.flask_app)
+
+        @self.flask_app.route('/voice', methods=['POST'])
+        def voice():
+            with self.metrics.timer('twiml'):
+                return '<Response><Say>Hello</Say></Response>'
+
+        self.app = self.flask_app.test_client()
+
+    def test_exposition(self):
+        self.app.post('/voice')
+        self.app.post('/voice')
+        response = self.app.get('/metrics')
+        self.assertEqual("200 OK", response.status)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        body = response.data.decode('utf-8')
+        self.assertTrue('# TYPE hackpack_request_duration_seconds histogram'
+                        in body, body)
+        self.assertTrue('hackpack_requests_total{endpoint="voice",'
+                        'status="200"} 2' in body, body)
+        self.assertTrue('hackpack_request_duration_seconds_count'
+                        '{endpoint="voice"} 2' in body, body)
+        self.assertTrue('hackpack_twiml_serialization_seconds_count'
+                        '{endpoint="voice"} 2' in body, body)
+        self.assertTrue('hackpack_response_size_bytes_sum'
+                        '{endpoint="voice"} 74' in body, body)
+
+
+class DisabledMetricsTest(unittest.TestCase):
+    def test_disabled(self):
+        flask_app = Flask(__name__)
+        metrics = Metrics(flask_app)
+        self.assertFalse(metrics.enabled)
+        self.assertTrue(metrics.timer('twiml') is NULL_TIMER)
+        self.assertEqual([], flask_app.before_request_funcs.get(None, []))
+        self.assertEqual("404 NOT FOUND",
+                         flask_app.test_client().get('/metrics').status)
+
+    def test_hackpack_default(self):
+        response = app.test_client().get('/metrics')
+        self.assertEqual("404 NOT FOUND", response.status)
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zlib
+
+from flask import Flask
+from flask import render_template
+from flask import request
+
+from .context import Clock
+from .context import create_app
+from .test_web import SETTINGS
+from hackpack import pages as pages_module
+from hackpack.pages import PageCache
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('page.html', 'Hello {{ name }} at {{ host }}, '
+                                'token {{ token }}.')
+        self.clock = Clock()
+        self.rendered = []
+        app = Flask(__name__, template_folder=self.directory)
+        self.pages = PageCache(app, render=self.render, clock=self.clock)
+
+        @app.route('/')
+        def index():
+            return self.pages.response(
+                'page.html',
+                lambda: {'name': 'Joey', 'host': request.host,
+                         'token': self.pages.slot('token')},
+                fill={'token': request.args.get('token', 'abc')})
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text, mtime=None):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        if mtime:
+            os.utime(path, (mtime, mtime))
+
+    def render(self, template, **context):
+        self.rendered.append(template)
+        return render_template(template, **context)
+
+    def test_rendered_once_per_host(self):
+        response = self.client.get('/')
+        self.assertEqual(b'Hello Joey at localhost, token abc.',
+                         response.data)
+        self.client.get('/')
+        self.client.get('/', headers={'Host': 'example.com'})
+        self.assertEqual(2, len(self.rendered))
+
+    def test_splices_token_without_rendering(self):
+        self.client.get('/')
+        response = self.client.get('/?token=<def>')
+        self.assertEqual(b'Hello Joey at localhost, token &lt;def&gt;.',
+                         response.data)
+        self.assertEqual(1, len(self.rendered))
+        self.assertEqual('private, no-cache',
+                         response.headers['Cache-Control'])
+
+    def test_gzip(self):
+        response = self.client.get('/', headers={'Accept-Encoding':
+                                                 'gzip, deflate'})
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(b'Hello Joey at localhost, token abc.',
+                         zlib.decompress(response.data, 31))
+
+    @unittest.skipIf(pages_module.brotli is None,
+                     "brotli is not installed.")
+    def test_brotli(self):
+        response = self.client.get('/', headers={'Accept-Encoding':
+                                                 'gzip, br'})
+        self.assertEqual('br', response.headers['Content-Encoding'])
+
+    def test_not_modified(self):
+        etag = self.client.get('/').headers['ETag']
+        response = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.data)
+        response = self.client.get('/', headers={'If-None-Match': etag,
+                                                 'Accept-Encoding': 'gzip'})
+        self.assertEqual(200, response.status_code)
+
+    def test_template_change(self):
+        self.client.get('/')
+        self.write('page.html', 'Goodbye {{ name }}.',
+                   mtime=time.time() + 10)
+        self.assertTrue(b'Hello' in self.client.get('/').data)
+        self.clock.now += 2
+        self.assertEqual(b'Goodbye Joey.', self.client.get('/').data)
+
+
+class HackpackPagesTest(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app(SETTINGS).test_client()
+
+    def test_index_urls(self):
+        response = self.client.get('/', headers={'Host': 'example.com'})
+        self.assertTrue(b'http://example.com/voice' in response.data)
+        etag = response.headers['ETag']
+        response = self.client.get('/', headers={'Host': 'example.com',
+                                                 'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+
+    def test_client_token(self):
+        response = self.client.get('/client')
+        self.assertTrue(b'Twilio.Device.setup("ey' in response.data,
+                        response.data)
+        self.assertFalse(b'hackpack-slot' in response.data)
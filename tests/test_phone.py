@@ -0,0 +1,50 @@
+import unittest
+
+from hackpack import phone
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_formats_are_equivalent(self):
+        for number in ('+1 (555) 867-5309', '15558675309', '5558675309',
+                       '555.867.5309', ' +15558675309 '):
+            self.assertEqual('+15558675309', phone.normalize(number),
+                             "Did not normalize: {0}".format(number))
+
+    def test_international(self):
+        self.assertEqual('+442079460958',
+                         phone.normalize('+44 20 7946 0958'))
+
+    def test_country_code(self):
+        self.assertEqual('+442079460958',
+                         phone.normalize('2079460958', country_code='44'))
+
+    def test_invalid(self):
+        for number in (None, '', 'AKJD:LFKNAFJ', '555-1234', '+', '1+555',
+                       '+0123456789', '+1234567890123456'):
+            self.assertEqual(None, phone.normalize(number),
+                             "Accepted invalid number: {0}".format(number))
+
+    def test_dial_string(self):
+        self.assertEqual('+15558675309', phone.dial_string('555-867-5309'))
+        self.assertEqual('+442079460958',
+                         phone.dial_string('2079460958', country_code='44'))
+        for number, digits in (('911', '911'), ('55555', '55555'),
+                               ('555-1234', '5551234'),
+                               ('02079460958', '02079460958')):
+            self.assertEqual(digits, phone.dial_string(number))
+
+    def test_dial_string_invalid(self):
+        for number in (None, '', 'AKJD:LFKNAFJ', '+', '+911', '1+555',
+                       '+0123456789', '1234567890123456'):
+            self.assertEqual(None, phone.dial_string(number),
+                             "Accepted invalid number: {0}".format(number))
+
+    def test_normalize_many(self):
+        self.assertEqual(['+15558675309', None, '+16667778888'],
+                         phone.normalize_many(['(555) 867-5309', 'nope',
+                                               '16667778888']))
+
+    def test_unique(self):
+        numbers = ['5558675309', '+1 555 867 5309', 'nope', '16667778888']
+        self.assertEqual(['+15558675309', '+16667778888'],
+                         list(phone.unique(numbers)))
@@ -0,0 +1,80 @@
+import threading
+import time
+import unittest
+
+from twilio.rest.exceptions import TwilioRestException
+
+from hackpack import provision
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.attempts = 0
+
+    def flaky(self, failures, status=429):
+        def call():
+            self.attempts += 1
+            if self.attempts <= failures:
+                raise TwilioRestException(status, "/Numbers", "Error")
+            return "done"
+        return call
+
+    def test_retries_rate_limited(self):
+        result = provision.retry(self.flaky(3), backoff=1.0,
+                                 sleep=self.sleeps.append)
+        self.assertEqual("done", result)
+        self.assertEqual(3, len(self.sleeps))
+        self.assertTrue(0.5 <= self.sleeps[0] <= 1.0)
+        self.assertTrue(2.0 <= self.sleeps[2] <= 4.0)
+
+    def test_gives_up(self):
+        self.assertRaises(TwilioRestException, provision.retry,
+                          self.flaky(10), retries=2, sleep=self.sleeps.append)
+        self.assertEqual(3, self.attempts)
+
+    def test_other_errors_not_retried(self):
+        self.assertRaises(TwilioRestException, provision.retry,
+                          self.flaky(1, status=404), sleep=self.sleeps.append)
+        self.assertEqual([], self.sleeps)
+
+
+class RunConcurrentlyTest(unittest.TestCase):
+    def test_results_in_order(self):
+        calls = [lambda i=i: i * 2 for i in range(20)]
+        self.assertEqual([i * 2 for i in range(20)],
+                         provision.run_concurrently(calls, max_workers=4))
+
+    def test_concurrency_limit(self):
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def call():
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+
+        provision.run_concurrently([call] * 12, max_workers=3)
+        self.assertEqual(3, active[1])
+
+    def test_raises_first_error(self):
+        def fail(message):
+            def call():
+                raise ValueError(message)
+            return call
+
+        calls = [lambda: 1, fail("first"), fail("second")]
+        try:
+            provision.run_concurrently(calls, max_workers=3)
+        except ValueError as e:
+            self.assertEqual("first", str(e))
+        else:
+            self.fail("Expected ValueError.")
+
+    def test_map(self):
+        provisioner = provision.Provisioner(max_workers=2)
+        self.assertEqual([1, 4, 9], provisioner.map(lambda x: x * x,
+                                                    [1, 2, 3]))
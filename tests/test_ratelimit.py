@@ -0,0 +1,154 @@
+import socket
+import threading
+import unittest
+
+from .context import Clock
+from .fake_redis import FakeRedis
+from .test_twilio import TwiMLTest
+from hackpack.ratelimit import DialLimiter
+from hackpack.ratelimit import Limit
+from hackpack.ratelimit import MemoryBuckets
+from hackpack.ratelimit import RedisBuckets
+
+
+class LimitTest(unittest.TestCase):
+    def test_parse(self):
+        limit = Limit.parse('10/60')
+        self.assertEqual((10, 60.0), (limit.count, limit.period))
+        self.assertEqual(1.0, Limit.parse('5').period)
+        self.assertEqual(None, Limit.parse(''))
+        self.assertEqual(None, Limit.parse(None))
+
+
+class MemoryBucketsTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.buckets = MemoryBuckets(stripes=4, clock=self.clock)
+        self.limit = Limit(2, 10)
+
+    def test_burst_then_refill(self):
+        self.assertTrue(self.buckets.take('a', self.limit))
+        self.assertTrue(self.buckets.take('a', self.limit))
+        self.assertFalse(self.buckets.take('a', self.limit))
+        self.assertTrue(self.buckets.take('b', self.limit))
+        self.clock.now += 5
+        self.assertTrue(self.buckets.take('a', self.limit))
+        self.assertFalse(self.buckets.take('a', self.limit))
+
+    def test_threads(self):
+        limit = Limit(100, 3600)
+        allowed = []
+
+        def take():
+            for _ in range(50):
+                allowed.append(self.buckets.take('shared', limit))
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(100, allowed.count(True))
+
+
+class RedisBucketsTest(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis().start()
+        self.clock = Clock()
+        self.buckets = RedisBuckets(self.redis.url, clock=self.clock)
+
+    def tearDown(self):
+        self.redis.stop()
+
+    def test_window(self):
+        limit = Limit(2, 60)
+        self.assertTrue(self.buckets.take('a', limit))
+        self.assertTrue(self.buckets.take('a', limit))
+        self.assertFalse(self.buckets.take('a', limit))
+        self.assertEqual(1, len(self.redis.expires))
+        self.clock.now += 60
+        self.assertTrue(self.buckets.take('a', limit))
+
+    def test_unreachable_allows(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        buckets = RedisBuckets('redis://127.0.0.1:{0}/0'.format(port))
+        self.assertTrue(buckets.take('a', Limit(1, 60)))
+
+
+class DialLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.limiter = DialLimiter(MemoryBuckets(clock=Clock()),
+                                   client=Limit(3, 60), number=Limit(1, 60),
+                                   prefix=Limit(2, 60), total=Limit(4, 1))
+
+    def test_number(self):
+        self.assertTrue(self.limiter.allow('client:joey', '+15558675309'))
+        self.assertFalse(self.limiter.allow('client:dee', '+15558675309'))
+
+    def test_client(self):
+        for number in ('+15558675309', '+16667778888', '+17778889999'):
+            self.assertTrue(self.limiter.allow('client:joey', number))
+        self.assertFalse(self.limiter.allow('client:joey', '+18889990000'))
+
+    def test_prefix(self):
+        self.assertTrue(self.limiter.allow('client:joey', '+19005550001'))
+        self.assertTrue(self.limiter.allow('client:dee', '+19005550002'))
+        self.assertFalse(self.limiter.allow('client:johnny',
+                                            '+19005550003'))
+
+    def test_total(self):
+        for i in range(4):
+            self.assertTrue(self.limiter.allow('client:{0}'.format(i),
+                                               '+1{0}005550000'.format(i)))
+        self.assertFalse(self.limiter.allow('client:tommy', '+15558675309'))
+
+    def test_refused_call_is_not_charged(self):
+        self.assertTrue(self.limiter.allow('client:joey', '+15558675309'))
+        for _ in range(5):
+            self.assertFalse(self.limiter.allow('client:dee',
+                                                '+15558675309'))
+        for number in ('+16667778888', '+17778889999', '+18889990000'):
+            self.assertTrue(self.limiter.allow('client:dee', number))
+
+    def test_refused_call_is_not_charged_in_redis(self):
+        redis = FakeRedis().start()
+        self.addCleanup(redis.stop)
+        self.limiter.buckets = RedisBuckets(redis.url, clock=Clock())
+        self.test_refused_call_is_not_charged()
+
+    def test_disabled(self):
+        self.limiter.enabled = False
+        for _ in range(10):
+            self.assertTrue(self.limiter.allow('client:joey',
+                                               '+15558675309'))
+
+    def test_from_config(self):
+        limiter = DialLimiter.from_config({'DIAL_RATE_LIMITS': True,
+                                           'DIAL_LIMIT_CLIENT': '10/60',
+                                           'DIAL_LIMIT_URL': None})
+        self.assertTrue(limiter.enabled)
+        self.assertTrue(isinstance(limiter.buckets, MemoryBuckets))
+        self.assertEqual(10, limiter.client.count)
+        self.assertEqual(None, limiter.total)
+
+
+class DialLimitWebTest(TwiMLTest):
+    settings = {'DIAL_RATE_LIMITS': True, 'DIAL_LIMIT_NUMBER': '1/60',
+                'DIAL_LIMIT_URL': None}
+
+    def dial(self):
+        return self.app.post('/client/incoming',
+                             data={'PhoneNumber': '+15558675309',
+                                   'From': 'client:joey_ramone'})
+
+    def test_limited(self):
+        response = self.dial()
+        self.assertTwiML(response)
+        self.assertTrue(b'<Number>+15558675309</Number>' in response.data)
+        response = self.dial()
+        self.assertTwiML(response)
+        self.assertTrue(b'Too many calls' in response.data)
+        self.assertFalse(b'<Dial' in response.data)
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from .context import Clock
+from hackpack.resource_cache import ResourceCache
+
+
+class ResourceCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.json')
+        self.clock = Clock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def cache(self, **kwargs):
+        return ResourceCache(self.path, ttl=60, clock=self.clock, **kwargs)
+
+    def test_round_trip(self):
+        cache = self.cache()
+        cache.set('applications', 'ACxxx:APzzz', {'voice_url': '/voice'})
+        cache.save()
+        self.assertEqual({'voice_url': '/voice'},
+                         self.cache().get('applications', 'ACxxx:APzzz'))
+
+    def test_expiry(self):
+        cache = self.cache()
+        cache.set('hosts', 'config', 'http://example.com')
+        self.clock.now += 61
+        self.assertEqual(None, cache.get('hosts', 'config'))
+
+    def test_save_drops_expired(self):
+        cache = self.cache()
+        cache.set('hosts', 'old', 'http://old.example.com', ttl=1)
+        cache.set('hosts', 'new', 'http://new.example.com')
+        self.clock.now += 2
+        cache.save()
+        with open(self.path) as f:
+            self.assertEqual(['new'], list(json.load(f)['hosts']))
+
+    def test_refresh_ignores_cached_values(self):
+        cache = self.cache()
+        cache.set('hosts', 'config', 'http://example.com')
+        cache.save()
+        refreshed = self.cache(refresh=True)
+        self.assertEqual(None, refreshed.get('hosts', 'config'))
+        refreshed.set('hosts', 'config', 'http://other.example.com')
+        refreshed.save()
+        self.assertEqual('http://other.example.com',
+                         self.cache().get('hosts', 'config'))
+
+    def test_corrupt_file(self):
+        with open(self.path, 'w') as f:
+            f.write('not json')
+        self.assertEqual(None, self.cache().get('hosts', 'config'))
+
+    def test_delete(self):
+        cache = self.cache()
+        cache.set('hosts', 'config', 'http://example.com')
+        cache.delete('hosts', 'config')
+        self.assertEqual(None, cache.get('hosts', 'config'))
+
+    def test_save_without_changes_writes_nothing(self):
+        self.cache().save()
+        self.assertFalse(os.path.exists(self.path))
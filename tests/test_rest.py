@@ -0,0 +1,125 @@
+import socket
+import threading
+import time
+import unittest
+
+from twilio.rest.exceptions import TwilioRestException
+
+from .fake_twilio import FakeTwilio
+from hackpack.rest import RestSession
+from hackpack.rest import rest_client
+
+ACCOUNT_SID = 'AC' + '0' * 32
+NUMBERS = '/2010-04-01/Accounts/{0}/IncomingPhoneNumbers.json'.format(
+    ACCOUNT_SID)
+ENDPOINT = 'GET /2010-04-01/Accounts/{sid}/IncomingPhoneNumbers.json'
+NUMBER = {'sid': 'PN' + '1' * 32, 'phone_number': '+15558675309',
+          'friendly_name': '(555) 867-5309'}
+
+
+class FakeTwilioTest(unittest.TestCase):
+    def setUp(self):
+        self.twilio = FakeTwilio().start()
+        self.twilio.responses[NUMBERS] = {'incoming_phone_numbers': [NUMBER]}
+        self.session = RestSession(ACCOUNT_SID, 'yyyyyyyyy',
+                                   base=self.twilio.url)
+
+    def tearDown(self):
+        self.session.close()
+        self.twilio.stop()
+
+
+class RestSessionTest(FakeTwilioTest):
+    def get_concurrently(self, paths):
+        responses = [None] * len(paths)
+
+        def get(i):
+            responses[i] = self.session.request('GET', paths[i])
+        threads = [threading.Thread(target=get, args=(i,))
+                   for i in range(len(paths))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_keep_alive(self):
+        for _ in range(3):
+            self.session.request('GET', NUMBERS)
+            self.session.request('POST', self.session.resource_path(
+                'Messages'), data={'Body': 'Hey'})
+        self.assertEqual(6, len(self.twilio.requests))
+        self.assertEqual(1, len(self.twilio.connections))
+
+    def test_coalesce_gets(self):
+        self.twilio.delay = 0.2
+        responses = self.get_concurrently([NUMBERS + '?PhoneNumber=1'] * 5)
+        self.assertEqual(1, len(self.twilio.requests))
+        self.assertTrue(all(response is responses[0]
+                            for response in responses))
+        stats = self.session.stats()[ENDPOINT]
+        self.assertEqual(1, stats['requests'])
+        self.assertEqual(4, stats['coalesced'])
+        self.assertTrue(stats['max_ms'] >= 200)
+
+    def test_different_gets(self):
+        self.twilio.delay = 0.1
+        self.get_concurrently([NUMBERS + '?PhoneNumber=1',
+                               NUMBERS + '?PhoneNumber=2'])
+        self.assertEqual(2, len(self.twilio.requests))
+
+    def test_error(self):
+        self.twilio.failures = [429]
+        try:
+            self.session.request('GET', NUMBERS)
+        except TwilioRestException as e:
+            self.assertEqual(429, e.status)
+            self.assertEqual(20429, e.code)
+        else:
+            self.fail("Expected TwilioRestException")
+        self.session.request('GET', NUMBERS)
+        stats = self.session.stats()[ENDPOINT]
+        self.assertEqual(2, stats['requests'])
+        self.assertEqual(1, stats['errors'])
+
+    def test_no_retry_after_timeout(self):
+        session = RestSession(ACCOUNT_SID, 'yyyyyyyyy', base=self.twilio.url,
+                              timeout=0.2)
+        self.twilio.delay = 0.5
+        self.assertRaises(socket.timeout, session.request, 'POST',
+                          session.resource_path('Messages'),
+                          data={'Body': 'Hey'})
+        time.sleep(0.8)
+        self.assertEqual(1, len(self.twilio.requests))
+        session.close()
+
+    def test_retry_closed_idle_connection(self):
+        messages = self.session.resource_path('Messages')
+        self.session.request('POST', messages, data={'Body': 'Hey'})
+        self.session.idle[0].sock.shutdown(socket.SHUT_RDWR)
+        self.session.request('POST', messages, data={'Body': 'Ho'})
+        self.assertEqual(['Hey', 'Ho'], [params['Body'] for method, path,
+                                         params in self.twilio.requests])
+
+
+class RestClientTest(FakeTwilioTest):
+    def setUp(self):
+        super(RestClientTest, self).setUp()
+        self.client = rest_client(self.session)
+
+    def test_list(self):
+        numbers = self.client.phone_numbers.list(phone_number='+15558675309')
+        self.assertEqual(NUMBER['sid'], numbers[0].sid)
+        self.assertEqual([('GET', NUMBERS + '?PhoneNumber=%2B15558675309',
+                           {})], self.twilio.requests)
+
+    def test_update(self):
+        self.client.applications.update('AP' + '2' * 32,
+                                        voice_url='http://example.com/voice')
+        method, path, params = self.twilio.requests[0]
+        self.assertEqual('POST', method)
+        self.assertTrue(path.endswith('/Applications/AP{0}.json'.format(
+            '2' * 32)))
+        self.assertEqual({'VoiceUrl': 'http://example.com/voice'}, params)
+        self.assertTrue('POST /2010-04-01/Accounts/{sid}/Applications/'
+                        '{sid}.json' in self.session.stats())
@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from .context import Clock
+from .test_twilio import TwiMLTest
+from hackpack import reloader
+from hackpack import rules
+from hackpack.resource_cache import replace
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'hackpack', 'flows', 'rules.json')
+
+
+class PrefixTrieTest(unittest.TestCase):
+    def test_match(self):
+        trie = rules.PrefixTrie()
+        trie.add('+1212', 1)
+        trie.add('+1212555', 2)
+        trie.add('+1646', 4)
+        self.assertEqual(3, trie.match('+12125550000'))
+        self.assertEqual(1, trie.match('+12120000000'))
+        self.assertEqual(0, trie.match('+13125550000'))
+        self.assertEqual(0, trie.match(''))
+
+
+class KeywordAutomatonTest(unittest.TestCase):
+    def setUp(self):
+        self.automaton = rules.KeywordAutomaton()
+        for bit, keyword in enumerate(('stop', 'top', 'opt out', 'hours')):
+            self.automaton.add(keyword, 1 << bit)
+
+    def test_whole_words(self):
+        self.assertEqual(1, self.automaton.match('STOP'))
+        self.assertEqual(1, self.automaton.match('please stop!'))
+        self.assertEqual(0, self.automaton.match('stopwatch'))
+        self.assertEqual(2, self.automaton.match('the top floor'))
+
+    def test_phrases_and_overlaps(self):
+        self.assertEqual(4 | 8, self.automaton.match('Hours? Opt out.'))
+        self.assertEqual(0, self.automaton.match('options'))
+
+    def test_suffix_links(self):
+        # 'top' ends inside 'stop' and must still be found after it.
+        self.assertEqual(1 | 2, self.automaton.match('stop top'))
+
+
+class RuleIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = rules.RuleIndex([
+            {'keywords': ['stop'], 'sms': 'Bye.'},
+            {'to': '+15558675309', 'keywords': 'hours', 'sms': 'Noon.'},
+            {'from': ['+1212', '+1646'], 'say': 'Hi, New York.',
+             'hangup': True},
+            {'to': '+1555', 'sms': 'Hello.', 'say': 'Hello.'}])
+
+    def body(self, document):
+        return document.body if document is not None else None
+
+    def test_first_match_wins(self):
+        self.assertTrue(b'Bye.' in self.body(self.index.match(
+            'sms', '+15558675309', '+12125550000', 'Stop')))
+        self.assertTrue(b'Noon.' in self.body(self.index.match(
+            'sms', '+15558675309', '+12125550000', 'hours?')))
+        self.assertTrue(b'Hello.' in self.body(self.index.match(
+            'sms', '+15558675309', '+12125550000', 'Hi')))
+
+    def test_channels(self):
+        voice = self.body(self.index.match('voice', '+15558675309',
+                                           '+12125550000'))
+        self.assertTrue(b'<Say>Hi, New York.</Say><Hangup />' in voice)
+        self.assertTrue(b'<Say>Hello.</Say>' in self.body(
+            self.index.match('voice', '+15558675309', '+13125550000')))
+
+    def test_no_match(self):
+        self.assertEqual(None, self.index.match('sms', '+16667778888',
+                                                '+13125550000', 'Hi'))
+        self.assertEqual(None, self.index.match('voice'))
+
+    def test_invalid(self):
+        for rule in ({}, {'to': '+1555'}, {'keywords': 'x', 'say': 'Hi'},
+                     {'keywords': [''], 'sms': 'Hi'}, 'stop'):
+            self.assertRaises(rules.RuleError, rules.RuleIndex, [rule])
+
+    def test_example(self):
+        index = rules.RuleIndex(rules.load_rules(EXAMPLE))
+        self.assertEqual(3, len(index))
+
+    def test_many_rules(self):
+        index = rules.RuleIndex(
+            [{'to': '+1555{0:07d}'.format(i), 'keywords': 'word{0}'.format(i),
+              'sms': 'Rule {0}'.format(i)} for i in range(5000)])
+        document = index.match('sms', '+15550004999', '+1', 'say word4999')
+        self.assertTrue(b'Rule 4999' in document.body)
+        self.assertEqual(None, index.match('sms', '+15550004999', '+1',
+                                           'say word4998'))
+
+
+class RulesLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'rules.json')
+        self.write('Hello')
+        self.clock = Clock()
+        self.loader = rules.RulesLoader(self.path, check_interval=2,
+                                        clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, text, mtime=None):
+        # Written beside the old file and renamed over it, as documented.
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'rules': [{'sms': text}]}, f)
+        replace(temp_path, self.path)
+        if mtime:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_swap(self):
+        self.assertTrue(b'Hello' in self.loader.match('sms').body)
+        self.write('Goodbye', mtime=os.stat(self.path).st_mtime + 10)
+        self.assertTrue(b'Hello' in self.loader.match('sms').body)
+        self.clock.now += 2
+        self.assertTrue(b'Goodbye' in self.loader.match('sms').body)
+
+    def test_bad_reload_keeps_serving(self):
+        with open(self.path, 'w') as f:
+            json.dump({'rules': [{'to': '+1555'}]}, f)
+        os.utime(self.path, (self.clock.now + 10, self.clock.now + 10))
+        self.clock.now += 2
+        self.assertTrue(b'Hello' in self.loader.match('sms').body)
+
+    @unittest.skipIf(reloader.yaml is None, "PyYAML is not installed.")
+    def test_bad_yaml_reload_keeps_serving(self):
+        path = os.path.join(self.directory, 'rules.yaml')
+        with open(path, 'w') as f:
+            f.write("rules:\n  - sms: Hey ho\n")
+        loader = rules.RulesLoader(path, check_interval=2, clock=self.clock)
+        with open(path, 'w') as f:
+            f.write("rules: [unclosed\n")
+        os.utime(path, (self.clock.now + 10, self.clock.now + 10))
+        self.clock.now += 2
+        self.assertTrue(b'Hey ho' in loader.match('sms').body)
+
+    def test_disabled(self):
+        loader = rules.RulesLoader()
+        self.assertFalse(loader.enabled)
+        self.assertEqual(None, loader.match('sms'))
+
+
+class RulesWebTest(TwiMLTest):
+    settings = {'RULES_FILE': EXAMPLE}
+
+    def test_sms_keyword(self):
+        response = self.sms("STOP")
+        self.assertTwiML(response)
+        self.assertTrue(b"You won't hear from us again" in response.data)
+
+    def test_sms_fallback(self):
+        response = self.sms("Hi")
+        self.assertTwiML(response)
+        self.assertTrue(b'Congratulations' in response.data)
+
+    def test_voice_caller(self):
+        response = self.call(from_='+12125550000')
+        self.assertTwiML(response)
+        self.assertTrue(b'New York' in response.data)
+        response = self.call(from_='+13125550000')
+        self.assertTrue(b'Congratulations' in response.data)
@@ -0,0 +1,177 @@
+import unittest
+
+from flask import Flask
+from twilio.util import RequestValidator as TwilioRequestValidator
+
+from .context import Clock
+from .context import app as hackpack_app
+from hackpack import security
+
+AUTH_TOKEN = 'yyyyyyyyy'
+PARAMS = {'CallSid': 'CAtesting', 'From': '+15558675309',
+          'To': '+15556667777', 'Digits': '1'}
+
+
+def lists(params):
+    return [(name, [value]) for name, value in params.items()]
+
+
+class RequestValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.validator = security.RequestValidator(AUTH_TOKEN,
+                                                   clock=self.clock)
+        self.url = 'https://example.com/voice?Foo=bar'
+
+    def sign(self, url, params):
+        return TwilioRequestValidator(AUTH_TOKEN).compute_signature(
+            url, params)
+
+    def test_matches_twilio_library(self):
+        self.assertEqual(
+            self.sign(self.url, PARAMS).encode('utf-8'),
+            self.validator.compute_signature(self.url, lists(PARAMS)))
+
+    def test_validate(self):
+        signature = self.sign(self.url, PARAMS)
+        self.assertTrue(self.validator.validate(self.url, lists(PARAMS),
+                                                signature))
+
+    def test_invalid(self):
+        signature = self.sign(self.url, PARAMS)
+        tampered = dict(PARAMS, Digits='2')
+        self.assertFalse(self.validator.validate(self.url, lists(tampered),
+                                                 signature))
+        self.assertFalse(self.validator.validate(self.url, lists(PARAMS),
+                                                 None))
+
+    def test_replay(self):
+        signature = self.sign(self.url, PARAMS)
+        self.assertTrue(self.validator.validate(self.url, lists(PARAMS),
+                                                signature))
+        self.assertFalse(self.validator.validate(self.url, lists(PARAMS),
+                                                 signature))
+        self.clock.now += 5
+        self.assertTrue(self.validator.validate(self.url, lists(PARAMS),
+                                                signature))
+
+    def test_replay_disabled(self):
+        validator = security.RequestValidator(AUTH_TOKEN, replay_ttl=0)
+        signature = self.sign(self.url, PARAMS)
+        for _ in range(2):
+            self.assertTrue(validator.validate(self.url, lists(PARAMS),
+                                               signature))
+
+
+class SignatureValidationTest(unittest.TestCase):
+    def create_app(self, **config):
+        app = Flask(__name__)
+        app.config['TWILIO_AUTH_TOKEN'] = AUTH_TOKEN
+        app.config['TWILIO_VALIDATE_SIGNATURES'] = True
+        app.config.update(config)
+        signatures = security.SignatureValidation(app)
+        self.rendered = []
+
+        @app.route('/voice', methods=['GET', 'POST'])
+        @signatures.protect
+        def voice():
+            self.rendered.append('voice')
+            return '<Response />'
+
+        @app.route('/sms', methods=['POST'])
+        @signatures.protect
+        def sms():
+            return '<Response />'
+
+        @app.route('/status', methods=['POST'])
+        @signatures.protect
+        def status():
+            self.rendered.append('status')
+            if len(self.rendered) == 1:
+                return '', 503, {'Retry-After': '1'}
+            return ''
+
+        @app.route('/')
+        def index():
+            return 'Hello'
+
+        return app.test_client()
+
+    def sign(self, url, params=None):
+        return TwilioRequestValidator(AUTH_TOKEN).compute_signature(
+            url, params or {})
+
+    def test_signed(self):
+        client = self.create_app()
+        response = client.post('/voice', data=PARAMS, headers={
+            'X-Twilio-Signature': self.sign('http://localhost/voice',
+                                            PARAMS)})
+        self.assertEqual(200, response.status_code)
+
+    def test_unsigned_rejected_before_view(self):
+        client = self.create_app()
+        response = client.post('/voice', data=PARAMS)
+        self.assertEqual(403, response.status_code)
+        response = client.post('/voice', data=PARAMS, headers={
+            'X-Twilio-Signature': self.sign('http://localhost/sms',
+                                            PARAMS)})
+        self.assertEqual(403, response.status_code)
+        self.assertEqual([], self.rendered)
+
+    def test_replay(self):
+        client = self.create_app()
+        headers = {'X-Twilio-Signature': self.sign('http://localhost/voice',
+                                                   PARAMS)}
+        response = client.post('/voice', data=PARAMS, headers=headers)
+        self.assertEqual(200, response.status_code)
+        response = client.post('/voice', data=PARAMS, headers=headers)
+        self.assertEqual(403, response.status_code)
+
+    def test_retry_after_server_error(self):
+        client = self.create_app()
+        headers = {'X-Twilio-Signature': self.sign('http://localhost/status',
+                                                   PARAMS)}
+        response = client.post('/status', data=PARAMS, headers=headers)
+        self.assertEqual(503, response.status_code)
+        response = client.post('/status', data=PARAMS, headers=headers)
+        self.assertEqual(200, response.status_code)
+        response = client.post('/status', data=PARAMS, headers=headers)
+        self.assertEqual(403, response.status_code)
+
+    def test_get_with_query_string(self):
+        client = self.create_app()
+        url = 'http://localhost/voice?CallSid=CAtesting&Digits=1'
+        response = client.get('/voice?CallSid=CAtesting&Digits=1', headers={
+            'X-Twilio-Signature': self.sign(url)})
+        self.assertEqual(200, response.status_code)
+
+    def test_forwarded_proto(self):
+        client = self.create_app()
+        response = client.post('/voice', data=PARAMS, headers={
+            'X-Forwarded-Proto': 'https',
+            'X-Twilio-Signature': self.sign('https://localhost/voice',
+                                            PARAMS)})
+        self.assertEqual(200, response.status_code)
+
+    def test_unprotected_route(self):
+        client = self.create_app()
+        self.assertEqual(200, client.get('/').status_code)
+
+    def test_exempt(self):
+        client = self.create_app(TWILIO_SIGNATURE_EXEMPT=['sms'])
+        self.assertEqual(200, client.post('/sms', data=PARAMS).status_code)
+        self.assertEqual(403, client.post('/voice', data=PARAMS).status_code)
+
+    def test_disabled(self):
+        client = self.create_app(TWILIO_VALIDATE_SIGNATURES=False)
+        self.assertEqual(200, client.post('/voice', data=PARAMS).status_code)
+
+    def test_missing_auth_token(self):
+        self.assertRaises(ValueError, self.create_app, TWILIO_AUTH_TOKEN=None)
+
+
+class HackpackRoutesTest(unittest.TestCase):
+    def test_webhooks_protected(self):
+        signatures = hackpack_app.extensions['signatures']
+        self.assertEqual(set(['voice', 'voice_ivr', 'sms', 'client_incoming',
+                              'status']), signatures.endpoints)
@@ -0,0 +1,252 @@
+import os
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+try:
+    from urllib.parse import urlencode
+    from urllib.request import urlopen
+except ImportError:
+    from urllib import urlencode
+    from urllib2 import urlopen
+
+from hackpack import server
+
+
+def hello(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode('utf-8')]
+
+
+def hang(environ, start_response):
+    if environ['PATH_INFO'] == '/hang':
+        time.sleep(60)
+    return hello(environ, start_response)
+
+
+ARBITER = """
+import sys
+from hackpack import server
+from tests.test_server import hello
+settings = server.ServerSettings(host='127.0.0.1', port=0, workers=2,
+                                 threads=2, max_requests=3,
+                                 graceful_timeout=5)
+arbiter = server.Arbiter(hello, settings)
+sock = arbiter.bind()
+sys.stdout.write('%d\\n' % sock.getsockname()[1])
+sys.stdout.flush()
+arbiter.run()
+"""
+
+HANGING_ARBITER = """
+import sys
+from hackpack import server
+from tests.test_server import hang
+settings = server.ServerSettings(host='127.0.0.1', port=0, workers=1,
+                                 threads=2, graceful_timeout=0.5)
+arbiter = server.Arbiter(hang, settings)
+sock = arbiter.bind()
+sys.stdout.write('%d\\n' % sock.getsockname()[1])
+sys.stdout.flush()
+arbiter.run()
+"""
+
+CRASHING_ARBITER = """
+import sys
+from hackpack import server
+from tests.test_server import hello
+
+class CrashingArbiter(server.Arbiter):
+    def serve(self):
+        with open(sys.argv[1], 'a') as f:
+            f.write('started\\n')
+        raise RuntimeError('Failed to start.')
+
+settings = server.ServerSettings(host='127.0.0.1', port=0, workers=1)
+arbiter = CrashingArbiter(hello, settings)
+sock = arbiter.bind()
+sys.stdout.write('%d\\n' % sock.getsockname()[1])
+sys.stdout.flush()
+arbiter.run()
+"""
+
+STATUS_ARBITER = """
+import sys
+import time
+from hackpack import server
+from hackpack.app import create_app
+app = create_app({'STATUS_DATABASE': sys.argv[1]})
+pipeline = app.extensions['status']
+write = pipeline.write
+def slow_write(connection, events):
+    # Leave events queued when a worker is told to exit.
+    time.sleep(0.2)
+    write(connection, events)
+pipeline.write = slow_write
+settings = server.ServerSettings(host='127.0.0.1', port=0, workers=2,
+                                 threads=2, max_requests=3,
+                                 graceful_timeout=5)
+arbiter = server.Arbiter(app, settings)
+sock = arbiter.bind()
+sys.stdout.write('%d\\n' % sock.getsockname()[1])
+sys.stdout.flush()
+arbiter.run()
+"""
+
+
+class ServerSettingsTest(unittest.TestCase):
+    def test_from_environ(self):
+        settings = server.ServerSettings.from_environ({
+            'PORT': '8000', 'WEB_CONCURRENCY': '3', 'HACKPACK_THREADS': '8',
+            'HACKPACK_MAX_REQUESTS': '1000',
+            'HACKPACK_GRACEFUL_TIMEOUT': '10'})
+        self.assertEqual(8000, settings.port)
+        self.assertEqual(3, settings.workers)
+        self.assertEqual(8, settings.threads)
+        self.assertEqual(1000, settings.max_requests)
+        self.assertEqual(10.0, settings.graceful_timeout)
+
+    def test_defaults(self):
+        settings = server.ServerSettings.from_environ({})
+        self.assertEqual(5000, settings.port)
+        self.assertTrue(settings.workers >= 1)
+        self.assertEqual(0, settings.max_requests)
+
+
+class PooledWSGIServerTest(unittest.TestCase):
+    def test_recycles_after_max_requests(self):
+        wsgi_server = server.PooledWSGIServer('127.0.0.1', 0, hello,
+                                              threads=2, max_requests=3)
+        thread = threading.Thread(target=wsgi_server.serve_forever)
+        thread.start()
+        url = 'http://127.0.0.1:{0}/'.format(wsgi_server.port)
+        for _ in range(3):
+            self.assertEqual(str(os.getpid()).encode('utf-8'),
+                             urlopen(url).read())
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(3, wsgi_server.requests_handled)
+
+
+class ServerProcessTest(unittest.TestCase):
+    """Runs a script starting an Arbiter in a child process."""
+
+    def start(self, script, *args):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', script] + list(args), cwd=root,
+            stdout=subprocess.PIPE)
+        port = int(self.process.stdout.readline())
+        self.url = 'http://127.0.0.1:{0}/'.format(port)
+
+    def tearDown(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+    def get(self, path='', data=None):
+        for _ in range(50):
+            try:
+                return urlopen(self.url + path, data, timeout=5).read()
+            except IOError:
+                time.sleep(0.1)
+        self.fail("Server did not respond.")
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "Requires fork().")
+class ArbiterTest(ServerProcessTest):
+    def setUp(self):
+        self.start(ARBITER)
+
+    def test_workers_recycle_and_reload(self):
+        pids = set(self.get() for _ in range(12))
+        self.assertTrue(len(pids) > 2, "Workers were not recycled: "
+                        "{0}".format(pids))
+
+        self.process.send_signal(signal.SIGHUP)
+        time.sleep(0.5)
+        self.get()
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(0, self.process.wait())
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "Requires fork().")
+class HangingWorkerTest(ServerProcessTest):
+    def setUp(self):
+        self.start(HANGING_ARBITER)
+
+    def test_reload_kills_old_workers(self):
+        old = self.get()
+        errors = []
+
+        def hang():
+            try:
+                urlopen(self.url + 'hang', timeout=30).read()
+            except IOError as e:
+                errors.append(e)
+        thread = threading.Thread(target=hang)
+        thread.start()
+        time.sleep(0.5)
+        start = time.time()
+        self.process.send_signal(signal.SIGHUP)
+        thread.join(30)
+        self.assertTrue(errors)
+        self.assertTrue(time.time() - start < 5)
+        self.assertNotEqual(old, self.get())
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "Requires fork().")
+class CrashingWorkerTest(ServerProcessTest):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'starts')
+        self.start(CRASHING_ARBITER, self.path)
+
+    def tearDown(self):
+        super(CrashingWorkerTest, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_backoff(self):
+        # Without a delay a worker is started every 0.2s.
+        time.sleep(2)
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(0, self.process.wait())
+        with open(self.path) as f:
+            starts = len(f.readlines())
+        self.assertTrue(1 < starts <= 5, starts)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "Requires fork().")
+class StatusShutdownTest(ServerProcessTest):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'status.db')
+        self.start(STATUS_ARBITER, self.path)
+
+    def tearDown(self):
+        super(StatusShutdownTest, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_acknowledged_events_are_written(self):
+        # Workers are recycled every three requests and then stopped, each
+        # leaving with os._exit.
+        for i in range(10):
+            data = urlencode({'MessageSid': 'SM{0}'.format(i),
+                              'MessageStatus': 'delivered'})
+            self.get('status', data.encode('utf-8'))
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(0, self.process.wait())
+        connection = sqlite3.connect(self.path)
+        try:
+            self.assertEqual(10, connection.execute(
+                'SELECT COUNT(*) FROM status_events').fetchone()[0])
+        finally:
+            connection.close()
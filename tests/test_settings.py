@@ -0,0 +1,52 @@
+import unittest
+
+from .context import create_app
+from .test_web import SETTINGS
+from hackpack.settings import Settings
+
+
+class SettingsTest(unittest.TestCase):
+    def test_from_config(self):
+        settings = Settings.from_config(dict(SETTINGS, CLIENT_TOKEN_TTL=60))
+        self.assertEqual('ACxxxxxx', settings.account_sid)
+        self.assertEqual('+15558675309', settings.caller_id)
+        self.assertEqual(60, settings.client_token_ttl)
+        self.assertEqual(None, settings.configuration_error)
+
+    def test_read_only(self):
+        settings = Settings.from_config(SETTINGS)
+        self.assertRaises(AttributeError, setattr, settings, 'caller_id',
+                          '+16667778888')
+        self.assertRaises(AttributeError, setattr, settings, 'extra', 1)
+        self.assertRaises(AttributeError, delattr, settings, 'caller_id')
+        self.assertFalse(hasattr(settings, '__dict__'))
+
+    def test_configuration_error(self):
+        settings = Settings.from_config(dict(SETTINGS, TWILIO_APP_SID=''))
+        self.assertEqual("Missing from local_settings.py: TWILIO_APP_SID",
+                         settings.configuration_error)
+        self.assertEqual(None, settings.app_sid)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, Settings, client_token_ttl=0)
+        self.assertRaises(ValueError, Settings, client_token_refresh=1.5)
+
+
+class CreateAppTest(unittest.TestCase):
+    def test_isolated_apps(self):
+        first = create_app(SETTINGS)
+        second = create_app(dict(SETTINGS, TWILIO_CALLER_ID='+16667778888'))
+        self.assertEqual('+15558675309',
+                         first.extensions['settings'].caller_id)
+        self.assertEqual('+16667778888',
+                         second.extensions['settings'].caller_id)
+        data = second.test_client().post(
+            '/client/incoming', data={'PhoneNumber': '+15550001111'}).data
+        self.assertTrue(b'callerId="+16667778888"' in data, data)
+
+    def test_config_read_once(self):
+        app = create_app(SETTINGS)
+        app.config['TWILIO_CALLER_ID'] = '+16667778888'
+        data = app.test_client().post(
+            '/client/incoming', data={'PhoneNumber': '+15550001111'}).data
+        self.assertTrue(b'callerId="+15558675309"' in data, data)
@@ -0,0 +1,55 @@
+import os
+import unittest
+
+from benchmarks import bench_startup
+from hackpack.lazy import lazy_import
+
+# Wall-clock budgets flake on a loaded machine, so they're only checked
+# when HACKPACK_IMPORT_BUDGETS is set.  They're generous enough for a slow
+# box; today these take about a quarter of that.  Override with
+# HACKPACK_IMPORT_BUDGET_SCALE=2 to double them.
+BUDGETS_MS = {'hackpack.app': 1000, 'configure': 250, 'campaign': 300}
+CHECK_BUDGETS = bool(os.environ.get('HACKPACK_IMPORT_BUDGETS'))
+SCALE = float(os.environ.get('HACKPACK_IMPORT_BUDGET_SCALE', 1))
+
+
+class ImportTest(unittest.TestCase):
+    def assertTwilioNotImported(self, module):
+        _, modules = bench_startup.import_time(module, runs=1)
+        self.assertFalse('twilio' in modules,
+                         "Importing {0} imported twilio.".format(module))
+
+    def test_app(self):
+        self.assertTwilioNotImported('hackpack.app')
+
+    def test_configure(self):
+        self.assertTwilioNotImported('configure')
+
+    def test_campaign(self):
+        self.assertTwilioNotImported('campaign')
+
+
+@unittest.skipUnless(CHECK_BUDGETS, "HACKPACK_IMPORT_BUDGETS is not set.")
+class ImportTimeTest(unittest.TestCase):
+    def assertFastImport(self, module):
+        seconds, _ = bench_startup.import_time(module)
+        budget = BUDGETS_MS[module] * SCALE
+        self.assertTrue(seconds * 1000 <= budget,
+                        "Importing {0} took {1:.0f}ms, over its {2:.0f}ms "
+                        "budget.".format(module, seconds * 1000, budget))
+
+    def test_app(self):
+        self.assertFastImport('hackpack.app')
+
+    def test_configure(self):
+        self.assertFastImport('configure')
+
+    def test_campaign(self):
+        self.assertFastImport('campaign')
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_lazy_module(self):
+        json = lazy_import('json')
+        self.assertEqual('[1]', json.dumps([1]))
+        self.assertTrue('dumps' in vars(json))
@@ -0,0 +1,153 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from mock import patch
+
+from .context import create_app
+from hackpack.status import StatusPipeline
+
+MESSAGE = {'MessageSid': 'SMtesting', 'MessageStatus': 'delivered',
+           'To': '+15558675309'}
+CALL = {'CallSid': 'CAtesting', 'CallStatus': 'completed'}
+
+
+class StatusTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'status.db')
+        self.pipeline = StatusPipeline(self.path, maxsize=100, batch_size=10)
+
+    def tearDown(self):
+        self.pipeline.stop()
+        shutil.rmtree(self.directory)
+
+    def rows(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(
+                'SELECT sid, status, error_code FROM status_events '
+                'ORDER BY id').fetchall()
+        finally:
+            connection.close()
+
+
+class StatusPipelineTest(StatusTest):
+    def test_writes_events(self):
+        self.assertTrue(self.pipeline.put(MESSAGE))
+        self.assertTrue(self.pipeline.put(dict(CALL, ErrorCode='30003')))
+        self.pipeline.flush()
+        self.assertEqual([('SMtesting', 'delivered', None),
+                          ('CAtesting', 'completed', '30003')], self.rows())
+
+    def test_batches(self):
+        for i in range(25):
+            self.pipeline.put(dict(MESSAGE, MessageSid='SM{0}'.format(i)))
+        self.pipeline.flush()
+        self.assertEqual(25, len(self.rows()))
+        self.assertEqual(25, self.pipeline.stats['written'])
+
+    def test_wal(self):
+        self.pipeline.put(MESSAGE)
+        self.pipeline.flush()
+        connection = sqlite3.connect(self.path)
+        try:
+            self.assertEqual('wal', connection.execute(
+                'PRAGMA journal_mode').fetchone()[0])
+        finally:
+            connection.close()
+
+    def blocked(self, pipeline):
+        """Make pipeline's writer thread wait for the returned event."""
+        release = threading.Event()
+        write = pipeline.write
+
+        def blocked_write(connection, events):
+            release.wait()
+            write(connection, events)
+        pipeline.write = blocked_write
+        self.addCleanup(release.set)
+        return release
+
+    def test_full_queue(self):
+        pipeline = StatusPipeline(self.path, maxsize=2)
+        release = self.blocked(pipeline)
+        self.assertTrue(pipeline.put(MESSAGE))
+        while pipeline.queue.qsize():
+            time.sleep(0.01)
+        self.assertTrue(pipeline.put(MESSAGE))
+        self.assertTrue(pipeline.put(MESSAGE))
+        self.assertFalse(pipeline.put(MESSAGE))
+        self.assertEqual(1, pipeline.stats['dropped'])
+        release.set()
+        pipeline.stop()
+        self.assertEqual(3, len(self.rows()))
+
+    def test_stop_timeout(self):
+        pipeline = StatusPipeline(self.path, maxsize=1, stop_timeout=0.2)
+        self.blocked(pipeline)
+        pipeline.put(MESSAGE)
+        while pipeline.queue.qsize():
+            time.sleep(0.01)
+        pipeline.put(MESSAGE)
+        start = time.time()
+        pipeline.stop()
+        self.assertTrue(time.time() - start < 1)
+
+    def test_unwritable_database(self):
+        pipeline = StatusPipeline(os.path.join(self.directory, 'missing',
+                                               'status.db'))
+        pipeline.start()
+        pipeline.thread.join(5)
+        self.assertFalse(pipeline.put(MESSAGE))
+        self.assertEqual(1, pipeline.stats['dropped'])
+        pipeline.flush()
+        pipeline.stop()
+
+    def test_restart(self):
+        with patch('atexit.register') as register:
+            self.pipeline.put(MESSAGE)
+            self.pipeline.stop()
+            self.pipeline.put(CALL)
+            self.pipeline.flush()
+        self.assertEqual(1, register.call_count)
+        self.assertEqual(2, len(self.rows()))
+
+
+class StatusWebTest(StatusTest):
+    def setUp(self):
+        super(StatusWebTest, self).setUp()
+        app = create_app({'STATUS_DATABASE': self.path,
+                          'STATUS_BATCH_SIZE': 10})
+        self.pipeline = app.extensions['status']
+        self.client = app.test_client()
+
+    def test_shutdown_writes_acknowledged(self):
+        for i in range(25):
+            response = self.client.post('/status', data=dict(
+                MESSAGE, MessageSid='SM{0}'.format(i)))
+            self.assertEqual(204, response.status_code)
+        self.client.application.shutdown()
+        self.assertEqual(25, len(self.rows()))
+
+    def test_acknowledged(self):
+        response = self.client.post('/status', data=MESSAGE)
+        self.assertEqual(204, response.status_code)
+        self.assertEqual(b'', response.data)
+        self.pipeline.flush()
+        self.assertEqual([('SMtesting', 'delivered', None)], self.rows())
+
+    def test_backpressure(self):
+        with patch.object(self.pipeline, 'put', return_value=False):
+            response = self.client.post('/status', data=MESSAGE)
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('1', response.headers['Retry-After'])
+
+    def test_disabled(self):
+        client = create_app({'STATUS_DATABASE': None}).test_client()
+        self.assertEqual(404, client.post('/status',
+                                          data=MESSAGE).status_code)
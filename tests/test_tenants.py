@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from twilio.util import RequestValidator as TwilioRequestValidator
+
+from .context import Clock
+from .context import create_app
+from hackpack.tenants import TenantRegistry
+
+ACME = 'AC' + 'a' * 32
+BAND = 'AC' + 'b' * 32
+PARAMS = {'CallSid': 'CAtesting', 'From': '+15558675309'}
+
+
+class TenantTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write(ACME, {'TWILIO_AUTH_TOKEN': 'acme-token',
+                          'TWILIO_APP_SID': 'APacme',
+                          'TWILIO_CALLER_ID': '+15550000001',
+                          'VOICE_GREETING': 'Thanks for calling Acme.'})
+        self.write(BAND, {'TWILIO_AUTH_TOKEN': 'band-token',
+                          'TWILIO_CALLER_ID': '+15550000002'})
+        self.write('hosts', {'acme.example.com': ACME,
+                             'band.example.com': BAND})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data, mtime=None):
+        path = os.path.join(self.directory, name + '.json')
+        with open(path, 'w') as f:
+            if isinstance(data, dict):
+                json.dump(data, f)
+            else:
+                f.write(data)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+
+class TenantRegistryTest(TenantTest):
+    def setUp(self):
+        super(TenantRegistryTest, self).setUp()
+        self.clock = Clock()
+        self.registry = TenantRegistry(self.directory, maxsize=1,
+                                       miss_ttl=60, clock=self.clock)
+
+    def test_lazy_lru(self):
+        self.assertEqual(0, len(self.registry))
+        tenant = self.registry.get(ACME)
+        self.assertEqual('+15550000001', tenant.settings.caller_id)
+        self.assertTrue(self.registry.get(ACME) is tenant)
+        self.registry.get(BAND)
+        self.assertEqual(1, len(self.registry))
+        self.assertFalse(self.registry.get(ACME) is tenant)
+
+    def test_configuration_error(self):
+        settings = self.registry.get(BAND).settings
+        self.assertEqual("Missing from {0}.json: TWILIO_APP_SID".format(BAND),
+                         settings.configuration_error)
+
+    def test_unknown(self):
+        sid = 'AC' + 'c' * 32
+        self.assertEqual(None, self.registry.get(sid))
+        self.assertEqual(1, len(self.registry.misses))
+        self.write(sid, {'TWILIO_AUTH_TOKEN': 'new-token'})
+        os.utime(self.directory, (2000, 2000))
+        self.assertEqual(None, self.registry.get(sid))
+        self.clock.now += 5
+        self.assertEqual('new-token', self.registry.get(sid)
+                         .settings.auth_token)
+
+    def test_directory_checked_every_interval(self):
+        sid = 'AC' + 'c' * 32
+        self.registry.get(sid)
+        self.clock.now += 5
+        self.registry.get(sid)
+        self.write(sid, {'TWILIO_AUTH_TOKEN': 'new-token'})
+        os.utime(self.directory, (2000, 2000))
+        self.clock.now += 1
+        self.assertEqual(None, self.registry.get(sid))
+        self.clock.now += 4
+        self.assertEqual('new-token', self.registry.get(sid)
+                         .settings.auth_token)
+
+    def test_bad_edit_keeps_serving(self):
+        self.write(ACME, {'TWILIO_AUTH_TOKEN': 'acme-token'}, mtime=100)
+        self.registry.get(ACME)
+        self.write(ACME, '{"TWILIO_AUTH_TOKEN": ', mtime=200)
+        self.clock.now += 5
+        self.assertEqual('acme-token', self.registry.get(ACME)
+                         .settings.auth_token)
+        self.write(ACME, {'TWILIO_AUTH_TOKEN': 'fixed'}, mtime=300)
+        self.clock.now += 5
+        self.assertEqual('fixed', self.registry.get(ACME)
+                         .settings.auth_token)
+
+    def test_bad_new_file_is_not_a_miss(self):
+        sid = 'AC' + 'c' * 32
+        self.write(sid, '{"TWILIO_AUTH_TOKEN": ')
+        self.assertEqual(None, self.registry.get(sid))
+        self.assertEqual(0, len(self.registry.misses))
+        self.write(sid, {'TWILIO_AUTH_TOKEN': 'new-token'})
+        self.assertEqual('new-token', self.registry.get(sid)
+                         .settings.auth_token)
+
+    def test_invalid_sid(self):
+        self.assertEqual(None, self.registry.get('../' + ACME))
+        self.assertEqual(None, self.registry.get('hosts'))
+        self.assertEqual(None, self.registry.get('AC' + 'z' * 32))
+        self.assertEqual(None, self.registry.get('ACaaaa'))
+        self.assertEqual(None, self.registry.get(ACME + '\n'))
+        self.assertEqual(0, len(self.registry.misses))
+
+    def test_misses_keep_tenants(self):
+        tenant = self.registry.get(ACME)
+        for i in range(500):
+            self.assertEqual(None, self.registry.get('AC{0:032x}'.format(i)))
+        self.assertTrue(self.registry.get(ACME) is tenant)
+        self.assertEqual(256, len(self.registry.misses))
+
+    def test_rotated_token(self):
+        self.write(ACME, {'TWILIO_AUTH_TOKEN': 'acme-token'}, mtime=100)
+        tenant = self.registry.get(ACME)
+        self.write(ACME, {'TWILIO_AUTH_TOKEN': 'rotated'}, mtime=200)
+        self.assertTrue(self.registry.get(ACME) is tenant)
+        self.clock.now += 5
+        self.assertEqual('rotated', self.registry.get(ACME)
+                         .settings.auth_token)
+
+    def test_removed(self):
+        self.registry.get(ACME)
+        os.remove(os.path.join(self.directory, ACME + '.json'))
+        self.clock.now += 5
+        self.assertEqual(None, self.registry.get(ACME))
+        self.assertEqual(0, len(self.registry))
+
+    def test_hosts(self):
+        self.assertEqual(ACME, self.registry.for_host('ACME.example.com')
+                         .settings.account_sid)
+        self.assertEqual(BAND, self.registry.for_host('band.example.com:80')
+                         .settings.account_sid)
+        self.assertEqual(None, self.registry.for_host('example.com'))
+
+    def test_hosts_reload(self):
+        self.write('hosts', {'acme.example.com': BAND}, mtime=100)
+        self.clock.now += 5
+        self.assertEqual(BAND, self.registry.for_host('acme.example.com')
+                         .settings.account_sid)
+        self.write('hosts', '{"acme.example.com": ', mtime=200)
+        self.clock.now += 5
+        self.assertEqual(BAND, self.registry.for_host('acme.example.com')
+                         .settings.account_sid)
+
+    def test_malformed_hosts(self):
+        self.write('hosts', '["acme.example.com"]')
+        registry = TenantRegistry(self.directory, clock=self.clock)
+        self.assertEqual(None, registry.for_host('acme.example.com'))
+
+
+class MultiTenantWebTest(TenantTest):
+    def setUp(self):
+        super(MultiTenantWebTest, self).setUp()
+        self.client = create_app({'TENANTS_DIRECTORY': self.directory,
+                                  'TWILIO_ACCOUNT_SID': None,
+                                  'TWILIO_AUTH_TOKEN': None}).test_client()
+
+    def test_greetings(self):
+        response = self.client.post('/voice', data=dict(PARAMS,
+                                                        AccountSid=ACME))
+        self.assertTrue(b'Thanks for calling Acme.' in response.data)
+        response = self.client.post('/voice', data=dict(PARAMS,
+                                                        AccountSid=BAND))
+        self.assertTrue(b'Congratulations' in response.data)
+
+    def test_caller_id(self):
+        for sid, caller_id in ((ACME, b'+15550000001'),
+                               (BAND, b'+15550000002')):
+            response = self.client.post('/client/incoming', data={
+                'AccountSid': sid, 'PhoneNumber': '+16667778888'})
+            self.assertTrue(b'callerId="' + caller_id + b'"' in response.data,
+                            response.data)
+
+    def test_account_looked_up_once(self):
+        app = create_app({'TENANTS_DIRECTORY': self.directory,
+                          'TWILIO_AUTH_TOKEN': None,
+                          'TWILIO_VALIDATE_SIGNATURES': True,
+                          'TWILIO_REPLAY_TTL': 0})
+        registry = app.extensions['tenants']
+        get = registry.get
+        calls = []
+
+        def get_once(account_sid):
+            # The account's file is removed after the first lookup.
+            calls.append(account_sid)
+            return get(account_sid) if len(calls) == 1 else None
+        registry.get = get_once
+        params = dict(PARAMS, AccountSid=ACME)
+        signature = TwilioRequestValidator('acme-token').compute_signature(
+            'http://localhost/voice', params)
+        response = app.test_client().post('/voice', data=params, headers={
+            'X-Twilio-Signature': signature})
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(b'Thanks for calling Acme.' in response.data)
+        self.assertEqual([ACME], calls)
+
+    def test_unknown_account(self):
+        response = self.client.post('/voice', data=dict(
+            PARAMS, AccountSid='AC' + 'c' * 32))
+        self.assertEqual(404, response.status_code)
+        self.assertEqual(404, self.client.post('/sms').status_code)
+
+    def test_client_by_host(self):
+        response = self.client.get('/client', headers={
+            'Host': 'acme.example.com'})
+        self.assertTrue(b'Twilio.Device.setup("ey' in response.data)
+        response = self.client.get('/client', headers={
+            'Host': 'band.example.com'})
+        self.assertTrue(b'Missing from' in response.data)
+        response = self.client.get('/client?AccountSid=' + ACME)
+        self.assertEqual(404, response.status_code)
+
+    def test_signatures(self):
+        client = create_app({'TENANTS_DIRECTORY': self.directory,
+                             'TWILIO_AUTH_TOKEN': None,
+                             'TWILIO_VALIDATE_SIGNATURES': True,
+                             'TWILIO_REPLAY_TTL': 0}).test_client()
+        params = dict(PARAMS, AccountSid=ACME)
+
+        def signature(token):
+            return TwilioRequestValidator(token).compute_signature(
+                'http://localhost/voice', params)
+
+        response = client.post('/voice', data=params, headers={
+            'X-Twilio-Signature': signature('acme-token')})
+        self.assertEqual(200, response.status_code)
+        response = client.post('/voice', data=params, headers={
+            'X-Twilio-Signature': signature('band-token')})
+        self.assertEqual(403, response.status_code)
@@ -0,0 +1,175 @@
+import json
+import unittest
+
+from twilio import jwt
+from twilio.util import TwilioCapability
+
+from .context import Clock
+from .context import create_app
+from hackpack.tokens import CapabilitySigner
+from hackpack.tokens import CapabilityTokenCache
+from hackpack.tokens import parse_token_request
+
+
+class CapabilityTokenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = CapabilityTokenCache(ttl=100, refresh=0.5, maxsize=2,
+                                          clock=self.clock)
+
+    def get(self, client_name='joey_ramone'):
+        return self.cache.get('ACxxxxxx', 'yyyyyyyyy', app_sid='APzzzzzzzz',
+                              client_name=client_name)
+
+    def test_token_is_valid(self):
+        payload = jwt.decode(self.get(), 'yyyyyyyyy')
+        self.assertEqual('ACxxxxxx', payload['iss'])
+        self.assertTrue('clientName=joey_ramone' in payload['scope'])
+        self.assertTrue('appSid=APzzzzzzzz' in payload['scope'])
+
+    def test_reuse_within_refresh_window(self):
+        token = self.get()
+        self.clock.now += 49
+        self.assertEqual(token, self.get())
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1},
+                         self.cache.stats())
+
+    def test_regenerate_after_refresh_window(self):
+        self.get()
+        self.clock.now += 50
+        self.get()
+        self.assertEqual(2, self.cache.misses)
+
+    def test_identities_are_separate(self):
+        self.assertNotEqual(self.get('joey_ramone'), self.get('dee_dee'))
+
+    def test_lru_eviction(self):
+        self.get('joey')
+        self.get('johnny')
+        self.get('joey')
+        self.get('dee_dee')
+        self.get('joey')
+        self.get('johnny')
+        self.assertEqual(2, self.cache.hits)
+        self.assertEqual(4, self.cache.misses)
+
+    def test_bad_refresh(self):
+        self.assertRaises(ValueError, CapabilityTokenCache, refresh=0)
+
+
+class CapabilitySignerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.signer = CapabilitySigner('ACxxxxxx', 'yyyyyyyyy', self.clock)
+
+    def test_matches_twilio(self):
+        capability = TwilioCapability('ACxxxxxx', 'yyyyyyyyy')
+        capability.allow_client_incoming('joey_ramone')
+        capability.allow_client_outgoing('APzzzzzzzz')
+        capability.allow_event_stream()
+        payload = jwt.decode(capability.generate(), 'yyyyyyyyy')
+        token, expires = self.signer.sign(self.signer.scope(
+            'joey_ramone', 'APzzzzzzzz', ('incoming', 'outgoing', 'events')))
+        self.assertEqual(4600, expires)
+        self.assertEqual(dict(payload, exp=4600),
+                         jwt.decode(token, 'yyyyyyyyy', verify=False))
+
+    def test_scopes(self):
+        scope = self.signer.scope('joey_ramone', 'APzzzzzzzz', ('incoming',))
+        self.assertEqual('scope:client:incoming?clientName=joey_ramone',
+                         scope)
+        self.assertEqual('', self.signer.scope(None, None))
+
+
+class ParseTokenRequestTest(unittest.TestCase):
+    def test_defaults(self):
+        self.assertEqual((['joey'], ('incoming', 'outgoing'), 3600),
+                         parse_token_request({'identity': 'joey'}))
+
+    def test_batch(self):
+        data = {'identities': ['joey', 'dee_dee'], 'scopes': ['incoming'],
+                'ttl': '60'}
+        self.assertEqual((['joey', 'dee_dee'], ('incoming',), 60),
+                         parse_token_request(data))
+
+    def test_invalid(self):
+        for data in (None, [], {}, {'identities': 'joey'},
+                     {'identity': 'joey ramone'}, {'identity': 'joey\n'},
+                     {'identities': [7]},
+                     {'identity': 'joey', 'scopes': ['admin']},
+                     {'identity': 'joey', 'ttl': 'soon'},
+                     {'identity': 'joey', 'ttl': 86401},
+                     {'identities': ['a', 'b', 'c']}):
+            self.assertRaises(ValueError, parse_token_request, data,
+                              batch_size=2)
+
+
+class TokenEndpointTest(unittest.TestCase):
+    settings = {'TWILIO_ACCOUNT_SID': 'ACxxxxxx',
+                'TWILIO_AUTH_TOKEN': 'yyyyyyyyy',
+                'TWILIO_APP_SID': 'APzzzzzzzz',
+                'TWILIO_CALLER_ID': '+15558675309',
+                'CLIENT_TOKEN_API_KEY': 'secret',
+                'CLIENT_TOKEN_BATCH_SIZE': 2}
+
+    def setUp(self):
+        self.client = create_app(self.settings).test_client()
+
+    def post(self, data, key='secret'):
+        return self.client.post('/client/token', data=json.dumps(data),
+                                content_type='application/json',
+                                headers={'Authorization': 'Bearer ' + key})
+
+    def test_batch(self):
+        response = self.post({'identities': ['joey', 'dee_dee'],
+                              'scopes': ['incoming'], 'ttl': 60})
+        self.assertEqual(200, response.status_code)
+        tokens = json.loads(response.data.decode('utf-8'))['tokens']
+        self.assertEqual(['joey', 'dee_dee'],
+                         [token['identity'] for token in tokens])
+        payload = jwt.decode(tokens[1]['token'], 'yyyyyyyyy')
+        self.assertEqual('scope:client:incoming?clientName=dee_dee',
+                         payload['scope'])
+        self.assertEqual(tokens[1]['expires'], payload['exp'])
+
+    def test_query_string(self):
+        response = self.client.get(
+            '/client/token?identity=joey&scope=outgoing',
+            headers={'Authorization': 'Bearer secret'})
+        token = json.loads(response.data.decode('utf-8'))['tokens'][0]
+        self.assertTrue('appSid=APzzzzzzzz' in
+                        jwt.decode(token['token'], 'yyyyyyyyy')['scope'])
+
+    def test_wrong_key(self):
+        self.assertEqual(401, self.post({'identity': 'joey'}, 'guess')
+                         .status_code)
+        self.assertEqual(401, self.client.post('/client/token').status_code)
+
+    def test_invalid_request(self):
+        response = self.post({'identities': ['a', 'b', 'c']})
+        self.assertEqual(400, response.status_code)
+        self.assertTrue(b'At most 2' in response.data)
+
+    def test_outgoing_needs_app(self):
+        client = create_app(dict(self.settings, TWILIO_APP_SID=None)) \
+            .test_client()
+        response = client.post('/client/token?identity=joey',
+                               headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(503, response.status_code)
+        self.assertTrue(b'TWILIO_APP_SID' in response.data)
+
+    def test_disabled(self):
+        client = create_app(dict(self.settings, CLIENT_TOKEN_API_KEY=None)) \
+            .test_client()
+        response = client.post('/client/token?identity=joey',
+                               headers={'Authorization': 'Bearer None'})
+        self.assertEqual(404, response.status_code)
+
+    def test_client_identity(self):
+        client = create_app(dict(self.settings, CLIENT_IDENTITY='agent_7')) \
+            .test_client()
+        response = client.get('/client')
+        token = response.data.split(b'Twilio.Device.setup("')[1] \
+            .split(b'"')[0].decode('ascii')
+        self.assertTrue('clientName=agent_7' in
+                        jwt.decode(token, 'yyyyyyyyy')['scope'])
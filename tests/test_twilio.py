@@ -1,27 +1,31 @@
 import unittest
-from .context import app
+from .context import create_app
 
 
-app.config['TWILIO_ACCOUNT_SID'] = 'ACxxxxxx'
-app.config['TWILIO_AUTH_TOKEN'] = 'yyyyyyyyy'
-app.config['TWILIO_CALLER_ID'] = '+15558675309'
+SETTINGS = {'TWILIO_ACCOUNT_SID': 'ACxxxxxx',
+            'TWILIO_AUTH_TOKEN': 'yyyyyyyyy',
+            'TWILIO_CALLER_ID': '+15558675309'}
 
 
 class TwiMLTest(unittest.TestCase):
+    # Config values added to SETTINGS for the app under test.
+    settings = {}
+
     def setUp(self):
-        self.app = app.test_client()
+        self.flask_app = create_app(dict(SETTINGS, **self.settings))
+        self.app = self.flask_app.test_client()
 
     def assertTwiML(self, response):
-        app.logger.info(response.data)
+        self.flask_app.logger.info(response.data)
         self.assertTrue(b"</Response>" in response.data, "Did not find "
                         "</Response>: {0}".format(response.data))
         self.assertEqual("200 OK", response.status)
 
-    def sms(self, body, url='/sms', to=app.config['TWILIO_CALLER_ID'],
+    def sms(self, body, url='/sms', to=SETTINGS['TWILIO_CALLER_ID'],
             from_='+15558675309', extra_params=None):
         params = {
             'SmsSid': 'SMtesting',
-            'AccountSid': app.config['TWILIO_ACCOUNT_SID'],
+            'AccountSid': SETTINGS['TWILIO_ACCOUNT_SID'],
             'To': to,
             'From': from_,
             'Body': body,
@@ -33,11 +37,11 @@ class TwiMLTest(unittest.TestCase):
             params = dict(params.items() + extra_params.items())
         return self.app.post(url, data=params)
 
-    def call(self, url='/voice', to=app.config['TWILIO_CALLER_ID'],
+    def call(self, url='/voice', to=SETTINGS['TWILIO_CALLER_ID'],
              from_='+15558675309', digits=None, extra_params=None):
         params = {
             'CallSid': 'CAtesting',
-            'AccountSid': app.config['TWILIO_ACCOUNT_SID'],
+            'AccountSid': SETTINGS['TWILIO_ACCOUNT_SID'],
             'To': to,
             'From': from_,
             'CallStatus': 'ringing',
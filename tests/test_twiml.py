@@ -0,0 +1,68 @@
+import unittest
+
+from twilio import twiml as library
+
+from hackpack import twiml
+
+
+def build(module):
+    response = module.Response()
+    response.say("Rock & <roll>", voice='alice', loop=2)
+    response.play('http://example.com/song.mp3')
+    with response.gather(action='/voice/ivr/main', method='POST',
+                         numDigits=1, timeout=5) as gather:
+        gather.say("Press 1.")
+    with response.dial(callerId='+15558675309', record=True) as dial:
+        dial.number('+16667778888')
+    response.sms('Hey "ho"', sender='+15558675309', to=None)
+    response.redirect('/voice/ivr/main?a=1&b=2', method='POST')
+    response.hangup()
+    return str(response)
+
+
+class ResponseTest(unittest.TestCase):
+    def test_matches_library(self):
+        self.assertEqual(build(library), build(twiml))
+
+    def test_empty(self):
+        self.assertEqual('<?xml version="1.0" encoding="UTF-8"?>'
+                         '<Response></Response>', str(twiml.Response()))
+
+    def test_attribute_escaping(self):
+        response = twiml.Response()
+        response.redirect('/next', action='a"b\nc&d')
+        self.assertTrue('<Redirect action="a&quot;b&#10;c&amp;d">/next'
+                        '</Redirect>' in str(response), str(response))
+
+    def test_unclosed_verbs(self):
+        response = twiml.Response()
+        dial = response.dial(callerId='+15558675309')
+        dial.number('+16667778888')
+        self.assertTrue(str(response).endswith(
+            '<Number>+16667778888</Number></Dial></Response>'))
+
+    def test_dial_number(self):
+        response = twiml.Response()
+        self.assertEqual(None, response.dial('+16667778888'))
+        self.assertTrue('<Dial>+16667778888</Dial>' in str(response))
+
+    def test_encode(self):
+        response = twiml.Response()
+        response.say(u'Caf\xe9')
+        self.assertTrue(b'<Say>Caf\xc3\xa9</Say>' in response.encode())
+
+    def test_str_non_ascii(self):
+        response = twiml.Response()
+        response.say(u'Caf\xe9')
+        if str is bytes:
+            self.assertEqual(response.encode(), str(response))
+        else:
+            self.assertTrue(u'<Say>Caf\xe9</Say>' in str(response))
+
+    def test_adding_after_render(self):
+        response = twiml.Response()
+        response.say('One')
+        str(response)
+        response.say('Two')
+        self.assertTrue(str(response).endswith(
+            '<Say>One</Say><Say>Two</Say></Response>'))
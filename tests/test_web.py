@@ -1,15 +1,15 @@
 import unittest
-from .context import app
+from .context import create_app
 
-app.config['TWILIO_ACCOUNT_SID'] = 'ACxxxxxx'
-app.config['TWILIO_AUTH_TOKEN'] = 'yyyyyyyyy'
-app.config['TWILIO_CALLER_ID'] = '+15558675309'
-app.config['TWILIO_APP_SID'] = 'APzzzzzzzzzzzz'
+SETTINGS = {'TWILIO_ACCOUNT_SID': 'ACxxxxxx',
+            'TWILIO_AUTH_TOKEN': 'yyyyyyyyy',
+            'TWILIO_CALLER_ID': '+15558675309',
+            'TWILIO_APP_SID': 'APzzzzzzzzzzzz'}
 
 
 class WebTest(unittest.TestCase):
     def setUp(self):
-        self.app = app.test_client()
+        self.app = create_app(SETTINGS).test_client()
 
 
 class ExampleTests(WebTest):
@@ -22,8 +22,8 @@ class ExampleTests(WebTest):
         self.assertEqual("200 OK", response.status)
 
     def test_client_no_app_config(self):
-        app.config['TWILIO_ACCOUNT_SID'] = None
-        response = self.app.get('/client')
+        settings = dict(SETTINGS, TWILIO_ACCOUNT_SID=None)
+        response = create_app(settings).test_client().get('/client')
         self.assertEqual("200 OK", response.status)
         self.assertTrue(b"Missing from local_settings" in response.data,
                         "Could not find missing config message in response.")
@@ -50,9 +50,10 @@ class ExampleTests(WebTest):
                         "error message in response: {0}".format(response.data))
 
     def test_client_incoming_no_caller_id(self):
-        app.config.pop("TWILIO_CALLER_ID", None)
-        response = self.app.post('/client/incoming',
-                                 data={'PhoneNumber': '16667778888'})
+        settings = dict(SETTINGS, TWILIO_CALLER_ID=None)
+        client = create_app(settings).test_client()
+        response = client.post('/client/incoming',
+                               data={'PhoneNumber': '16667778888'})
         self.assertEqual("200 OK", response.status)
         self.assertFalse(b"<Dial>" in response.data, "Found <Dial>"
                          "in response when should have returned "
@@ -63,6 +64,20 @@ class ExampleTests(WebTest):
         self.assertTrue(b'<Say>' in response.data, "Did not find "
                         "error message in response: {0}".format(response.data))
 
+    def test_client_incoming_short_code(self):
+        for number in ('911', '555-1234'):
+            response = self.app.post('/client/incoming',
+                                     data={'PhoneNumber': number})
+            self.assertTrue(b'<Number>' + number.replace('-', '').encode(
+                'ascii') + b'</Number>' in response.data, response.data)
+
+    def test_client_incoming_country_code(self):
+        app = create_app(dict(SETTINGS, DIAL_COUNTRY_CODE='44'))
+        response = app.test_client().post('/client/incoming',
+                                          data={'PhoneNumber': '2079460958'})
+        self.assertTrue(b'<Number>+442079460958</Number>' in response.data,
+                        response.data)
+
     def test_client_incoming_incorrect_number(self):
         response = self.app.post('/client/incoming',
                                  data={'PhoneNumber': 'AKJD:LFKNAFJ'})